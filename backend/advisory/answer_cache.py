@@ -0,0 +1,134 @@
+"""
+Semantic answer cache for the chat advisory.
+
+Many users ask the same question in slightly different words. Each answered
+message is stored with its embedding; a new message whose embedding is at
+least CHAT_ANSWER_CACHE_THRESHOLD cosine-similar to a stored one reuses its
+retrieval results instead of running the RAG search again. Only those
+non-personalized results are cached; weather and other per-user context are
+added by the caller on every request.
+
+Entries expire after CHAT_ANSWER_CACHE_TTL seconds or when the RAG index is
+rebuilt, and the least recently used entry is evicted beyond
+CHAT_ANSWER_CACHE_SIZE. The cache lives in each worker process.
+"""
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from django.conf import settings
+from rag.embeddings import get_embedding_provider
+
+
+class SemanticAnswerCache:
+    def __init__(self, threshold=0.92, ttl=3600, max_size=2000):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_size = max_size
+        self._vectors = None
+        self._used = np.zeros(max_size, dtype=bool)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def _free_slot(self):
+        if len(self._entries) < self.max_size:
+            return int(np.flatnonzero(~self._used)[0])
+        slot, _ = self._entries.popitem(last=False)
+        return slot
+
+    def _drop(self, slot):
+        self._entries.pop(slot, None)
+        self._used[slot] = False
+
+    def get(self, embedding, generation=None):
+        """Cached value of the most similar unexpired earlier message above the threshold, or None."""
+        with self._lock:
+            if self._vectors is None or not self._entries:
+                self.misses += 1
+                return None
+
+            scores = self._vectors @ embedding
+            scores[~self._used] = -np.inf
+            candidates = np.flatnonzero(scores >= self.threshold)
+            now = time.monotonic()
+            # Best first; expired entries on the way are evicted, not returned
+            for slot in candidates[np.argsort(-scores[candidates], kind='stable')]:
+                slot = int(slot)
+                entry = self._entries[slot]
+                if now - entry['created'] > self.ttl or entry['generation'] != generation:
+                    self._drop(slot)
+                    self.expired += 1
+                    continue
+
+                self._entries.move_to_end(slot)
+                self.hits += 1
+                return {**entry['value'], 'similarity': float(scores[slot]), 'cached_message': entry['message']}
+
+            self.misses += 1
+            return None
+
+    def put(self, embedding, message, value, generation=None):
+        embedding = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_size, len(embedding)), dtype=np.float32)
+            slot = self._free_slot()
+            self._vectors[slot] = embedding
+            self._used[slot] = True
+            self._entries[slot] = {
+                'message': message,
+                'value': value,
+                'generation': generation,
+                'created': time.monotonic(),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._used[:] = False
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'threshold': self.threshold,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'expired': self.expired,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def embed_message(message):
+    """Unit-length embedding of a chat message, or None if the embedding model is unavailable."""
+    try:
+        embedding = np.asarray(get_embedding_provider().encode_query(message), dtype=np.float32)
+    except Exception:
+        return None
+    norm = np.linalg.norm(embedding)
+    return embedding / norm if norm else None
+
+
+_answer_cache = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache():
+    """The process-wide answer cache, or None when CHAT_ANSWER_CACHE_ENABLED is off."""
+    global _answer_cache
+    if not settings.CHAT_ANSWER_CACHE_ENABLED or settings.CHAT_ANSWER_CACHE_SIZE <= 0:
+        return None
+    if _answer_cache is None:
+        with _answer_cache_lock:
+            if _answer_cache is None:
+                _answer_cache = SemanticAnswerCache(
+                    threshold=settings.CHAT_ANSWER_CACHE_THRESHOLD,
+                    ttl=settings.CHAT_ANSWER_CACHE_TTL,
+                    max_size=settings.CHAT_ANSWER_CACHE_SIZE,
+                )
+    return _answer_cache
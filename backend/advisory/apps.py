@@ -1,13 +1,15 @@
 from django.apps import AppConfig
 
 
+def warm_intent_router():
+    from .intents import get_intent_router
+    get_intent_router().match('Hello, how often should I water tomatoes?')
+
+
 class AdvisoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'advisory'
 
-
-
-
-
-
-
+    def ready(self):
+        from backend.warmup import register_warmup
+        register_warmup('intent_router', warm_intent_router)
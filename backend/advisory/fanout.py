@@ -0,0 +1,66 @@
+"""
+Concurrent fan-out to independent advisory sources.
+
+gather() starts every source at once on a shared thread pool and waits for
+each until its own deadline or the overall budget, whichever comes first. A
+source that misses it is reported as timed out and the caller continues
+without it; its thread finishes in the background (it is not interrupted),
+which the pool size bounds.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from django.conf import settings
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.ADVISORY_FANOUT_WORKERS, thread_name_prefix='advisory'
+                )
+    return _executor
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    try:
+        return fn(), None, time.perf_counter() - start
+    except Exception as e:
+        return None, e, time.perf_counter() - start
+
+
+def gather(calls, budget, deadlines=None):
+    """Run calls ({name: zero-argument callable}) concurrently.
+
+    Returns (results, sources): results maps each source that finished in
+    time to its value; sources maps every source to {'status': 'ok' |
+    'error' | 'timeout', 'ms': ...} plus the exception type as 'error'.
+    """
+    deadlines = deadlines or {}
+    start = time.perf_counter()
+    executor = get_executor()
+    futures = {name: executor.submit(_timed, fn) for name, fn in calls.items()}
+
+    results, sources = {}, {}
+    for name in sorted(futures, key=lambda name: deadlines.get(name, budget)):
+        deadline = min(deadlines.get(name, budget), budget)
+        try:
+            value, error, seconds = futures[name].result(timeout=max(deadline - (time.perf_counter() - start), 0))
+        except FutureTimeout:
+            futures[name].cancel()
+            sources[name] = {'status': 'timeout', 'ms': round((time.perf_counter() - start) * 1000, 1)}
+            continue
+
+        if error is not None:
+            # Only the exception type: messages can contain URLs with API keys
+            sources[name] = {'status': 'error', 'ms': round(seconds * 1000, 1), 'error': type(error).__name__}
+        else:
+            results[name] = value
+            sources[name] = {'status': 'ok', 'ms': round(seconds * 1000, 1)}
+    return results, sources
@@ -0,0 +1,141 @@
+"""
+Intent routing for the chat advisory.
+
+The intents and their phrases live in intents.json. They are compiled into
+lookup tables (whole words, word prefixes and multi-word phrases), and a
+message is tokenized once and classified in a single pass over its words,
+so "hi" no longer matches inside "this". A phrase ending in '*' also matches
+longer words ("wilt*" matches "wilting"). match() returns every matched
+intent, highest priority first; an intent with max_words only counts in
+messages of at most that many words.
+"""
+import json
+import re
+import threading
+from collections import namedtuple
+from pathlib import Path
+
+INTENTS_PATH = Path(__file__).resolve().parent / 'intents.json'
+INTENT_KINDS = ('conversational', 'topic', 'crop')
+
+# Words with an optional contraction or possessive ("don't", "tomato's")
+WORD_RE = re.compile(r"\w+(?:'\w+)?")
+
+# Distinct words remembered by a router before its word cache is reset
+WORD_CACHE_SIZE = 50000
+
+IntentMatch = namedtuple('IntentMatch', ['name', 'kind', 'priority', 'terms'])
+
+
+class IntentRouter:
+    def __init__(self, intents):
+        self.intents = {}
+        self._words = {}
+        self._prefixes = {}
+        self._phrases = {}
+        seen = {}
+        for intent in intents:
+            name = intent['name']
+            if not re.fullmatch(r'[a-z_][a-z0-9_]*', name) or name in self.intents:
+                raise ValueError(f'Invalid or duplicate intent name: {name}')
+            if intent.get('kind', 'topic') not in INTENT_KINDS:
+                raise ValueError(f'Unknown kind of intent {name}: {intent["kind"]}')
+            self.intents[name] = {'kind': 'topic', 'max_words': None, **intent}
+
+            for phrase in intent['phrases']:
+                words = tuple(WORD_RE.findall(phrase.lower()))
+                prefix = phrase.endswith('*')
+                if not words or (prefix and len(words) > 1):
+                    raise ValueError(f'Invalid phrase {phrase!r} in {name}')
+                key = (words, prefix)
+                if key in seen:
+                    raise ValueError(f'Phrase {phrase!r} is in both {seen[key]} and {name}')
+                seen[key] = name
+
+                if len(words) > 1:
+                    self._phrases.setdefault(words[0], []).append((words, name))
+                elif prefix:
+                    self._prefixes[words[0]] = name
+                else:
+                    self._words[words[0]] = name
+
+        # Longest phrases and prefixes first, so "good morning" wins over a shorter overlap
+        for candidates in self._phrases.values():
+            candidates.sort(key=lambda candidate: len(candidate[0]), reverse=True)
+        self._prefix_lengths = sorted({len(stem) for stem in self._prefixes}, reverse=True)
+        self._order = {name: position for position, name in enumerate(self.intents)}
+        self._word_cache = {}
+
+    @classmethod
+    def from_file(cls, path=INTENTS_PATH):
+        with open(path, 'r') as f:
+            return cls(json.load(f)['intents'])
+
+    def classify_word(self, word):
+        """Intent of a single lowercase word, or None."""
+        try:
+            return self._word_cache[word]
+        except KeyError:
+            pass
+
+        name = self._words.get(word)
+        if name is None and "'" in word:
+            # "tomato's" counts as "tomato"; listed contractions matched above
+            name = self._words.get(word.split("'")[0])
+        if name is None:
+            for length in self._prefix_lengths:
+                if len(word) >= length and word[:length] in self._prefixes:
+                    name = self._prefixes[word[:length]]
+                    break
+
+        if len(self._word_cache) >= WORD_CACHE_SIZE:
+            self._word_cache.clear()
+        self._word_cache[word] = name
+        return name
+
+    def match(self, message):
+        """All intents found in the message, highest priority first."""
+        words = WORD_RE.findall(message.lower())
+        terms = {}
+        i = 0
+        while i < len(words):
+            found, size = None, 1
+            for phrase, name in self._phrases.get(words[i], ()):
+                if tuple(words[i:i + len(phrase)]) == phrase:
+                    found, size = name, len(phrase)
+                    break
+            if found is None:
+                found = self.classify_word(words[i])
+            if found is not None:
+                terms.setdefault(found, []).append(' '.join(words[i:i + size]))
+            i += size
+
+        word_count = len(message.split())
+        matches = []
+        for name, matched_terms in terms.items():
+            intent = self.intents[name]
+            if intent['max_words'] is not None and word_count > intent['max_words']:
+                continue
+            matches.append(IntentMatch(name, intent['kind'], intent['priority'], matched_terms))
+        # Stable on equal priority: intents listed earlier in the file win
+        matches.sort(key=lambda match: (-match.priority, self._order[match.name]))
+        return matches
+
+
+def first_of_kind(matches, kind):
+    """Name of the highest-priority matched intent of a kind, or None."""
+    return next((match.name for match in matches if match.kind == kind), None)
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_intent_router():
+    """The process-wide router built from intents.json."""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = IntentRouter.from_file()
+    return _router
@@ -0,0 +1,194 @@
+"""
+Django management command to compare in-process service calls with loopback HTTP calls.
+Usage: python manage.py benchmark_advisory_latency --username <user> [--base-url http://localhost:8000] [--repeat 20]
+
+The advisory views used to reach weather, RAG search and RAG initialize over
+HTTP on this same server; they now call weather/services.py,
+rag/services.py and disease_detection/services.py directly. This times each
+call both ways (the HTTP side needs a running server at --base-url and signs
+its requests as --username) and then times the advisory views end to end,
+including time to first byte and to the answer of the streaming chat.
+"""
+import json
+import time
+import requests
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.tokens import AccessToken
+from advisory.answer_cache import get_answer_cache
+from advisory.sessions import get_session_store
+from advisory.views import get_ai_advisory, chat_advisory, chat_advisory_stream
+from disease_detection.services import load_treatments
+from rag.benchmark import EVAL_QUERIES_PATH, load_labeled_queries, summarize_latency, time_calls
+from rag.services import search_knowledge, batch_search, initialize_knowledge
+from weather.services import get_weather_data
+
+
+def quietly(fn):
+    """fn with exceptions swallowed, as the advisory views treat failed lookups."""
+    def call(*args):
+        try:
+            return fn(*args)
+        except Exception:
+            return None
+    return call
+
+
+class Command(BaseCommand):
+    help = 'Measure advisory latency of in-process service calls versus loopback HTTP calls'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', required=True, help='User the requests are made as')
+        parser.add_argument('--base-url', default='http://localhost:8000', help='Running server for the HTTP side')
+        parser.add_argument('--location', default='Nairobi')
+        parser.add_argument('--repeat', type=int, default=20, help='Calls per measurement')
+        parser.add_argument('--skip-http', action='store_true', help='Only measure in-process calls')
+
+    def report(self, name, direct, http):
+        direct = summarize_latency(direct)
+        line = f'{name:>14} {direct["p50_ms"]:>9.2f}ms {direct["p95_ms"]:>9.2f}ms'
+        if http:
+            http = summarize_latency(http)
+            line += (f' {http["p50_ms"]:>9.2f}ms {http["p95_ms"]:>9.2f}ms'
+                     f' {http["p50_ms"] - direct["p50_ms"]:>9.2f}ms')
+        self.stdout.write(line)
+
+    def http_calls(self, base_url, token, location, queries):
+        """Loopback equivalents of the service calls, as the advisory used to make them."""
+        headers = {'Authorization': f'Bearer {token}'}
+        return {
+            'weather': lambda: requests.get(f'{base_url}/api/weather/{location}/', headers=headers, timeout=10),
+            'search': lambda query: requests.post(
+                f'{base_url}/api/rag/search/', json={'query': query, 'top_k': 3}, headers=headers, timeout=10
+            ),
+            'batch_search': lambda: requests.post(
+                f'{base_url}/api/rag/search/batch/', json={'queries': queries}, headers=headers, timeout=10
+            ),
+            'initialize': lambda: requests.get(f'{base_url}/api/rag/initialize/', headers=headers, timeout=10),
+        }
+
+    def read_treatments_file(self):
+        # What every advisory request with a detected disease used to do
+        with open(settings.MODELS_DIR / 'disease_treatments.json', 'r') as f:
+            return json.load(f)
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options['username'])
+        except get_user_model().DoesNotExist:
+            self.stdout.write(self.style.ERROR(f'User {options["username"]} does not exist'))
+            return
+
+        repeat = options['repeat']
+        location = options['location']
+        messages = [query['query'] for query in load_labeled_queries(EVAL_QUERIES_PATH)]
+        messages = (messages * (repeat // len(messages) + 1))[:repeat]
+        batch = [
+            {'key': 'practices', 'query': 'Best practices for growing tomato', 'top_k': 3},
+            {'key': 'disease', 'query': 'How to treat early blight', 'top_k': 2},
+        ]
+
+        # Warm up the embedding model and index
+        quietly(initialize_knowledge)()
+        search_knowledge(messages[0])
+
+        http = None
+        if not options['skip_http']:
+            http = self.http_calls(options['base_url'].rstrip('/'), AccessToken.for_user(user), location, batch)
+            try:
+                http['initialize']()
+            except requests.exceptions.RequestException as e:
+                self.stdout.write(self.style.WARNING(f'No server at {options["base_url"]} ({e}); in-process only'))
+                http = None
+
+        self.stdout.write(f'{"call":>14} {"direct p50":>11} {"p95":>11}' +
+                          (f' {"HTTP p50":>11} {"p95":>11} {"saved p50":>11}' if http else ''))
+        self.report(
+            'weather',
+            time_calls(quietly(get_weather_data), [(location,)] * repeat),
+            time_calls(quietly(http['weather']), [()] * repeat) if http else None
+        )
+        self.report(
+            'search',
+            time_calls(search_knowledge, [(message,) for message in messages]),
+            time_calls(quietly(http['search']), [(message,) for message in messages]) if http else None
+        )
+        self.report(
+            'batch_search',
+            time_calls(batch_search, [(batch,)] * repeat),
+            time_calls(quietly(http['batch_search']), [()] * repeat) if http else None
+        )
+        self.report(
+            'initialize',
+            time_calls(quietly(initialize_knowledge), [()] * repeat),
+            time_calls(quietly(http['initialize']), [()] * repeat) if http else None
+        )
+        if (settings.MODELS_DIR / 'disease_treatments.json').exists():
+            self.stdout.write(f'{"":>14} {"cached":>11} {"":>11} {"re-read":>11}')
+            self.report(
+                'treatment',
+                time_calls(load_treatments, [()] * repeat),
+                time_calls(self.read_treatments_file, [()] * repeat)
+            )
+
+        # Whole advisory requests, served in this process
+        factory = APIRequestFactory()
+        answer_cache = get_answer_cache()
+        sessions = get_session_store()
+
+        def reset_caches():
+            # Every message is timed as a fresh, standalone question
+            if answer_cache:
+                answer_cache.clear()
+            if sessions:
+                sessions.clear(user.pk)
+
+        def call_view(view, data):
+            reset_caches()
+            request = factory.post('/', data, format='json')
+            force_authenticate(request, user=user)
+            view(request).render()
+
+        self.stdout.write(self.style.SUCCESS('\nEnd to end (in-process services):'))
+        self.report('comprehensive', time_calls(call_view, [(get_ai_advisory, {
+            'location': location, 'crop_type': 'tomato', 'detected_disease': 'Tomato_Early_blight'
+        })] * repeat), None)
+        self.report('chat', time_calls(call_view, [
+            (chat_advisory, {'message': message, 'location': location}) for message in messages
+        ]), None)
+
+        # Streaming chat: the plain endpoint sends nothing until the reply is complete
+        first, answer, end = [], [], []
+        for message in messages:
+            reset_caches()
+            request = factory.post('/', {'message': message, 'location': location}, format='json')
+            force_authenticate(request, user=user)
+            start = time.perf_counter()
+            for i, chunk in enumerate(chat_advisory_stream(request).streaming_content):
+                if i == 0:
+                    first.append(time.perf_counter() - start)
+                if b'"event": "answer"' in chunk:
+                    answer.append(time.perf_counter() - start)
+            end.append(time.perf_counter() - start)
+
+        self.stdout.write(self.style.SUCCESS('\nChat streaming (time to first byte):'))
+        self.report('stream first', first, None)
+        self.report('stream answer', answer, None)
+        self.report('stream end', end, None)
+
+        if sessions:
+            # A short follow-up reuses the retrieval of the question before it
+            follow_up = []
+            for message in messages:
+                reset_caches()
+                call_view(chat_advisory, {'message': message, 'location': location})
+                request = factory.post('/', {'message': 'how often?', 'location': location}, format='json')
+                force_authenticate(request, user=user)
+                start = time.perf_counter()
+                chat_advisory(request).render()
+                follow_up.append(time.perf_counter() - start)
+            self.stdout.write(self.style.SUCCESS('\nChat follow-ups (session context):'))
+            self.report('follow-up', follow_up, None)
+            self.stdout.write(f'{"":>14} {json.dumps(sessions.stats())}')
@@ -0,0 +1,120 @@
+"""
+Django management command to check the chat intent router against its regression corpus.
+Usage: python manage.py check_intent_router [--corpus advisory/intent_corpus.json] [--benchmark] [--show-changes]
+
+Every corpus message must match exactly its listed intents, in priority
+order. --benchmark times the router against the substring scans chat_advisory
+used before it; --show-changes lists corpus messages the two route
+differently.
+"""
+import json
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from advisory.intents import IntentRouter, INTENTS_PATH, first_of_kind
+from rag.benchmark import summarize_latency, time_calls
+
+CORPUS_PATH = Path(__file__).resolve().parents[2] / 'intent_corpus.json'
+
+# The keyword lists chat_advisory scanned one by one before the router
+LEGACY_CONVERSATIONAL = [
+    ('greeting', ['hello', 'hi', 'hey', 'good morning', 'good afternoon', 'good evening', 'greetings'], None),
+    ('thanks', ['thank', 'thanks', 'appreciate', 'grateful', 'helpful'], None),
+    ('goodbye', ['bye', 'goodbye', 'see you', 'farewell', 'later'], None),
+    ('yes', ['yes', 'yeah', 'yep', 'sure', 'ok', 'okay', 'alright', 'correct'], 3),
+    ('no', ['no', 'nope', 'not', "don't", "doesn't", "isn't", "aren't"], 3),
+]
+LEGACY_TOPICS = [
+    ('disease', ['disease', 'sick', 'infected', 'problem', 'issue', 'wrong', 'yellow', 'brown', 'spot', 'mold', 'blight', 'wilt']),
+    ('water', ['water', 'irrigation', 'watering', 'moisture', 'dry', 'thirsty', 'dehydrated']),
+    ('fertilizer', ['fertilizer', 'fertilize', 'nutrient', 'feed', 'fertilizer', 'npk', 'compost']),
+    ('planting', ['plant', 'grow', 'planting', 'seed', 'sow', 'transplant', 'seedling']),
+    ('pest', ['pest', 'insect', 'bug', 'aphid', 'mite', 'caterpillar', 'worm', 'infestation']),
+    ('soil', ['soil', 'dirt', 'ground', 'ph', 'clay', 'sandy', 'loam']),
+    ('harvest', ['harvest', 'harvesting', 'pick', 'collect', 'ripe', 'mature', 'ready']),
+    ('tomato', ['tomato', 'tomatoes']),
+    ('potato', ['potato', 'potatoes']),
+    ('pepper', ['pepper', 'peppers']),
+]
+
+
+def legacy_route(message):
+    """The branch the old substring scans sent a message to."""
+    query_lower = message.lower()
+    for name, words, max_words in LEGACY_CONVERSATIONAL:
+        if (max_words is None or len(query_lower.split()) <= max_words) and any(word in query_lower for word in words):
+            return name
+    for name, words in LEGACY_TOPICS:
+        if any(word in query_lower for word in words):
+            return name
+    return 'general'
+
+
+def legacy_intents(message):
+    """Every intent the old keyword lists find in a message, as match() reports them."""
+    query_lower = message.lower()
+    return [
+        name for name, words, *_ in LEGACY_CONVERSATIONAL + LEGACY_TOPICS
+        if any(word in query_lower for word in words)
+    ]
+
+
+def route(router, message):
+    """The branch chat_advisory sends a message to with the router."""
+    matches = router.match(message)
+    topic = first_of_kind(matches, 'topic')
+    crop = first_of_kind(matches, 'crop')
+    if topic or crop:
+        return topic or crop
+    return first_of_kind(matches, 'conversational') or 'general'
+
+
+class Command(BaseCommand):
+    help = 'Check the chat intent router against its regression corpus'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corpus', default=str(CORPUS_PATH), help='JSON list of {"message", "intents"}')
+        parser.add_argument('--intents', default=str(INTENTS_PATH), help='Intent definitions to check')
+        parser.add_argument('--benchmark', action='store_true', help='Time the router against the legacy scans')
+        parser.add_argument('--repeat', type=int, default=200, help='Passes over the corpus when benchmarking')
+        parser.add_argument('--show-changes', action='store_true', help='List messages routed differently than before')
+
+    def handle(self, *args, **options):
+        router = IntentRouter.from_file(options['intents'])
+        with open(options['corpus'], 'r') as f:
+            corpus = json.load(f)
+
+        failures = 0
+        for case in corpus:
+            found = [match.name for match in router.match(case['message'])]
+            if found != case['intents']:
+                failures += 1
+                self.stdout.write(self.style.ERROR(
+                    f'✗ {case["message"]!r}: expected {case["intents"]}, got {found}'
+                ))
+        if failures:
+            raise CommandError(f'{failures} of {len(corpus)} corpus messages misrouted')
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {len(corpus)} corpus messages matched ({len(router.intents)} intents)'
+        ))
+
+        if options['show_changes']:
+            for case in corpus:
+                before, after = legacy_route(case['message']), route(router, case['message'])
+                if before != after:
+                    self.stdout.write(f'  {case["message"]!r}: {before} -> {after}')
+
+        if options['benchmark']:
+            messages = [(case['message'],) for case in corpus] * options['repeat']
+            timings = (
+                # The old chain stops at its first hit, often a false greeting
+                ('legacy route', time_calls(legacy_route, messages)),
+                ('legacy all', time_calls(legacy_intents, messages)),
+                ('router', time_calls(router.match, messages)),
+            )
+            self.stdout.write(f'{"":>12} {"p50":>9} {"p95":>9} {"mean":>9}')
+            for name, samples in timings:
+                stats = summarize_latency(samples)
+                self.stdout.write(
+                    f'{name:>12} {stats["p50_ms"] * 1000:>7.1f}us {stats["p95_ms"] * 1000:>7.1f}us '
+                    f'{stats["mean_ms"] * 1000:>7.1f}us'
+                )
@@ -0,0 +1,24 @@
+"""
+Django management command to run the startup warmup tasks and report their times.
+Usage: python manage.py warmup
+
+Runs the same tasks a server process runs at startup with WARMUP_ENABLED
+(see backend/warmup.py), in this process, and prints how long each took.
+"""
+from django.core.management.base import BaseCommand
+from backend.warmup import run_warmup
+
+
+class Command(BaseCommand):
+    help = 'Run the startup warmup tasks and report per-resource times'
+
+    def handle(self, *args, **options):
+        results = run_warmup()
+        for name, result in results.items():
+            line = f'{name:>16} {result["status"]:>8} {result["seconds"]:>8.2f}s  {result.get("detail", "")}'
+            if result['status'] == 'ok':
+                self.stdout.write(self.style.SUCCESS(f'✓ {line}'))
+            elif result['status'] == 'skipped':
+                self.stdout.write(self.style.WARNING(f'- {line}'))
+            else:
+                self.stdout.write(self.style.ERROR(f'✗ {line}'))
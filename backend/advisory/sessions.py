@@ -0,0 +1,156 @@
+"""
+Per-user conversation sessions for the chat advisory.
+
+Each user's session keeps their last CHAT_SESSION_MAX_TURNS messages, the
+topic, crop and location of the conversation so far, and the last retrieval
+(query, results and the index version it was made against). A short
+follow-up without a topic or crop of its own ("how often?", "what about
+potatoes?") continues the conversation: it inherits the missing topic or
+crop, and if it changes neither, reuses the last retrieval results instead
+of searching again.
+
+Sessions expire after CHAT_SESSION_TTL idle seconds; beyond
+CHAT_SESSION_MAX_SESSIONS the least recently active one is evicted. Like the
+answer cache, the store lives in each worker process.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from django.conf import settings
+
+
+class ConversationSessionStore:
+    def __init__(self, ttl=1800, max_sessions=10000, max_turns=10):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        self.follow_ups = 0
+        self.reused = 0
+
+    def _purge_expired(self, now):
+        # Least recently active first, so stop at the first live session
+        while self._sessions:
+            key, session = next(iter(self._sessions.items()))
+            if now - session['updated'] <= self.ttl:
+                break
+            del self._sessions[key]
+            self.expired += 1
+
+    def get(self, key, count=True):
+        """A snapshot of the user's live session, or None. count=False leaves the hit metrics alone."""
+        with self._lock:
+            self._purge_expired(time.monotonic())
+            session = self._sessions.get(key)
+            if count:
+                self.hits += session is not None
+                self.misses += session is None
+            if session is None:
+                return None
+            return {**session, 'history': list(session['history'])}
+
+    def record(self, key, message, topic=None, crop=None, location='', follow_up=False, reused=False,
+               retrieval=None):
+        """Add a turn to the user's session, starting one if needed.
+
+        retrieval ({'query', 'topic', 'crop', 'rag_results', 'index_version'})
+        replaces the stored one; follow_up and reused feed the hit metrics.
+        """
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.pop(key, None)
+            if session is None:
+                if len(self._sessions) >= self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.evicted += 1
+                session = {
+                    'history': deque(maxlen=self.max_turns),
+                    'topic': None,
+                    'crop': None,
+                    'location': '',
+                    'retrieval': None,
+                    'started': now,
+                }
+            session['history'].append({'message': message, 'topic': topic, 'crop': crop})
+            session['topic'] = topic or session['topic']
+            session['crop'] = crop or session['crop']
+            session['location'] = location or session['location']
+            if retrieval is not None:
+                session['retrieval'] = retrieval
+            session['updated'] = now
+            self._sessions[key] = session
+            self.follow_ups += follow_up
+            self.reused += reused
+
+    def clear(self, key=None):
+        """End one user's session, or all of them."""
+        with self._lock:
+            if key is None:
+                self._sessions.clear()
+            else:
+                self._sessions.pop(key, None)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'sessions': len(self._sessions),
+            'max_sessions': self.max_sessions,
+            'max_turns': self.max_turns,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'expired': self.expired,
+            'evicted': self.evicted,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'follow_ups': self.follow_ups,
+            'retrieval_reused': self.reused,
+            'reuse_rate': round(self.reused / self.follow_ups, 4) if self.follow_ups else 0.0,
+        }
+
+
+def resolve_follow_up(session, message, topic, crop, index_version):
+    """(topic, crop, follow_up, reusable retrieval or None) for a message in its session.
+
+    A message is standalone when there is no session, when it names both a
+    topic and a crop, or when it has neither and is longer than
+    CHAT_SESSION_FOLLOWUP_MAX_WORDS words.
+    """
+    own_topic = topic
+    if not session or not (session['topic'] or session['crop']):
+        return topic, crop, False, None
+    if (topic and crop) or (not topic and not crop and len(message.split()) > settings.CHAT_SESSION_FOLLOWUP_MAX_WORDS):
+        return topic, crop, False, None
+
+    topic, crop = topic or session['topic'], crop or session['crop']
+    retrieval = session['retrieval']
+    # Same topic and crop as the last retrieval: its results still apply
+    reusable = retrieval if (
+        retrieval and not own_topic and (retrieval['topic'], retrieval['crop']) == (topic, crop)
+        and retrieval['index_version'] == index_version
+    ) else None
+    return topic, crop, True, reusable
+
+
+_session_store = None
+_session_store_lock = threading.Lock()
+
+
+def get_session_store():
+    """The process-wide session store, or None when CHAT_SESSION_ENABLED is off."""
+    global _session_store
+    if not settings.CHAT_SESSION_ENABLED or settings.CHAT_SESSION_MAX_SESSIONS <= 0:
+        return None
+    if _session_store is None:
+        with _session_store_lock:
+            if _session_store is None:
+                _session_store = ConversationSessionStore(
+                    ttl=settings.CHAT_SESSION_TTL,
+                    max_sessions=settings.CHAT_SESSION_MAX_SESSIONS,
+                    max_turns=settings.CHAT_SESSION_MAX_TURNS,
+                )
+    return _session_store
@@ -0,0 +1,31 @@
+"""
+Wire formats for the streaming chat endpoint.
+
+Each event is one JSON object {"event": ..., ...data}. NDJSON sends one per
+line; server-sent events send "event:"/"data:" frames, as browsers'
+EventSource expects. The renderers also let DRF's content negotiation accept
+these media types, and render error responses (e.g. a missing message) as a
+single 'error' event in the same format.
+"""
+import json
+from rest_framework.renderers import BaseRenderer
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def format_event(self, event, data):
+        return (json.dumps({'event': event, **data}) + '\n').encode('utf-8')
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return self.format_event('error', data or {})
+
+
+class EventStreamRenderer(NDJSONRenderer):
+    media_type = 'text/event-stream'
+    format = 'sse'
+
+    def format_event(self, event, data):
+        return f'event: {event}\ndata: {json.dumps({"event": event, **data})}\n\n'.encode('utf-8')
@@ -1,10 +1,12 @@
 from django.urls import path
-from .views import get_ai_advisory, get_seasonal_guide, chat_advisory
+from .views import get_ai_advisory, get_seasonal_guide, chat_advisory, chat_advisory_stream, chat_session
 
 urlpatterns = [
     path('comprehensive/', get_ai_advisory, name='get_ai_advisory'),
     path('seasonal/', get_seasonal_guide, name='get_seasonal_guide'),
     path('chat/', chat_advisory, name='chat_advisory'),
+    path('chat/stream/', chat_advisory_stream, name='chat_advisory_stream'),
+    path('chat/session/', chat_session, name='chat_session'),
 ]
 
 
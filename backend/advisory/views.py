@@ -1,12 +1,30 @@
-import json
-import requests
+import logging
+import time
 from datetime import datetime
-from rest_framework.decorators import api_view, permission_classes
+from django.http import StreamingHttpResponse
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from django.conf import settings
-from pathlib import Path
+from rag.store import read_active_index
+from rag.services import search_knowledge, batch_search
+from weather.services import get_weather_data
+from disease_detection.services import load_treatments
+from .answer_cache import get_answer_cache, embed_message
+from .fanout import gather, get_executor
+from .intents import get_intent_router, first_of_kind
+from .sessions import get_session_store, resolve_follow_up
+from .streaming import NDJSONRenderer, EventStreamRenderer
+
+logger = logging.getLogger(__name__)
+
+# Response section filled from each concurrently fetched source
+SOURCE_SECTIONS = {
+    'weather': 'weather_advice',
+    'treatments': 'disease_advice',
+    'rag': 'rag_advice',
+}
 
 
 @api_view(['POST'])
@@ -26,61 +44,69 @@ def get_ai_advisory(request):
         'comprehensive_advice': ''
     }
     
-    # Get weather advice
+    # Weather, treatments and RAG are independent: fetch them concurrently,
+    # each within its own deadline and all within the advisory budget
+    calls = {}
     if user_location:
-        try:
-            weather_response = requests.get(
-                f'http://localhost:8000/api/weather/{user_location}/',
-                headers={'Authorization': f'Bearer {request.auth}'},
-                timeout=5
-            )
-            if weather_response.status_code == 200:
-                weather_data = weather_response.json()
-                advisory['weather_advice'] = {
-                    'temperature': weather_data.get('temperature'),
-                    'humidity': weather_data.get('humidity'),
-                    'rain_prediction': weather_data.get('rain_prediction'),
-                    'advice': weather_data.get('advice')
-                }
-        except:
-            pass
-    
-    # Get disease advice
+        calls['weather'] = lambda: get_weather_data(user_location)
     if detected_disease:
-        treatments_path = settings.MODELS_DIR / 'disease_treatments.json'
-        if treatments_path.exists():
-            with open(treatments_path, 'r') as f:
-                treatments = json.load(f)
-            
-            treatment = treatments.get(detected_disease, treatments.get('default', {}))
-            advisory['disease_advice'] = {
-                'disease': detected_disease,
-                'treatment': treatment.get('general', ''),
-                'prevention': treatment.get('prevention', ''),
-                'organic': treatment.get('organic', '')
-            }
+        calls['treatments'] = load_treatments
     
-    # Get RAG advice
+    # All retrievals for this page in one batched search
+    rag_queries = []
     if query or crop_type:
         search_query = query or f"Best practices for growing {crop_type}"
-        try:
-            rag_response = requests.post(
-                'http://localhost:8000/api/rag/search/',
-                json={'query': search_query, 'top_k': 3},
-                headers={'Authorization': f'Bearer {request.auth}'},
-                timeout=5
-            )
-            if rag_response.status_code == 200:
-                rag_data = rag_response.json()
-                advisory['rag_advice'] = {
-                    'query': search_query,
-                    'results': rag_data.get('results', [])
-                }
-        except:
-            pass
+        rag_queries.append({'key': 'practices', 'query': search_query, 'top_k': 3})
+    if detected_disease:
+        rag_queries.append({'key': 'disease', 'query': f"How to treat {detected_disease.replace('_', ' ')}", 'top_k': 2})
+    if rag_queries:
+        calls['rag'] = lambda: batch_search(rag_queries)['results']
+    
+    start = time.perf_counter()
+    results, sources = gather(calls, settings.ADVISORY_BUDGET_SECONDS, settings.ADVISORY_SOURCE_DEADLINES)
+    
+    # Get weather advice
+    if 'weather' in results:
+        weather_data = results['weather']
+        advisory['weather_advice'] = {
+            'temperature': weather_data.get('temperature'),
+            'humidity': weather_data.get('humidity'),
+            'rain_prediction': weather_data.get('rain_prediction'),
+            'advice': weather_data.get('advice')
+        }
+    
+    # Get disease advice
+    treatments = results.get('treatments')
+    if treatments:
+        treatment = treatments.get(detected_disease, treatments.get('default', {}))
+        advisory['disease_advice'] = {
+            'disease': detected_disease,
+            'treatment': treatment.get('general', ''),
+            'prevention': treatment.get('prevention', ''),
+            'organic': treatment.get('organic', '')
+        }
+    
+    # Get RAG advice
+    rag_results = results.get('rag', {})
+    if 'practices' in rag_results:
+        advisory['rag_advice'] = {
+            'query': rag_results['practices']['query'],
+            'results': rag_results['practices']['results']
+        }
+    if 'disease' in rag_results and advisory['disease_advice']:
+        advisory['disease_advice']['references'] = rag_results['disease']['results']
+    
+    # Sections left out because their source missed its deadline
+    timed_out = [SOURCE_SECTIONS[name] for name, source in sources.items() if source['status'] == 'timeout']
+    advisory['meta'] = {
+        'partial': bool(timed_out),
+        'timed_out': timed_out,
+        'sources': sources,
+        'budget_ms': settings.ADVISORY_BUDGET_SECONDS * 1000,
+        'elapsed_ms': round((time.perf_counter() - start) * 1000, 1)
+    }
     
     # Generate seasonal recommendations
-    from datetime import datetime
     current_month = datetime.now().month
     
     seasonal_recommendations = get_seasonal_recommendations(current_month, user_location)
@@ -152,40 +178,41 @@ def get_seasonal_recommendations(month, location=''):
         }
 
 
-@api_view(['POST'])
-@permission_classes([IsAuthenticated])
-def chat_advisory(request):
-    """AI chat advisory endpoint that combines all modules."""
-    user_message = request.data.get('message', '').strip()
-    user_location = request.user.location or request.data.get('location', '')
-    
-    if not user_message:
-        return Response({
-            'error': 'Message is required'
-        }, status=status.HTTP_400_BAD_REQUEST)
-    
-    # Initialize response parts
-    response_parts = []
-    query_lower = user_message.lower()
-    
-    # Handle conversational/greeting messages
-    greeting_words = ['hello', 'hi', 'hey', 'good morning', 'good afternoon', 'good evening', 'greetings']
-    thanks_words = ['thank', 'thanks', 'appreciate', 'grateful', 'helpful']
-    goodbye_words = ['bye', 'goodbye', 'see you', 'farewell', 'later']
-    yes_words = ['yes', 'yeah', 'yep', 'sure', 'ok', 'okay', 'alright', 'correct']
-    no_words = ['no', 'nope', 'not', "don't", "doesn't", "isn't", "aren't"]
+def chat_events(user_message, user_location='', user_id=None):
+    """Parts of a chat reply as (event, data) pairs, each sent as soon as it is ready.
+    
+    'intent' comes first, 'answer' once retrieval finishes, then 'weather'
+    (if a location is known) and 'tip'. Joining the 'text' of every event
+    gives the full reply. With a user_id the message continues that user's
+    conversation session (see sessions.py).
+    """
+    # Classify the message in one pass over the compiled intent patterns
+    matches = get_intent_router().match(user_message)
+    topic = first_of_kind(matches, 'topic')
+    crop = first_of_kind(matches, 'crop')
+    # Conversational replies only when there is no farming question in the message
+    conversational = None if topic or crop else first_of_kind(matches, 'conversational')
+    
+    # Follow-ups ("how often?", "what about potatoes?") continue the user's conversation
+    sessions = get_session_store() if user_id is not None else None
+    session = sessions.get(user_id) if sessions else None
+    user_location = user_location or (session['location'] if session else '')
+    answer_cache = get_answer_cache()
+    index_version = read_active_index()['version'] if session or answer_cache else None
+    follow_up, reusable = False, None
+    if not conversational:
+        topic, crop, follow_up, reusable = resolve_follow_up(session, user_message, topic, crop, index_version)
+    elif sessions:
+        sessions.record(user_id, user_message, location=user_location)
+    yield 'intent', {'topic': topic, 'crop': crop, 'conversational': conversational, 'follow_up': follow_up}
     
     # Handle greetings
-    if any(word in query_lower for word in greeting_words):
-        response_parts.append("Hello! I'm your AI agricultural advisor. I'm here to help you with farming questions, crop management, disease detection, weather advice, and more. How can I assist you today?")
-        return Response({
-            'message': user_message,
-            'response': response_parts[0],
-            'timestamp': datetime.now().isoformat()
-        }, status=status.HTTP_200_OK)
+    if conversational == 'greeting':
+        yield 'answer', {'text': "Hello! I'm your AI agricultural advisor. I'm here to help you with farming questions, crop management, disease detection, weather advice, and more. How can I assist you today?"}
+        return
     
     # Handle thank you messages
-    if any(word in query_lower for word in thanks_words):
+    if conversational == 'thanks':
         responses = [
             "You're very welcome! I'm glad I could help. Feel free to ask if you have any other farming questions.",
             "You're welcome! Happy to assist with your agricultural needs. Don't hesitate to reach out if you need more advice.",
@@ -193,65 +220,66 @@ def chat_advisory(request):
             "You're welcome! Wishing you a successful harvest. Let me know if you have any other questions."
         ]
         import random
-        return Response({
-            'message': user_message,
-            'response': random.choice(responses),
-            'timestamp': datetime.now().isoformat()
-        }, status=status.HTTP_200_OK)
+        yield 'answer', {'text': random.choice(responses)}
+        return
     
     # Handle goodbye messages
-    if any(word in query_lower for word in goodbye_words):
-        return Response({
-            'message': user_message,
-            'response': "Goodbye! Take care of your crops and feel free to come back anytime you need agricultural advice. Happy farming!",
-            'timestamp': datetime.now().isoformat()
-        }, status=status.HTTP_200_OK)
+    if conversational == 'goodbye':
+        yield 'answer', {'text': "Goodbye! Take care of your crops and feel free to come back anytime you need agricultural advice. Happy farming!"}
+        return
     
     # Handle simple yes/no responses
-    if len(query_lower.split()) <= 3 and any(word in query_lower for word in yes_words):
-        return Response({
-            'message': user_message,
-            'response': "Great! Is there anything specific about farming or crop management you'd like to know more about?",
-            'timestamp': datetime.now().isoformat()
-        }, status=status.HTTP_200_OK)
+    if conversational == 'yes':
+        yield 'answer', {'text': "Great! Is there anything specific about farming or crop management you'd like to know more about?"}
+        return
     
-    if len(query_lower.split()) <= 3 and any(word in query_lower for word in no_words):
-        return Response({
-            'message': user_message,
-            'response': "I understand. If you have any questions about farming, crops, diseases, weather, or agricultural practices, I'm here to help!",
-            'timestamp': datetime.now().isoformat()
-        }, status=status.HTTP_200_OK)
+    if conversational == 'no':
+        yield 'answer', {'text': "I understand. If you have any questions about farming, crops, diseases, weather, or agricultural practices, I'm here to help!"}
+        return
+    
+    # Weather context is fetched while retrieval runs
+    weather_future = get_executor().submit(get_weather_data, user_location) if user_location else None
+    
+    # Initialize response parts
+    response_parts = []
+    
+    # Search for a follow-up together with the topic and crop it inherited
+    query = user_message
+    if follow_up:
+        inherited = [name for name in (topic, crop) if name and name not in {match.name for match in matches}]
+        query = ' '.join([user_message] + inherited)
+    
+    # A follow-up on the same topic and crop reuses the session's retrieval
+    # results; so does a near-duplicate of an already answered question.
+    # Weather context is still fetched for this user
+    message_embedding = embed_message(query) if answer_cache and not reusable else None
+    cached = answer_cache.get(message_embedding, index_version) if message_embedding is not None else None
     
     # Use RAG to search for relevant information
-    rag_results = []
-    try:
-        # First, try to initialize knowledge base if empty
+    rag_results = reusable['rag_results'] if reusable else cached['rag_results'] if cached else []
+    if not reusable and not cached:
         try:
-            init_response = requests.get(
-                'http://localhost:8000/api/rag/initialize/',
-                headers={'Authorization': f'Bearer {request.auth}'},
-                timeout=3
-            )
-        except:
-            pass
+            # An empty knowledge base is initialized by the search itself
+            rag_results = search_knowledge(query, top_k=3)['results']
+        except Exception as e:
+            print(f"RAG search error: {e}")
         
-        # Then search
-        rag_response = requests.post(
-            'http://localhost:8000/api/rag/search/',
-            json={'query': user_message, 'top_k': 3},
-            headers={'Authorization': f'Bearer {request.auth}'},
-            timeout=5
+        # Only successful retrievals are cached
+        if rag_results and message_embedding is not None:
+            answer_cache.put(message_embedding, query, {'rag_results': rag_results}, index_version)
+    
+    if sessions:
+        sessions.record(
+            user_id, user_message, topic, crop, user_location, follow_up=follow_up, reused=bool(reusable),
+            retrieval=None if reusable or not rag_results else {
+                'query': query, 'topic': topic, 'crop': crop, 'rag_results': rag_results, 'index_version': index_version
+            }
         )
-        if rag_response and rag_response.status_code == 200:
-            rag_data = rag_response.json()
-            rag_results = rag_data.get('results', [])
-    except Exception as e:
-        print(f"RAG search error: {e}")
     
     # Generate contextual response based on query type
     
     # Check query type and generate appropriate response
-    if any(word in query_lower for word in ['disease', 'sick', 'infected', 'problem', 'issue', 'wrong', 'yellow', 'brown', 'spot', 'mold', 'blight', 'wilt']):
+    if topic == 'disease':
         # Disease-related query
         if rag_results:
             response_parts.append(f"Regarding your question about plant diseases:\n\n{rag_results[0]}")
@@ -260,7 +288,7 @@ def chat_advisory(request):
         else:
             response_parts.append("For plant disease issues, I recommend:\n\n• Remove infected plant parts immediately to prevent spread\n• Apply appropriate fungicides or pesticides as needed\n• Ensure good air circulation by proper spacing\n• Avoid overhead watering that wets leaves\n• Use disease-resistant varieties when possible\n• Practice crop rotation to prevent disease buildup\n\nYou can also use the Disease Detection feature to upload an image and get an AI-powered diagnosis!")
     
-    elif any(word in query_lower for word in ['water', 'irrigation', 'watering', 'moisture', 'dry', 'thirsty', 'dehydrated']):
+    elif topic == 'water':
         # Water/irrigation query
         if rag_results:
             response_parts.append(f"About irrigation and watering:\n\n{rag_results[0]}")
@@ -269,7 +297,7 @@ def chat_advisory(request):
         else:
             response_parts.append("Watering best practices:\n\n• Water early in the morning (before 10 AM) to reduce evaporation\n• Use drip irrigation or soaker hoses for efficiency\n• Water at the base of plants, not overhead\n• Check soil moisture by inserting finger 2-3 inches deep\n• Most vegetables need 1-2 inches of water per week\n• Avoid overwatering which can cause root rot\n• Mulch around plants to retain moisture")
     
-    elif any(word in query_lower for word in ['fertilizer', 'fertilize', 'nutrient', 'feed', 'fertilizer', 'npk', 'compost']):
+    elif topic == 'fertilizer':
         # Fertilizer query
         if rag_results:
             response_parts.append(f"Regarding fertilization:\n\n{rag_results[0]}")
@@ -278,7 +306,7 @@ def chat_advisory(request):
         else:
             response_parts.append("Fertilization tips:\n\n• Test your soil first to determine specific nutrient needs\n• Use organic compost to improve soil structure naturally\n• Apply fertilizers during active growth periods\n• Common NPK ratios: 10-10-10 for general use, 5-10-10 for root crops\n• Avoid over-fertilization which can burn plant roots\n• Water after applying fertilizers to help absorption\n• Organic options: compost, manure, bone meal (slow release)\n• Chemical fertilizers work faster but use carefully")
     
-    elif any(word in query_lower for word in ['plant', 'grow', 'planting', 'seed', 'sow', 'transplant', 'seedling']):
+    elif topic == 'planting':
         # Planting query
         if rag_results:
             response_parts.append(f"About planting:\n\n{rag_results[0]}")
@@ -287,7 +315,7 @@ def chat_advisory(request):
         else:
             response_parts.append("Planting guidance:\n\n• Prepare soil well before planting (loosen, add compost)\n• Plant at the right depth (usually 2-3 times seed size)\n• Follow proper spacing guidelines for your crop\n• Choose the appropriate season (check Seasonal Guide)\n• Ensure good drainage to prevent waterlogging\n• Water thoroughly after planting\n• Start seeds indoors 6-8 weeks before last frost for warm-season crops\n• Harden off seedlings before transplanting outdoors")
     
-    elif any(word in query_lower for word in ['pest', 'insect', 'bug', 'aphid', 'mite', 'caterpillar', 'worm', 'infestation']):
+    elif topic == 'pest':
         # Pest query
         if rag_results:
             response_parts.append(f"Regarding pest management:\n\n{rag_results[0]}")
@@ -296,7 +324,7 @@ def chat_advisory(request):
         else:
             response_parts.append("Pest management:\n\n• Monitor crops regularly for early pest detection\n• Use Integrated Pest Management (IPM) approach\n• Introduce beneficial insects (ladybugs, lacewings)\n• Remove heavily infested leaves or plants\n• Use neem oil or insecticidal soap for organic control\n• Apply chemical pesticides only when necessary\n• Follow label instructions carefully and safely\n• Common pests: aphids, spider mites, whiteflies, caterpillars")
     
-    elif any(word in query_lower for word in ['soil', 'dirt', 'ground', 'ph', 'clay', 'sandy', 'loam']):
+    elif topic == 'soil':
         # Soil query
         if rag_results:
             response_parts.append(f"About soil management:\n\n{rag_results[0]}")
@@ -305,7 +333,7 @@ def chat_advisory(request):
         else:
             response_parts.append("Soil health tips:\n\n• Test soil pH regularly (most crops prefer 6.0-7.0)\n• Add organic matter through compost to improve structure\n• Practice crop rotation to maintain nutrients\n• Avoid soil compaction by not walking on beds\n• Maintain proper drainage (well-draining soil)\n• Improve clay soil: add sand and organic matter\n• Improve sandy soil: add compost and clay\n• Mulch to retain moisture and suppress weeds")
     
-    elif any(word in query_lower for word in ['harvest', 'harvesting', 'pick', 'collect', 'ripe', 'mature', 'ready']):
+    elif topic == 'harvest':
         # Harvest query
         if rag_results:
             response_parts.append(f"Regarding harvesting:\n\n{rag_results[0]}")
@@ -324,56 +352,134 @@ def chat_advisory(request):
                 response_parts.append(f"\n\nYou might also find this helpful:\n{rag_results[2]}")
         else:
             # Try to provide helpful general advice based on keywords
-            if any(word in query_lower for word in ['tomato', 'tomatoes']):
+            if crop == 'tomato':
                 response_parts.append("Tomato growing tips:\n\n• Need full sun (6-8 hours daily) and well-draining soil\n• Stake or cage plants for support\n• Water consistently at the base\n• Remove suckers (side shoots) for better fruit production\n• Watch for blight, especially in humid conditions\n• Harvest when firm but slightly yielding to pressure")
-            elif any(word in query_lower for word in ['potato', 'potatoes']):
+            elif crop == 'potato':
                 response_parts.append("Potato growing tips:\n\n• Grow in loose, well-drained soil (pH 5.0-6.0)\n• Plant seed potatoes 3-4 inches deep, 12 inches apart\n• Hill soil around plants as they grow\n• Keep soil consistently moist but not waterlogged\n• Harvest when foliage dies back\n• Store in cool, dark, dry place")
-            elif any(word in query_lower for word in ['pepper', 'peppers']):
+            elif crop == 'pepper':
                 response_parts.append("Pepper growing tips:\n\n• Need warm temperatures (70-85°F) and full sun\n• Start seeds indoors 8-10 weeks before transplanting\n• Space plants 18-24 inches apart\n• Keep soil consistently moist\n• Harvest when peppers reach desired size and color\n• Peppers are ready when they're firm and fully colored")
             else:
                 response_parts.append("Here's some general agricultural advice:\n\n• Practice crop rotation to maintain soil health\n• Monitor your crops regularly for issues\n• Use appropriate spacing for good air circulation\n• Maintain proper irrigation and fertilization\n• Test soil pH and nutrients regularly\n• Use disease-resistant varieties when possible\n• Consult local agricultural extension services for region-specific advice\n\nFeel free to ask about specific crops, diseases, pests, or farming practices!")
     
+    yield 'answer', {'text': "\n".join(response_parts), 'cached': bool(cached), 'reused': bool(reusable)}
+    
     # Add weather context if location available
-    weather_info = None
-    if user_location:
+    if weather_future:
+        deadline = settings.ADVISORY_SOURCE_DEADLINES.get('weather', settings.ADVISORY_BUDGET_SECONDS)
         try:
-            weather_response = requests.get(
-                f'http://localhost:8000/api/weather/{user_location}/',
-                headers={'Authorization': f'Bearer {request.auth}'},
-                timeout=5
-            )
-            if weather_response.status_code == 200:
-                weather_data = weather_response.json()
-                weather_info = {
-                    'temp': weather_data.get('temperature'),
-                    'desc': weather_data.get('description'),
-                    'advice': weather_data.get('advice')
-                }
-        except:
-            pass
-    
-    # Combine response parts
-    response_text = "\n".join(response_parts)
-    
-    # Add weather context at the end if available
-    if weather_info:
-        response_text += f"\n\n--- Weather Context for {user_location} ---\n"
-        response_text += f"Current conditions: {weather_info['temp']}°C, {weather_info['desc']}\n"
-        response_text += f"Weather advice: {weather_info['advice']}"
-    
-    # Add helpful closing (only for technical queries, not conversational)
-    if not any(word in query_lower for word in ['thank', 'thanks', 'hello', 'hi', 'hey', 'bye', 'goodbye']):
-        response_text += "\n\n💡 Tip: For more specific advice, you can mention your crop type, location, or upload images for disease detection!"
-    
-    return Response({
+            weather_data = weather_future.result(timeout=deadline)
+            yield 'weather', {'text': (
+                f"\n\n--- Weather Context for {user_location} ---\n"
+                f"Current conditions: {weather_data.get('temperature')}°C, {weather_data.get('description')}\n"
+                f"Weather advice: {weather_data.get('advice')}"
+            )}
+        except Exception:
+            weather_future.cancel()
+    
+    # Add helpful closing (conversational messages have already been answered above)
+    yield 'tip', {'text': "\n\n💡 Tip: For more specific advice, you can mention your crop type, location, or upload images for disease detection!"}
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def chat_advisory(request):
+    """AI chat advisory endpoint that combines all modules."""
+    user_message = request.data.get('message', '').strip()
+    user_location = request.user.location or request.data.get('location', '')
+    
+    if not user_message:
+        return Response({
+            'error': 'Message is required'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    response_text = ''
+    cached = None
+    follow_up = False
+    for event, data in chat_events(user_message, user_location, user_id=request.user.pk):
+        response_text += data.get('text', '')
+        if event == 'intent':
+            follow_up = data['follow_up']
+        if event == 'answer':
+            cached = data.get('cached')
+    
+    result = {
         'message': user_message,
         'response': response_text,
         'timestamp': datetime.now().isoformat()
-    }, status=status.HTTP_200_OK)
-
-
-
+    }
+    # Conversational replies involve no retrieval
+    if cached is not None:
+        result['cached'] = cached
+        result['follow_up'] = follow_up
+    return Response(result, status=status.HTTP_200_OK)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([NDJSONRenderer, EventStreamRenderer])
+def chat_advisory_stream(request):
+    """Chat advisory streamed as events: the answer as soon as retrieval finishes, weather and tip after.
+    
+    NDJSON by default; server-sent events with Accept: text/event-stream or ?format=sse.
+    """
+    user_message = request.data.get('message', '').strip()
+    user_location = request.user.location or request.data.get('location', '')
+    
+    if not user_message:
+        return Response({
+            'error': 'Message is required'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    renderer = request.accepted_renderer
+    
+    def stream():
+        cached = None
+        try:
+            for event, data in chat_events(user_message, user_location, user_id=request.user.pk):
+                if event == 'answer':
+                    cached = data.get('cached')
+                yield renderer.format_event(event, data)
+        except Exception:
+            # Headers are already sent, so errors are reported in the stream;
+            # the details go to the log, not to the client
+            logger.exception('Chat stream failed')
+            yield renderer.format_event('error', {'error': 'Could not generate a response. Please try again.'})
+            return
+        yield renderer.format_event('done', {
+            'message': user_message,
+            'cached': cached,
+            'timestamp': datetime.now().isoformat()
+        })
+    
+    response = StreamingHttpResponse(stream(), content_type=f'{renderer.media_type}; charset=utf-8')
+    # Keep proxies (nginx) from buffering the events
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def chat_session(request):
+    """The user's chat conversation session (GET), or end it (DELETE)."""
+    sessions = get_session_store()
+    if sessions is None:
+        return Response({'error': 'Chat sessions are disabled'}, status=status.HTTP_404_NOT_FOUND)
+    
+    if request.method == 'DELETE':
+        sessions.clear(request.user.pk)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    session = sessions.get(request.user.pk, count=False)
+    result = {'session': None, 'stats': sessions.stats()}
+    if session:
+        retrieval = session['retrieval']
+        result['session'] = {
+            'topic': session['topic'],
+            'crop': session['crop'],
+            'location': session['location'],
+            'history': session['history'],
+            'last_query': retrieval['query'] if retrieval else None,
+            'idle_seconds': round(time.monotonic() - session['updated'], 1),
+        }
+    return Response(result, status=status.HTTP_200_OK)
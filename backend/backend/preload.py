@@ -0,0 +1,42 @@
+"""
+Preload read-only model weights in the server master process.
+
+With gunicorn's preload_app (see gunicorn.conf.py) or uWSGI's default
+non-lazy apps, wsgi.py runs once in the master before workers fork. Loading
+the models here means every worker inherits the same physical pages
+copy-on-write instead of loading its own copy.
+"""
+import gc
+import time
+from django.conf import settings
+
+
+def preload_models():
+    """Load shared model state before fork. Returns per-model load times in seconds."""
+    timings = {}
+
+    # Embedding model: torch CPU tensors are never written during inference,
+    # so their pages stay shared after fork
+    from rag.embeddings import get_embedding_provider
+    provider = get_embedding_provider()
+    if provider.get() is not None:
+        timings['embedding_model'] = provider.load_seconds
+
+    # Disease model: onnxruntime sessions are not fork-safe, so workers create
+    # their own sessions, but from a copy whose weights are memory-mapped from
+    # a single external file
+    model_path = settings.MODELS_DIR / 'disease_detector.onnx'
+    if model_path.exists():
+        from disease_detection.infer import shared_model_path, prepare_shared_model
+        start = time.perf_counter()
+        shared_path = shared_model_path(model_path)
+        if not shared_path.exists() or shared_path.stat().st_mtime < model_path.stat().st_mtime:
+            prepare_shared_model(model_path)
+        timings['disease_model'] = time.perf_counter() - start
+
+    # Keep the cyclic GC in workers from touching (and un-sharing) everything loaded so far
+    gc.freeze()
+
+    for name, seconds in timings.items():
+        print(f'Preloaded {name} in {seconds:.2f}s')
+    return timings
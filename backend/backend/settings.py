@@ -143,5 +143,96 @@ PROJECT_ROOT = BASE_DIR.parent
 DATASET_DIR = PROJECT_ROOT / 'dataset' / 'plant_village'
 MODELS_DIR = PROJECT_ROOT / 'models'
 
+# Group-aware split written by `manage.py dedup_dataset` (used by training if present)
+DATASET_SPLIT_FILE = MODELS_DIR / 'dataset_split.json'
+
 # Create directories if they don't exist
 MODELS_DIR.mkdir(parents=True, exist_ok=True)
+
+# Load read-only model weights once in the server master process before workers
+# fork, so workers share those pages copy-on-write (see backend/preload.py)
+PRELOAD_MODELS = os.getenv('PRELOAD_MODELS', 'False').lower() in ('1', 'true', 'yes')
+
+# Warm models, the vector store and lookup tables in each server process at
+# startup (see backend/warmup.py); /api/ready/ answers 503 until it finishes
+WARMUP_ENABLED = os.getenv('WARMUP_ENABLED', 'False').lower() in ('1', 'true', 'yes')
+
+# RAG vector store: persisted on disk and shared by all worker processes.
+# Set RAG_CHROMA_HOST to use a Chroma server instead of the local directory.
+RAG_PERSIST_DIR = Path(os.getenv('RAG_PERSIST_DIR', str(PROJECT_ROOT / 'vector_store')))
+RAG_CHROMA_HOST = os.getenv('RAG_CHROMA_HOST', '')
+RAG_CHROMA_PORT = int(os.getenv('RAG_CHROMA_PORT', '8001'))
+# Local store only: minimum seconds between reloads of a process's Chroma
+# client after other processes (workers, the ingestion worker) write to it
+RAG_CHROMA_RELOAD_SECONDS = float(os.getenv('RAG_CHROMA_RELOAD_SECONDS', '1'))
+RAG_EMBEDDING_MODEL = os.getenv('RAG_EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
+
+# Embedding backend: 'sentence-transformers' (PyTorch) or 'onnx' (onnxruntime,
+# no torch; export the model first with `manage.py export_embedding_model`).
+# RAG_ONNX_QUANTIZED serves the int8 export; RAG_ONNX_THREADS=0 lets
+# onnxruntime choose the number of threads.
+RAG_EMBEDDING_BACKEND = os.getenv('RAG_EMBEDDING_BACKEND', 'sentence-transformers')
+RAG_ONNX_MODEL_DIR = Path(os.getenv(
+    'RAG_ONNX_MODEL_DIR', str(MODELS_DIR / 'embeddings' / RAG_EMBEDDING_MODEL.replace('/', '__'))
+))
+RAG_ONNX_QUANTIZED = os.getenv('RAG_ONNX_QUANTIZED', 'false').lower() in ('1', 'true', 'yes')
+RAG_ONNX_THREADS = int(os.getenv('RAG_ONNX_THREADS', '0'))
+
+# Vector index backend: 'chroma' (HNSW) or 'numpy' (exact search over
+# memory-mapped vectors, stored under RAG_PERSIST_DIR/numpy)
+RAG_VECTOR_BACKEND = os.getenv('RAG_VECTOR_BACKEND', 'chroma')
+
+# numpy backend only: scan int8 or binary codes instead of float32 vectors and
+# rescore the best top_k * RAG_RESCORE_FACTOR rows at full precision ('' = off)
+RAG_VECTOR_QUANTIZATION = os.getenv('RAG_VECTOR_QUANTIZATION', '')
+RAG_RESCORE_FACTOR = int(os.getenv('RAG_RESCORE_FACTOR', '8'))
+
+# Query embedding cache (0 disables). Set RAG_QUERY_CACHE_PATH to persist it to
+# a SQLite file that survives restarts.
+RAG_QUERY_CACHE_SIZE = int(os.getenv('RAG_QUERY_CACHE_SIZE', '10000'))
+RAG_QUERY_CACHE_PATH = os.getenv('RAG_QUERY_CACHE_PATH', '')
+
+# Asynchronous ingestion: the ingest endpoints queue documents in the database
+# and `manage.py process_ingestion_queue` embeds them, batching across jobs.
+# New jobs get 429 with Retry-After while RAG_INGEST_QUEUE_MAX_DOCUMENTS
+# documents are waiting. RAG_INGEST_ASYNC=false ingests inside the request.
+RAG_INGEST_ASYNC = os.getenv('RAG_INGEST_ASYNC', 'true').lower() in ('1', 'true', 'yes')
+RAG_INGEST_QUEUE_MAX_DOCUMENTS = int(os.getenv('RAG_INGEST_QUEUE_MAX_DOCUMENTS', '5000'))
+RAG_INGEST_BATCH_DOCUMENTS = int(os.getenv('RAG_INGEST_BATCH_DOCUMENTS', '200'))
+RAG_INGEST_MAX_ATTEMPTS = int(os.getenv('RAG_INGEST_MAX_ATTEMPTS', '3'))
+RAG_INGEST_STALE_SECONDS = int(os.getenv('RAG_INGEST_STALE_SECONDS', '900'))
+RAG_INGEST_RETRY_AFTER = int(os.getenv('RAG_INGEST_RETRY_AFTER', '30'))
+
+# Chat answer cache: near-duplicate questions (cosine similarity of their
+# embeddings >= threshold) reuse an earlier answer; weather is always fresh.
+# Set CHAT_ANSWER_CACHE_ENABLED=false to turn it off.
+CHAT_ANSWER_CACHE_ENABLED = os.getenv('CHAT_ANSWER_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+CHAT_ANSWER_CACHE_THRESHOLD = float(os.getenv('CHAT_ANSWER_CACHE_THRESHOLD', '0.92'))
+CHAT_ANSWER_CACHE_TTL = int(os.getenv('CHAT_ANSWER_CACHE_TTL', '3600'))
+CHAT_ANSWER_CACHE_SIZE = int(os.getenv('CHAT_ANSWER_CACHE_SIZE', '2000'))
+
+# Chat conversation sessions: each user's recent turns, topic, crop, location
+# and last retrieval, so short follow-ups ("how often?") keep their context
+# and reuse the retrieval. Idle sessions expire after CHAT_SESSION_TTL seconds.
+CHAT_SESSION_ENABLED = os.getenv('CHAT_SESSION_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+CHAT_SESSION_TTL = int(os.getenv('CHAT_SESSION_TTL', '1800'))
+CHAT_SESSION_MAX_SESSIONS = int(os.getenv('CHAT_SESSION_MAX_SESSIONS', '10000'))
+CHAT_SESSION_MAX_TURNS = int(os.getenv('CHAT_SESSION_MAX_TURNS', '10'))
+CHAT_SESSION_FOLLOWUP_MAX_WORDS = int(os.getenv('CHAT_SESSION_FOLLOWUP_MAX_WORDS', '8'))
+
+# Comprehensive advisory: weather, treatments and RAG are fetched concurrently
+# on a pool of ADVISORY_FANOUT_WORKERS threads. Each source has its own
+# deadline (seconds) and the whole fan-out a budget; sources that miss it are
+# reported as timed out and the advisory is returned without them.
+ADVISORY_BUDGET_SECONDS = float(os.getenv('ADVISORY_BUDGET_SECONDS', '3'))
+ADVISORY_SOURCE_DEADLINES = {
+    'weather': float(os.getenv('ADVISORY_WEATHER_DEADLINE', '2.5')),
+    'treatments': float(os.getenv('ADVISORY_TREATMENTS_DEADLINE', '1')),
+    'rag': float(os.getenv('ADVISORY_RAG_DEADLINE', '2.5')),
+}
+ADVISORY_FANOUT_WORKERS = int(os.getenv('ADVISORY_FANOUT_WORKERS', '16'))
+
+# Local inference service (python -m inference_service). When a socket path is
+# set, disease detection and RAG embeddings are served by it instead of in-process
+INFERENCE_SERVICE_SOCKET = os.getenv('INFERENCE_SERVICE_SOCKET', '')
+INFERENCE_SERVICE_TIMEOUT = float(os.getenv('INFERENCE_SERVICE_TIMEOUT', '10'))
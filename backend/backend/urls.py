@@ -5,6 +5,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from .views import ready
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -14,6 +15,7 @@ urlpatterns = [
     path('api/weather/', include('weather.urls')),
     path('api/market/', include('market.urls')),
     path('api/rag/', include('rag.urls')),
+    path('api/ready/', ready, name='ready'),
 ]
 
 if settings.DEBUG:
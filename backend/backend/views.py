@@ -0,0 +1,13 @@
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework import status
+from .warmup import readiness
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def ready(request):
+    """Readiness probe: 503 until this process has finished warming up."""
+    is_ready, report = readiness()
+    return Response(report, status=status.HTTP_200_OK if is_ready else status.HTTP_503_SERVICE_UNAVAILABLE)
@@ -0,0 +1,136 @@
+"""
+Startup warmup of per-process resources.
+
+Apps register warmup tasks in their AppConfig.ready(); when WARMUP_ENABLED is
+set, each server process runs them in a background thread as soon as it has
+loaded the application (wsgi.py / asgi.py, or gunicorn's post_worker_init
+when the app is preloaded in the master). Independent tasks run in parallel;
+a task waits for the tasks listed in its `after`. /api/ready/ answers 503
+until every task has finished, then 200 with per-resource times.
+
+A failed task is reported but does not keep the process unready: the views
+fall back (lexical search, default treatments) or load lazily on first use,
+as they do without warmup. If warmup itself cannot run (e.g. a dependency
+cycle), the status becomes 'failed' and /api/ready/ reports the error with a
+503 until the process is restarted.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+
+
+class WarmupSkipped(Exception):
+    """The resource is not used in this configuration (e.g. no model file)."""
+
+
+logger = logging.getLogger(__name__)
+
+_tasks = {}
+_state = {'pid': None, 'status': 'pending', 'seconds': None, 'resources': {}, 'error': None}
+_state_lock = threading.Lock()
+
+
+def register_warmup(name, fn, after=()):
+    """Register fn (no arguments) to warm a resource; it runs once the tasks in after are done."""
+    _tasks[name] = {'fn': fn, 'after': tuple(after)}
+
+
+def _run_task(name, futures):
+    task = _tasks[name]
+    for dependency in task['after']:
+        if dependency in futures:
+            futures[dependency].result()
+
+    start = time.perf_counter()
+    try:
+        detail = task['fn']()
+        result = {'status': 'ok'}
+        if detail:
+            result['detail'] = detail
+    except WarmupSkipped as e:
+        result = {'status': 'skipped', 'detail': str(e)}
+    except Exception as e:
+        result = {'status': 'error', 'detail': f'{type(e).__name__}: {e}'}
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    _state['resources'][name] = result
+    return result
+
+
+def run_warmup():
+    """Run every registered task now, in parallel where possible. Returns the results by resource."""
+    unknown = {dependency for task in _tasks.values() for dependency in task['after']} - set(_tasks)
+    if unknown:
+        raise ValueError(f'Warmup tasks depend on unregistered tasks: {sorted(unknown)}')
+
+    _state.update(status='running', seconds=None, resources={}, error=None)
+    start = time.perf_counter()
+    futures = {}
+    # One thread per task, so a task waiting on its dependencies never starves them
+    with ThreadPoolExecutor(max_workers=max(len(_tasks), 1), thread_name_prefix='warmup') as executor:
+        # Dependencies are submitted before the tasks that wait on them
+        for name in _ordered_tasks():
+            futures[name] = executor.submit(_run_task, name, futures)
+    _state.update(status='ready', seconds=round(time.perf_counter() - start, 3))
+    return dict(_state['resources'])
+
+
+def _warmup_in_background():
+    try:
+        results = run_warmup()
+    except Exception as e:
+        # e.g. a dependency cycle: report it instead of staying 'running' forever
+        logger.exception('Warmup failed')
+        _state.update(status='failed', error=f'{type(e).__name__}: {e}')
+        return
+    for name, result in results.items():
+        print(f'Warmup {name}: {result["status"]} in {result["seconds"]:.2f}s')
+
+
+def _ordered_tasks():
+    ordered, visiting = [], set()
+
+    def visit(name):
+        if name in ordered:
+            return
+        if name in visiting:
+            raise ValueError(f'Warmup dependency cycle at {name}')
+        visiting.add(name)
+        for dependency in _tasks[name]['after']:
+            visit(dependency)
+        ordered.append(name)
+
+    for name in _tasks:
+        visit(name)
+    return ordered
+
+
+def start_warmup():
+    """Start warmup in a background thread, once per process. No-op unless WARMUP_ENABLED."""
+    if not settings.WARMUP_ENABLED:
+        return False
+    with _state_lock:
+        # A forked worker inherits the master's state but none of its threads
+        if _state['pid'] == os.getpid():
+            return False
+        _state.update(pid=os.getpid(), status='pending', seconds=None, resources={}, error=None)
+    threading.Thread(target=_warmup_in_background, name='warmup', daemon=True).start()
+    return True
+
+
+def readiness():
+    """(ready, report) for the readiness endpoint."""
+    if not settings.WARMUP_ENABLED:
+        return True, {'ready': True, 'warmup': 'disabled'}
+    report = {
+        'ready': _state['status'] == 'ready',
+        'warmup': _state['status'],
+        'seconds': _state['seconds'],
+        'resources': dict(_state['resources']),
+        'pending': [name for name in _tasks if name not in _state['resources']],
+    }
+    if _state['error']:
+        report['error'] = _state['error']
+    return report['ready'], report
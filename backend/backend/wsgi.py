@@ -9,3 +9,14 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+from django.conf import settings
+
+if settings.PRELOAD_MODELS:
+    from .preload import preload_models
+    preload_models()
+else:
+    # With preloading, each gunicorn worker starts its own warmup after fork
+    # (see gunicorn.conf.py); sessions and threads do not survive fork
+    from .warmup import start_warmup
+    start_warmup()
@@ -1,6 +1,30 @@
 from django.apps import AppConfig
 
 
+def warm_disease_model():
+    from django.conf import settings
+    from backend.warmup import WarmupSkipped
+    if settings.INFERENCE_SERVICE_SOCKET:
+        raise WarmupSkipped('Served by the inference service')
+    model_path = settings.MODELS_DIR / 'disease_detector.onnx'
+    label_map_path = settings.MODELS_DIR / 'label_map.json'
+    if not model_path.exists() or not label_map_path.exists():
+        raise WarmupSkipped('Model not trained')
+
+    from .infer import get_detector
+    get_detector(model_path, label_map_path).warmup()
+
+
+def warm_treatments():
+    from .services import load_treatments
+    return f'{len(load_treatments())} diseases'
+
+
 class DiseaseDetectionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'disease_detection'
+
+    def ready(self):
+        from backend.warmup import register_warmup
+        register_warmup('disease_model', warm_disease_model)
+        register_warmup('treatments', warm_treatments)
@@ -0,0 +1,241 @@
+"""
+Near-duplicate detection and group-aware splitting for the image dataset.
+
+Images are hashed with a DCT perceptual hash (pHash) in parallel, near
+duplicates are grouped with multi-index hashing over Hamming distance, and
+whole groups are assigned to train/val/test so near-identical frames never
+leak between splits.
+"""
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+from PIL import Image
+from .preprocess import get_class_folders, list_image_files
+
+
+HASH_SIZE = 8
+HIGHFREQ_FACTOR = 4
+
+
+def _dct_matrix(n):
+    """Orthonormal DCT-II basis matrix of size n x n."""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0, :] = np.sqrt(1.0 / n)
+    return matrix
+
+
+_DCT = _dct_matrix(HASH_SIZE * HIGHFREQ_FACTOR)
+
+
+def phash(image_path):
+    """Compute a 64-bit perceptual hash of an image as an int."""
+    size = HASH_SIZE * HIGHFREQ_FACTOR
+    img = Image.open(image_path).convert('L').resize((size, size), Image.Resampling.LANCZOS)
+    pixels = np.asarray(img, dtype=np.float64)
+
+    # 2D DCT, keep the low-frequency top-left block
+    dct = _DCT @ pixels @ _DCT.T
+    low_freq = dct[:HASH_SIZE, :HASH_SIZE]
+
+    # Compare against the median, excluding the DC term
+    median = np.median(low_freq.flatten()[1:])
+    bits = (low_freq > median).flatten()
+
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def _hash_or_none(image_path):
+    try:
+        return phash(image_path)
+    except Exception:
+        return None
+
+
+def hamming_distance(a, b):
+    """Number of differing bits between two hashes."""
+    return bin(a ^ b).count('1')
+
+
+class MultiIndexHash:
+    """Multi-index hashing for Hamming radius queries on 64-bit hashes.
+
+    Each hash is split into radius + 1 disjoint bit chunks; by the pigeonhole
+    principle any hash within the radius matches at least one chunk exactly,
+    so only bucket-mates need a full distance check.
+    """
+
+    def __init__(self, radius, bits=HASH_SIZE * HASH_SIZE):
+        self.radius = radius
+        num_chunks = radius + 1
+        bounds = [round(i * bits / num_chunks) for i in range(num_chunks + 1)]
+        self.chunks = [(lo, (1 << (hi - lo)) - 1) for lo, hi in zip(bounds, bounds[1:])]
+        self.tables = [{} for _ in self.chunks]
+        self.values = {}
+
+    def add(self, value, item):
+        self.values[item] = value
+        for table, (shift, mask) in zip(self.tables, self.chunks):
+            table.setdefault((value >> shift) & mask, []).append(item)
+
+    def search(self, value):
+        """Return items whose hash is within the radius of value."""
+        candidates = set()
+        for table, (shift, mask) in zip(self.tables, self.chunks):
+            candidates.update(table.get((value >> shift) & mask, ()))
+        return [item for item in candidates
+                if hamming_distance(value, self.values[item]) <= self.radius]
+
+
+def compute_hashes(image_paths, workers=None):
+    """Hash images in parallel. Unreadable images get None."""
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        return [_hash_or_none(path) for path in image_paths]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_hash_or_none, image_paths, chunksize=64))
+
+
+def group_near_duplicates(hashes, threshold=6):
+    """Group indices whose hashes are within threshold bits of each other.
+
+    Returns a list of group ids, one per hash (None for unhashed images).
+    """
+    parent = list(range(len(hashes)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    index = MultiIndexHash(threshold)
+    for idx, value in enumerate(hashes):
+        if value is None:
+            continue
+        for match in index.search(value):
+            root_a, root_b = find(idx), find(match)
+            if root_a != root_b:
+                parent[root_b] = root_a
+        index.add(value, idx)
+
+    return [find(idx) if value is not None else None for idx, value in enumerate(hashes)]
+
+
+def group_aware_split(groups, labels, train_ratio=0.7, val_ratio=0.15, test_ratio=0.15, seed=42):
+    """Assign whole groups to splits, balancing ratios per class.
+
+    Returns a dict mapping group id to 'train', 'val' or 'test'.
+    """
+    ratios = {'train': train_ratio, 'val': val_ratio, 'test': test_ratio}
+
+    # Collect group sizes under each group's dominant class
+    members = {}
+    for group, label in zip(groups, labels):
+        if group is not None:
+            members.setdefault(group, []).append(label)
+
+    groups_by_class = {}
+    for group, group_labels in members.items():
+        dominant = max(set(group_labels), key=group_labels.count)
+        groups_by_class.setdefault(dominant, []).append((group, len(group_labels)))
+
+    rng = random.Random(seed)
+    assignment = {}
+    for class_groups in groups_by_class.values():
+        rng.shuffle(class_groups)
+        class_groups.sort(key=lambda g: g[1], reverse=True)
+
+        total = sum(size for _, size in class_groups)
+        counts = {name: 0 for name in ratios}
+
+        # Largest groups first, each to the split furthest below its target
+        for group, size in class_groups:
+            name = max(ratios, key=lambda n: ratios[n] * total - counts[n])
+            assignment[group] = name
+            counts[name] += size
+
+    return assignment
+
+
+def build_dedup_split(dataset_dir, threshold=6, workers=None, keep_duplicates=False,
+                      train_ratio=0.7, val_ratio=0.15, test_ratio=0.15, seed=42):
+    """Hash the dataset, group near-duplicates and build a group-aware split.
+
+    Unless keep_duplicates is set, only one image per (group, class) is kept.
+    """
+    dataset_path = Path(dataset_dir)
+    class_folders = get_class_folders(dataset_dir)
+
+    image_paths = []
+    labels = []
+    for class_idx, folder in enumerate(class_folders):
+        for img in sorted(list_image_files(folder)):
+            image_paths.append(img)
+            labels.append(class_idx)
+
+    hashes = compute_hashes(image_paths, workers)
+    groups = group_near_duplicates(hashes, threshold)
+    assignment = group_aware_split(groups, labels, train_ratio, val_ratio, test_ratio, seed)
+
+    split = {'train': [], 'val': [], 'test': []}
+    seen = set()
+    duplicates_removed = 0
+    unreadable = 0
+    group_labels = {}
+
+    for img, label, group in zip(image_paths, labels, groups):
+        if group is None:
+            unreadable += 1
+            continue
+        group_labels.setdefault(group, set()).add(label)
+
+        if not keep_duplicates:
+            if (group, label) in seen:
+                duplicates_removed += 1
+                continue
+            seen.add((group, label))
+
+        relative = img.relative_to(dataset_path).as_posix()
+        split[assignment[group]].append([relative, label])
+
+    group_sizes = {}
+    for group in groups:
+        if group is not None:
+            group_sizes[group] = group_sizes.get(group, 0) + 1
+
+    stats = {
+        'images': len(image_paths),
+        'unreadable': unreadable,
+        'groups': len(group_sizes),
+        'duplicate_groups': sum(1 for size in group_sizes.values() if size > 1),
+        'duplicates_removed': duplicates_removed,
+        'cross_class_groups': sum(1 for g in group_labels.values() if len(g) > 1),
+        'train_samples': len(split['train']),
+        'val_samples': len(split['val']),
+        'test_samples': len(split['test']),
+    }
+
+    return {
+        'hash': 'phash64',
+        'threshold': threshold,
+        'keep_duplicates': keep_duplicates,
+        'stats': stats,
+        **split,
+    }
+
+
+def save_split(split, output_path):
+    """Write a split produced by build_dedup_split to JSON."""
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(split, f)
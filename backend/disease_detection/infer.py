@@ -1,4 +1,5 @@
 import json
+import threading
 import numpy as np
 import onnxruntime as ort
 from PIL import Image
@@ -6,8 +7,75 @@ from pathlib import Path
 import torchvision.transforms as transforms
 
 
+# Process-wide detector cache, keyed by model/label map path and mtime
+_detectors = {}
+_detectors_lock = threading.Lock()
+
+
+def shared_model_path(model_path):
+    """Path of the pre-optimized, external-weights copy of a model."""
+    model_path = Path(model_path)
+    return model_path.with_name(f'{model_path.stem}.shared.onnx')
+
+
+def prepare_shared_model(model_path):
+    """Write a pre-optimized copy of the model with its weights in an external file.
+    
+    Sessions created from this copy memory-map the weight file instead of
+    copying weights onto the heap, so every worker process on the node shares
+    the same physical pages.
+    """
+    model_path = Path(model_path)
+    output_path = shared_model_path(model_path)
+    
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+    options.optimized_model_filepath = str(output_path)
+    options.add_session_config_entry(
+        'session.optimized_model_external_initializers_file_name', f'{output_path.name}.data'
+    )
+    options.add_session_config_entry('session.optimized_model_external_initializers_min_size_in_bytes', '1024')
+    
+    # Creating the session writes the optimized model; it is discarded right away
+    session = ort.InferenceSession(str(model_path), options, providers=['CPUExecutionProvider'])
+    del session
+    return output_path
+
+
+def _shared_session_options():
+    options = ort.SessionOptions()
+    # Already optimized offline; fusing again would copy weights into private memory
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+    options.add_session_config_entry('session.disable_prepacking', '1')
+    return options
+
+
+def get_detector(model_path, label_map_path):
+    """Return the process-wide DiseaseDetector, creating it on first use.
+    
+    Uses the shared-weights copy of the model when it is up to date.
+    """
+    model_path = Path(model_path)
+    key = (str(model_path), str(label_map_path), model_path.stat().st_mtime)
+    detector = _detectors.get(key)
+    if detector is not None:
+        return detector
+    
+    with _detectors_lock:
+        detector = _detectors.get(key)
+        if detector is None:
+            shared_path = shared_model_path(model_path)
+            if shared_path.exists() and shared_path.stat().st_mtime >= model_path.stat().st_mtime:
+                detector = DiseaseDetector(shared_path, label_map_path, session_options=_shared_session_options())
+            else:
+                detector = DiseaseDetector(model_path, label_map_path)
+            _detectors.clear()
+            _detectors[key] = detector
+    return detector
+
+
 class DiseaseDetector:
-    def __init__(self, model_path, label_map_path):
+    def __init__(self, model_path, label_map_path, session_options=None):
         self.model_path = Path(model_path)
         self.label_map_path = Path(label_map_path)
         
@@ -19,7 +87,7 @@ class DiseaseDetector:
         self.idx_to_class = {int(k): v for k, v in self.label_map.items()}
         
         # Initialize ONNX runtime session
-        self.session = ort.InferenceSession(str(self.model_path))
+        self.session = ort.InferenceSession(str(self.model_path), session_options)
         
         # Image preprocessing
         self.transform = transforms.Compose([
@@ -29,7 +97,7 @@ class DiseaseDetector:
         ])
     
     def preprocess_image(self, image_path):
-        """Preprocess image for inference."""
+        """Preprocess image (path or file object) for inference."""
         img = Image.open(image_path).convert('RGB')
         img_tensor = self.transform(img)
         img_array = img_tensor.unsqueeze(0).numpy()
@@ -37,15 +105,28 @@ class DiseaseDetector:
     
     def predict(self, image_path):
         """Predict disease from image."""
-        # Preprocess image
-        img_array = self.preprocess_image(image_path)
+        return self.predict_batch([image_path])[0]
+    
+    def predict_batch(self, images):
+        """Predict diseases for several images (paths or file objects) in one run."""
+        return self.predict_preprocessed([self.preprocess_image(image) for image in images])
+    
+    def predict_preprocessed(self, img_arrays):
+        """Predict diseases for images already run through preprocess_image, in one run."""
+        img_array = np.concatenate(img_arrays)
         
         # Run inference
         input_name = self.session.get_inputs()[0].name
         outputs = self.session.run(None, {input_name: img_array})
         
-        # Get predictions
-        predictions = outputs[0][0]
+        return [self._format_prediction(predictions) for predictions in outputs[0]]
+    
+    def warmup(self):
+        """Run one inference on a blank image so the first request does not pay for it."""
+        input_name = self.session.get_inputs()[0].name
+        self.session.run(None, {input_name: np.zeros((1, 3, 224, 224), dtype=np.float32)})
+    
+    def _format_prediction(self, predictions):
         probabilities = np.exp(predictions) / np.sum(np.exp(predictions))  # Softmax
         
         # Get top prediction
@@ -0,0 +1,57 @@
+"""
+Django management command to find near-duplicate images and write a group-aware split.
+Usage: python manage.py dedup_dataset [--threshold 6] [--workers 8] [--keep-duplicates]
+"""
+import time
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from disease_detection.dedup import build_dedup_split, save_split
+
+
+class Command(BaseCommand):
+    help = 'Detect near-duplicate images with perceptual hashes and write a deduplicated, group-aware split'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=int, default=6,
+                            help='Maximum Hamming distance (out of 64 bits) for two images to be near-duplicates')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Number of hashing processes (default: CPU count)')
+        parser.add_argument('--keep-duplicates', action='store_true',
+                            help='Keep every image, only keeping duplicate groups within one split')
+        parser.add_argument('--output', default=str(settings.DATASET_SPLIT_FILE),
+                            help='Where to write the split JSON')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        dataset_dir = settings.DATASET_DIR
+        if not dataset_dir.exists():
+            self.stdout.write(self.style.ERROR(f'Dataset directory not found: {dataset_dir}'))
+            return
+
+        self.stdout.write(f'Hashing images in {dataset_dir}...')
+        start = time.perf_counter()
+        split = build_dedup_split(
+            dataset_dir,
+            threshold=options['threshold'],
+            workers=options['workers'],
+            keep_duplicates=options['keep_duplicates'],
+            seed=options['seed'],
+        )
+        elapsed = time.perf_counter() - start
+
+        save_split(split, options['output'])
+
+        stats = split['stats']
+        self.stdout.write(self.style.SUCCESS(f'Processed {stats["images"]} images in {elapsed:.1f}s'))
+        self.stdout.write(f'  Groups: {stats["groups"]} ({stats["duplicate_groups"]} with near-duplicates)')
+        self.stdout.write(f'  Duplicates removed: {stats["duplicates_removed"]}')
+        if stats['unreadable']:
+            self.stdout.write(self.style.WARNING(f'  Unreadable images skipped: {stats["unreadable"]}'))
+        if stats['cross_class_groups']:
+            self.stdout.write(self.style.WARNING(
+                f'  Groups spanning several classes: {stats["cross_class_groups"]} (possible label noise)'
+            ))
+        self.stdout.write(
+            f'  Train: {stats["train_samples"]}, Val: {stats["val_samples"]}, Test: {stats["test_samples"]}'
+        )
+        self.stdout.write(self.style.SUCCESS(f'✓ Split saved to {options["output"]}'))
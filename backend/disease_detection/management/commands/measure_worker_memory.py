@@ -0,0 +1,78 @@
+"""
+Django management command to measure per-worker memory of a running server.
+Usage: python manage.py measure_worker_memory --pid <master pid> [--output before.json]
+
+Run once with PRELOAD_MODELS unset and once with PRELOAD_MODELS=1 (after
+sending a request that touches disease detection and RAG to every worker)
+and compare the unique (USS) memory per worker.
+"""
+import json
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+
+
+FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def read_smaps_rollup(pid):
+    """Memory counters of a process in KiB, from /proc/<pid>/smaps_rollup."""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup', 'r') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].rstrip(':') in FIELDS:
+                values[parts[0].rstrip(':')] = int(parts[1])
+    values['Uss'] = values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+    return values
+
+
+def child_pids(pid):
+    """Direct children of a process."""
+    children = []
+    for task in Path(f'/proc/{pid}/task').iterdir():
+        children_file = task / 'children'
+        if children_file.exists():
+            children.extend(int(child) for child in children_file.read_text().split())
+    return sorted(set(children))
+
+
+class Command(BaseCommand):
+    help = 'Report RSS, PSS and unique (USS) memory of each server worker process'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pid', type=int, required=True, help='PID of the gunicorn/uWSGI master')
+        parser.add_argument('--output', default=None, help='Write the measurements to this JSON file')
+
+    def handle(self, *args, **options):
+        master = options['pid']
+        if not Path(f'/proc/{master}').exists():
+            raise CommandError(f'No such process: {master}')
+
+        workers = child_pids(master)
+        if not workers:
+            raise CommandError(f'Process {master} has no worker processes')
+
+        report = {'master': {'pid': master, **read_smaps_rollup(master)}, 'workers': []}
+        self.stdout.write(f'{"pid":>8} {"RSS MiB":>9} {"PSS MiB":>9} {"USS MiB":>9}')
+        for pid in [master] + workers:
+            memory = read_smaps_rollup(pid)
+            if pid != master:
+                report['workers'].append({'pid': pid, **memory})
+            label = f'{pid}{"*" if pid == master else ""}'
+            self.stdout.write(
+                f'{label:>8} {memory["Rss"] / 1024:>9.1f} {memory["Pss"] / 1024:>9.1f} {memory["Uss"] / 1024:>9.1f}'
+            )
+
+        worker_uss = [w['Uss'] for w in report['workers']]
+        report['mean_worker_uss_kib'] = sum(worker_uss) / len(worker_uss)
+        report['total_pss_kib'] = report['master']['Pss'] + sum(w['Pss'] for w in report['workers'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\nMean unique memory per worker: {report["mean_worker_uss_kib"] / 1024:.1f} MiB'
+        ))
+        self.stdout.write(f'Total proportional memory (master + workers): {report["total_pss_kib"] / 1024:.1f} MiB')
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'✓ Measurements saved to {options["output"]}'))
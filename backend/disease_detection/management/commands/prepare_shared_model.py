@@ -0,0 +1,21 @@
+"""
+Django management command to write the shared-weights copy of the ONNX model.
+Usage: python manage.py prepare_shared_model
+"""
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from disease_detection.infer import prepare_shared_model
+
+
+class Command(BaseCommand):
+    help = 'Write a pre-optimized ONNX model with memory-mapped external weights shared by all workers'
+
+    def handle(self, *args, **options):
+        model_path = settings.MODELS_DIR / 'disease_detector.onnx'
+        if not model_path.exists():
+            self.stdout.write(self.style.ERROR(f'Model file not found at {model_path}'))
+            return
+
+        output_path = prepare_shared_model(model_path)
+        self.stdout.write(self.style.SUCCESS(f'✓ Shared model written to {output_path}'))
+        self.stdout.write(f'  Weights: {output_path}.data')
@@ -0,0 +1,86 @@
+"""
+Django management command to run a hyperparameter sweep with successive halving.
+Usage: python manage.py sweep_hyperparams [--trials 27] [--cpus-per-trial 2] [--max-epochs 9] [--val-images 1000]
+"""
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from disease_detection.sweep import (
+    build_image_cache, sample_configs, successive_halving, rank_results, write_results_table
+)
+
+
+class Command(BaseCommand):
+    help = 'Tune learning rate, batch size and StepLR schedule with parallel successive-halving trials'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trials', type=int, default=27, help='Number of sampled configurations')
+        parser.add_argument('--min-epochs', type=int, default=1, help='Epoch budget of the first rung')
+        parser.add_argument('--max-epochs', type=int, default=9, help='Epoch budget of the final rung')
+        parser.add_argument('--eta', type=int, default=3, help='Keep 1/eta of the trials at each rung')
+        parser.add_argument('--cpus-per-trial', type=int, default=1, help='Torch threads per trial process')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Concurrent trials (default: CPU count / cpus-per-trial)')
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help='Cap training batches per epoch for shorter trials')
+        parser.add_argument('--val-images', type=int, default=1000,
+                            help='Validation images every trial is scored on, drawn per class (0 = all)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--name', default=time.strftime('sweep_%Y%m%d_%H%M%S'),
+                            help='Sweep name (output directory under models/sweeps)')
+
+    def handle(self, *args, **options):
+        # Anything else never narrows the field or never reaches max_epochs
+        if options['trials'] < 1:
+            raise CommandError('--trials must be at least 1')
+        if options['eta'] < 2:
+            raise CommandError('--eta must be at least 2')
+        if not 1 <= options['min_epochs'] <= options['max_epochs']:
+            raise CommandError('--min-epochs must be at least 1 and at most --max-epochs')
+        if options['val_images'] < 0:
+            raise CommandError('--val-images must not be negative')
+
+        dataset_dir = settings.DATASET_DIR
+        if not dataset_dir.exists():
+            self.stdout.write(self.style.ERROR(f'Dataset directory not found: {dataset_dir}'))
+            return
+
+        sweeps_dir = settings.MODELS_DIR / 'sweeps'
+        output_dir = sweeps_dir / options['name']
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        # One decoded cache shared by every trial (and reused across sweeps)
+        self.stdout.write('Preparing decoded image cache...')
+        split_file = settings.DATASET_SPLIT_FILE if settings.DATASET_SPLIT_FILE.exists() else None
+        cache_dir = build_image_cache(dataset_dir, sweeps_dir / 'image_cache', split_file=split_file)
+        self.stdout.write(self.style.SUCCESS(f'Image cache ready at {cache_dir}'))
+
+        configs = sample_configs(options['trials'], seed=options['seed'])
+        start = time.perf_counter()
+        results = successive_halving(
+            configs,
+            cache_dir,
+            output_dir,
+            min_epochs=options['min_epochs'],
+            max_epochs=options['max_epochs'],
+            eta=options['eta'],
+            cpus_per_trial=options['cpus_per_trial'],
+            max_workers=options['workers'],
+            max_batches=options['max_batches'],
+            val_images=options['val_images'],
+            seed=options['seed'],
+            log=self.stdout.write,
+        )
+        elapsed = time.perf_counter() - start
+
+        results_path = output_dir / 'results.csv'
+        write_results_table(results, results_path)
+
+        self.stdout.write(self.style.SUCCESS(f'\nSweep finished in {elapsed / 60:.1f} min'))
+        self.stdout.write(f'{"rank":>4} {"trial":>5} {"epochs":>6} {"val_acc":>8} {"lr":>9} {"batch":>5} {"step":>4} {"gamma":>5}')
+        for rank, result in enumerate(rank_results(results)[:10], start=1):
+            self.stdout.write(
+                f'{rank:>4} {result["trial_id"]:>5} {result["epochs"]:>6} {result["val_acc"]:>7.2f}% '
+                f'{result["learning_rate"]:>9.2e} {result["batch_size"]:>5} {result["step_size"]:>4} {result["gamma"]:>5}'
+            )
+        self.stdout.write(self.style.SUCCESS(f'✓ Ranked results saved to {results_path}'))
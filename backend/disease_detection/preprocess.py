@@ -30,6 +30,12 @@ def get_class_folders(dataset_dir):
     return sorted(class_folders)
 
 
+def list_image_files(folder):
+    """List image files in a class folder."""
+    folder = Path(folder)
+    return list(folder.glob('*.JPG')) + list(folder.glob('*.jpg')) + list(folder.glob('*.png'))
+
+
 def create_label_map(dataset_dir, output_path):
     """Create label map from dataset structure."""
     class_folders = get_class_folders(dataset_dir)
@@ -45,8 +51,30 @@ def create_label_map(dataset_dir, output_path):
     return label_map
 
 
-def split_dataset(dataset_dir, train_ratio=0.7, val_ratio=0.15, test_ratio=0.15):
-    """Split dataset into train, validation, and test sets."""
+def load_split_file(split_file, dataset_dir):
+    """Load a precomputed split (e.g. from the dedup_dataset command).
+
+    Paths in the split file are relative to the dataset directory.
+    """
+    with open(split_file, 'r') as f:
+        split = json.load(f)
+    
+    dataset_path = Path(dataset_dir)
+    return tuple(
+        [(str(dataset_path / img), label) for img, label in split[name]]
+        for name in ('train', 'val', 'test')
+    )
+
+
+def split_dataset(dataset_dir, train_ratio=0.7, val_ratio=0.15, test_ratio=0.15, split_file=None):
+    """Split dataset into train, validation, and test sets.
+    
+    If split_file points to an existing group-aware split, it is used instead
+    of splitting per file.
+    """
+    if split_file and Path(split_file).exists():
+        return load_split_file(split_file, dataset_dir)
+    
     class_folders = get_class_folders(dataset_dir)
     
     train_data = []
@@ -54,7 +82,7 @@ def split_dataset(dataset_dir, train_ratio=0.7, val_ratio=0.15, test_ratio=0.15)
     test_data = []
     
     for class_idx, folder in enumerate(class_folders):
-        image_files = list(folder.glob('*.JPG')) + list(folder.glob('*.jpg')) + list(folder.glob('*.png'))
+        image_files = list_image_files(folder)
         
         # Split images for this class
         train, temp = train_test_split(image_files, test_size=(1 - train_ratio), random_state=42)
@@ -0,0 +1,39 @@
+"""
+Disease treatment lookups shared by the detection endpoints and the advisory.
+
+disease_treatments.json is parsed once and re-read only when the file changes,
+instead of on every detection or advisory request.
+"""
+import json
+import threading
+from django.conf import settings
+
+DEFAULT_TREATMENT = {
+    'general': 'Consult with agricultural experts for specific treatment recommendations.',
+    'prevention': 'Maintain good crop hygiene and monitor regularly.'
+}
+
+_treatments = {'mtime': None, 'data': {}}
+_treatments_lock = threading.Lock()
+
+
+def load_treatments():
+    """Treatments by disease class from disease_treatments.json ({} if it is missing)."""
+    treatments_path = settings.MODELS_DIR / 'disease_treatments.json'
+    try:
+        mtime = treatments_path.stat().st_mtime
+    except OSError:
+        return {}
+    
+    if _treatments['mtime'] != mtime:
+        with _treatments_lock:
+            if _treatments['mtime'] != mtime:
+                with open(treatments_path, 'r') as f:
+                    data = json.load(f)
+                _treatments.update(mtime=mtime, data=data)
+    return _treatments['data']
+
+
+def get_treatment(predicted_class):
+    """Look up treatment information for a predicted disease class."""
+    return load_treatments().get(predicted_class, DEFAULT_TREATMENT)
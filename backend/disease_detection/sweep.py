@@ -0,0 +1,340 @@
+"""
+Hyperparameter sweep for the disease detection model.
+
+Trials run in separate processes with a fixed CPU thread budget each and are
+pruned with successive halving: every rung trains the surviving trials for a
+larger epoch budget (resuming from their checkpoints) and keeps the best
+1/eta of them. All trials read the same decoded image cache, a memory-mapped
+uint8 array built once from the JPEGs, so the OS page cache is shared between
+trial processes instead of each trial re-decoding the dataset.
+
+Every trial is scored on the same validation images: a seeded subset drawn
+per class in proportion to the validation set, fixed before the first rung.
+"""
+import csv
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+from PIL import Image
+from .preprocess import get_class_folders, split_dataset
+
+
+IMAGE_SIZE = 224
+
+# Search space sampled by sample_configs
+SEARCH_SPACE = {
+    'learning_rate': (1e-4, 1e-2),
+    'batch_size': [16, 32, 64],
+    'step_size': [2, 3, 5],
+    'gamma': [0.1, 0.3, 0.5],
+}
+
+
+def _decode_image(img_path):
+    img = Image.open(img_path).convert('RGB')
+    return np.asarray(img.resize((IMAGE_SIZE, IMAGE_SIZE), Image.Resampling.BILINEAR), dtype=np.uint8)
+
+
+def _decode_range(args):
+    cache_file, paths, start = args
+    images = np.load(cache_file, mmap_mode='r+')
+    for offset, img_path in enumerate(paths):
+        images[start + offset] = _decode_image(img_path)
+    images.flush()
+    return len(paths)
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def cache_key(dataset_dir, split_file, train_data, val_data):
+    """What a decoded cache was built from; a cache with a different key is rebuilt."""
+    if split_file and not Path(split_file).exists():
+        # split_dataset falls back to a per-file split
+        split_file = None
+    return {
+        'dataset_dir': str(dataset_dir),
+        'split_file': str(split_file) if split_file else None,
+        'split_sha256': _sha256(Path(split_file).read_bytes()) if split_file else None,
+        'samples_sha256': _sha256(json.dumps([train_data, val_data]).encode('utf-8')),
+        'image_size': IMAGE_SIZE,
+    }
+
+
+def build_image_cache(dataset_dir, cache_dir, split_file=None, workers=None):
+    """Decode the train/val images once into memory-mappable .npy files.
+
+    Returns the cache directory. An existing cache is reused if it was built
+    from the same split (file path and contents, and the resulting samples).
+    """
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    info_path = cache_dir / 'cache_info.json'
+
+    train_data, val_data, _ = split_dataset(dataset_dir, split_file=split_file)
+    key = cache_key(dataset_dir, split_file, train_data, val_data)
+    if info_path.exists():
+        with open(info_path, 'r') as f:
+            info = json.load(f)
+        if all(info.get(field) == value for field, value in key.items()):
+            return cache_dir
+        # Removed first, so an interrupted rebuild is never taken for a valid cache
+        info_path.unlink()
+
+    workers = workers or os.cpu_count() or 1
+
+    for name, data in (('train', train_data), ('val', val_data)):
+        cache_file = cache_dir / f'{name}_images.npy'
+        images = np.lib.format.open_memmap(
+            cache_file, mode='w+', dtype=np.uint8, shape=(len(data), IMAGE_SIZE, IMAGE_SIZE, 3)
+        )
+        del images
+        np.save(cache_dir / f'{name}_labels.npy', np.array([label for _, label in data], dtype=np.int64))
+
+        # Decode in parallel, each worker filling its own slice of the memmap
+        paths = [img_path for img_path, _ in data]
+        chunk = max(1, math.ceil(len(paths) / (workers * 4)))
+        jobs = [(str(cache_file), paths[i:i + chunk], i) for i in range(0, len(paths), chunk)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(_decode_range, jobs))
+
+    with open(info_path, 'w') as f:
+        json.dump({
+            **key,
+            'num_classes': len(get_class_folders(dataset_dir)),
+            'train_samples': len(train_data),
+            'val_samples': len(val_data),
+        }, f, indent=2)
+
+    return cache_dir
+
+
+class CachedImageDataset:
+    """Dataset over a decoded image cache, opened read-only and memory-mapped."""
+
+    def __init__(self, cache_dir, name, transform=None):
+        self.images_path = Path(cache_dir) / f'{name}_images.npy'
+        self.labels = np.load(Path(cache_dir) / f'{name}_labels.npy')
+        self.transform = transform
+        self.images = None
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, idx):
+        # Open lazily so DataLoader workers each map the file themselves
+        if self.images is None:
+            self.images = np.load(self.images_path, mmap_mode='r')
+
+        img = Image.fromarray(np.array(self.images[idx]))
+        if self.transform:
+            img = self.transform(img)
+        return img, int(self.labels[idx])
+
+
+def stratified_subset(labels, size, seed=42):
+    """Sorted indices of `size` samples drawn per class in proportion to labels.
+
+    Every class keeps at least one sample while size allows. A size of 0 or
+    at least len(labels) selects everything.
+    """
+    labels = np.asarray(labels)
+    if not size or size >= len(labels):
+        return list(range(len(labels)))
+
+    rng = np.random.default_rng(seed)
+    classes, counts = np.unique(labels, return_counts=True)
+    quotas = np.floor(counts * size / len(labels)).astype(int)
+    if size >= len(classes):
+        quotas = np.maximum(quotas, 1)
+        # Pay for those minimums from the largest classes
+        while quotas.sum() > size:
+            quotas[np.argmax(quotas)] -= 1
+    # Hand out what rounding left over to the classes with the largest remainders
+    remainders = counts * size / len(labels) - quotas
+    for idx in np.argsort(-remainders):
+        if quotas.sum() >= size:
+            break
+        if quotas[idx] < counts[idx]:
+            quotas[idx] += 1
+
+    chosen = []
+    for label, quota in zip(classes, quotas):
+        members = np.flatnonzero(labels == label)
+        chosen.extend(rng.choice(members, size=quota, replace=False).tolist())
+    return sorted(chosen)
+
+
+def sample_configs(num_trials, seed=42):
+    """Sample trial configurations from SEARCH_SPACE."""
+    rng = random.Random(seed)
+    low, high = SEARCH_SPACE['learning_rate']
+    configs = []
+    for trial_id in range(num_trials):
+        configs.append({
+            'trial_id': trial_id,
+            'learning_rate': 10 ** rng.uniform(math.log10(low), math.log10(high)),
+            'batch_size': rng.choice(SEARCH_SPACE['batch_size']),
+            'step_size': rng.choice(SEARCH_SPACE['step_size']),
+            'gamma': rng.choice(SEARCH_SPACE['gamma']),
+        })
+    return configs
+
+
+def run_trial(config, cache_dir, trial_dir, epochs, cpu_threads=1, max_batches=None, val_indices=None):
+    """Train one trial up to `epochs` total epochs, resuming from its checkpoint.
+
+    max_batches caps the training batches per epoch; the trial is scored on
+    the validation images at val_indices (all of them if None). Runs in a
+    worker process; returns the trial's result dict.
+    """
+    import torch
+    import torch.nn as nn
+    import torch.optim as optim
+    from torch.utils.data import DataLoader, Subset
+    from torchvision import transforms
+    from .train import create_model, train_one_epoch, evaluate
+
+    torch.set_num_threads(cpu_threads)
+    device = torch.device('cpu')
+
+    train_transform = transforms.Compose([
+        transforms.RandomHorizontalFlip(p=0.5),
+        transforms.RandomRotation(degrees=15),
+        transforms.ColorJitter(brightness=0.2, contrast=0.2),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+    ])
+    val_transform = transforms.Compose([
+        transforms.ToTensor(),
+        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+    ])
+
+    with open(Path(cache_dir) / 'cache_info.json', 'r') as f:
+        num_classes = json.load(f)['num_classes']
+
+    train_loader = DataLoader(CachedImageDataset(cache_dir, 'train', train_transform),
+                              batch_size=config['batch_size'], shuffle=True)
+    val_dataset = CachedImageDataset(cache_dir, 'val', val_transform)
+    if val_indices is not None:
+        val_dataset = Subset(val_dataset, val_indices)
+    val_loader = DataLoader(val_dataset, batch_size=config['batch_size'], shuffle=False)
+
+    model = create_model(num_classes).to(device)
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.Adam(model.parameters(), lr=config['learning_rate'])
+    scheduler = optim.lr_scheduler.StepLR(optimizer, step_size=config['step_size'], gamma=config['gamma'])
+
+    trial_dir = Path(trial_dir)
+    trial_dir.mkdir(parents=True, exist_ok=True)
+    checkpoint_path = trial_dir / 'checkpoint.pth'
+
+    start_epoch = 0
+    if checkpoint_path.exists():
+        checkpoint = torch.load(checkpoint_path, map_location=device)
+        model.load_state_dict(checkpoint['model_state_dict'])
+        optimizer.load_state_dict(checkpoint['optimizer_state_dict'])
+        scheduler.load_state_dict(checkpoint['scheduler_state_dict'])
+        start_epoch = checkpoint['epoch']
+
+    start = time.perf_counter()
+    for epoch in range(start_epoch, epochs):
+        train_one_epoch(model, train_loader, criterion, optimizer, device,
+                        desc=f'Trial {config["trial_id"]} epoch {epoch+1}/{epochs}', max_batches=max_batches)
+        scheduler.step()
+
+    val_loss, val_acc = evaluate(model, val_loader, criterion, device)
+
+    torch.save({
+        'epoch': epochs,
+        'model_state_dict': model.state_dict(),
+        'optimizer_state_dict': optimizer.state_dict(),
+        'scheduler_state_dict': scheduler.state_dict(),
+    }, checkpoint_path)
+
+    return {
+        **config,
+        'epochs': epochs,
+        'val_loss': val_loss,
+        'val_acc': val_acc,
+        'train_seconds': time.perf_counter() - start,
+    }
+
+
+def successive_halving(configs, cache_dir, output_dir, min_epochs=1, max_epochs=9, eta=3,
+                       cpus_per_trial=1, max_workers=None, max_batches=None, val_images=None, seed=42,
+                       log=print):
+    """Run successive halving over configs. Returns every trial's latest result.
+
+    Trials are scored on one stratified subset of val_images validation images
+    (the whole validation set if None or 0), saved to val_subset.json.
+    """
+    if eta < 2 or not 1 <= min_epochs <= max_epochs:
+        raise ValueError('successive halving needs eta >= 2 and 1 <= min_epochs <= max_epochs')
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    max_workers = max_workers or max(1, (os.cpu_count() or 1) // cpus_per_trial)
+
+    val_labels = np.load(Path(cache_dir) / 'val_labels.npy')
+    val_indices = stratified_subset(val_labels, val_images, seed=seed)
+    with open(output_dir / 'val_subset.json', 'w') as f:
+        json.dump({'seed': seed, 'images': len(val_indices), 'indices': val_indices}, f)
+    log(f'Scoring trials on {len(val_indices)} of {len(val_labels)} validation images')
+
+    # Spawn rather than fork: torch thread pools do not survive fork
+    context = multiprocessing.get_context('spawn')
+
+    results = {}
+    survivors = list(configs)
+    epochs = min_epochs
+    rung = 0
+    while survivors:
+        log(f'Rung {rung}: {len(survivors)} trial(s) at {epochs} epoch(s)')
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+            futures = [
+                executor.submit(run_trial, config, str(cache_dir), str(output_dir / f'trial_{config["trial_id"]}'),
+                                epochs, cpus_per_trial, max_batches, val_indices)
+                for config in survivors
+            ]
+            rung_results = []
+            for future in futures:
+                result = {**future.result(), 'rung': rung}
+                results[result['trial_id']] = result
+                rung_results.append(result)
+
+        if epochs >= max_epochs or len(survivors) <= 1:
+            break
+
+        # Keep the best 1/eta of this rung and give them eta times the budget
+        rung_results.sort(key=lambda r: r['val_acc'], reverse=True)
+        keep = max(1, len(rung_results) // eta)
+        kept_ids = {r['trial_id'] for r in rung_results[:keep]}
+        survivors = [config for config in survivors if config['trial_id'] in kept_ids]
+        epochs = min(epochs * eta, max_epochs)
+        rung += 1
+
+    return list(results.values())
+
+
+def rank_results(results):
+    """Sort results best first: furthest rung, then validation accuracy."""
+    return sorted(results, key=lambda r: (r['rung'], r['val_acc']), reverse=True)
+
+
+def write_results_table(results, output_path):
+    """Write ranked results to CSV."""
+    fields = ['rank', 'trial_id', 'rung', 'epochs', 'val_acc', 'val_loss',
+              'learning_rate', 'batch_size', 'step_size', 'gamma', 'train_seconds']
+    with open(output_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        for rank, result in enumerate(rank_results(results), start=1):
+            writer.writerow({**result, 'rank': rank})
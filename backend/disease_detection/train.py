@@ -30,7 +30,7 @@ class PlantDiseaseDataset(Dataset):
         return img, label
 
 
-def get_data_loaders(dataset_dir, batch_size=32, num_workers=0):
+def get_data_loaders(dataset_dir, batch_size=32, num_workers=0, split_file=None):
     """Create data loaders for train, validation, and test sets."""
     # Use num_workers=0 on Windows to avoid multiprocessing issues
     import platform
@@ -52,7 +52,7 @@ def get_data_loaders(dataset_dir, batch_size=32, num_workers=0):
         transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
     ])
     
-    train_data, val_data, test_data = split_dataset(dataset_dir)
+    train_data, val_data, test_data = split_dataset(dataset_dir, split_file=split_file)
     
     train_dataset = PlantDiseaseDataset(train_data, transform=train_transform)
     val_dataset = PlantDiseaseDataset(val_data, transform=val_test_transform)
@@ -72,7 +72,69 @@ def create_model(num_classes):
     return model
 
 
-def train_model(dataset_dir, model_dir, epochs=10, batch_size=64, learning_rate=0.001, resume_from=None):
+def train_one_epoch(model, loader, criterion, optimizer, device, desc='Training', max_batches=None):
+    """Run one training epoch. Returns (average loss, accuracy %)."""
+    model.train()
+    running_loss = 0.0
+    correct = 0
+    total = 0
+    batches = 0
+    
+    pbar = tqdm(loader, desc=desc)
+    for images, labels in pbar:
+        images, labels = images.to(device), labels.to(device)
+        
+        optimizer.zero_grad()
+        outputs = model(images)
+        loss = criterion(outputs, labels)
+        loss.backward()
+        optimizer.step()
+        
+        running_loss += loss.item()
+        _, predicted = torch.max(outputs.data, 1)
+        total += labels.size(0)
+        correct += (predicted == labels).sum().item()
+        batches += 1
+        
+        pbar.set_postfix({
+            'loss': f'{loss.item():.4f}',
+            'acc': f'{100 * correct / total:.2f}%'
+        })
+        
+        if max_batches and batches >= max_batches:
+            break
+    
+    return running_loss / max(batches, 1), 100 * correct / max(total, 1)
+
+
+def evaluate(model, loader, criterion, device, max_batches=None):
+    """Evaluate the model on a loader. Returns (average loss, accuracy %)."""
+    model.eval()
+    running_loss = 0.0
+    correct = 0
+    total = 0
+    batches = 0
+    
+    with torch.no_grad():
+        for images, labels in loader:
+            images, labels = images.to(device), labels.to(device)
+            outputs = model(images)
+            loss = criterion(outputs, labels)
+            
+            running_loss += loss.item()
+            _, predicted = torch.max(outputs.data, 1)
+            total += labels.size(0)
+            correct += (predicted == labels).sum().item()
+            batches += 1
+            
+            if max_batches and batches >= max_batches:
+                break
+    
+    return running_loss / max(batches, 1), 100 * correct / max(total, 1)
+
+
+def train_model(dataset_dir, model_dir, epochs=10, batch_size=64, learning_rate=0.001, resume_from=None, split_file=None,
+                step_size=5, gamma=0.1):
     """Train the disease detection model.
     
     Args:
@@ -82,6 +144,9 @@ def train_model(dataset_dir, model_dir, epochs=10, batch_size=64, learning_rate=
         batch_size: Batch size (increased default for faster training)
         learning_rate: Learning rate
         resume_from: Path to checkpoint to resume from (optional)
+        split_file: Path to a precomputed group-aware split (optional)
+        step_size: StepLR period in epochs
+        gamma: StepLR decay factor
     """
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     print(f"Using device: {device}")
@@ -89,7 +154,7 @@ def train_model(dataset_dir, model_dir, epochs=10, batch_size=64, learning_rate=
         print("WARNING: Training on CPU will be very slow. Consider using GPU or reducing dataset size.")
     
     # Get data loaders
-    train_loader, val_loader, test_loader, num_classes = get_data_loaders(dataset_dir, batch_size)
+    train_loader, val_loader, test_loader, num_classes = get_data_loaders(dataset_dir, batch_size, split_file=split_file)
     print(f"Training samples: {len(train_loader.dataset)}, Validation: {len(val_loader.dataset)}, Test: {len(test_loader.dataset)}")
     print(f"Number of classes: {num_classes}")
     
@@ -100,7 +165,7 @@ def train_model(dataset_dir, model_dir, epochs=10, batch_size=64, learning_rate=
     # Loss and optimizer
     criterion = nn.CrossEntropyLoss()
     optimizer = optim.Adam(model.parameters(), lr=learning_rate)
-    scheduler = optim.lr_scheduler.StepLR(optimizer, step_size=5, gamma=0.1)
+    scheduler = optim.lr_scheduler.StepLR(optimizer, step_size=step_size, gamma=gamma)
     
     start_epoch = 0
     best_val_acc = 0.0
@@ -117,52 +182,13 @@ def train_model(dataset_dir, model_dir, epochs=10, batch_size=64, learning_rate=
     
     # Training loop
     for epoch in range(epochs):
-        model.train()
-        train_loss = 0.0
-        train_correct = 0
-        train_total = 0
-        
-        pbar = tqdm(train_loader, desc=f'Epoch {epoch+1}/{epochs}')
-        for images, labels in pbar:
-            images, labels = images.to(device), labels.to(device)
-            
-            optimizer.zero_grad()
-            outputs = model(images)
-            loss = criterion(outputs, labels)
-            loss.backward()
-            optimizer.step()
-            
-            train_loss += loss.item()
-            _, predicted = torch.max(outputs.data, 1)
-            train_total += labels.size(0)
-            train_correct += (predicted == labels).sum().item()
-            
-            pbar.set_postfix({
-                'loss': f'{loss.item():.4f}',
-                'acc': f'{100 * train_correct / train_total:.2f}%'
-            })
-        
-        # Validation
-        model.eval()
-        val_loss = 0.0
-        val_correct = 0
-        val_total = 0
-        
-        with torch.no_grad():
-            for images, labels in val_loader:
-                images, labels = images.to(device), labels.to(device)
-                outputs = model(images)
-                loss = criterion(outputs, labels)
-                
-                val_loss += loss.item()
-                _, predicted = torch.max(outputs.data, 1)
-                val_total += labels.size(0)
-                val_correct += (predicted == labels).sum().item()
-        
-        val_acc = 100 * val_correct / val_total
-        print(f'Epoch {epoch+1}: Train Loss: {train_loss/len(train_loader):.4f}, '
-              f'Train Acc: {100 * train_correct / train_total:.2f}%, '
-              f'Val Loss: {val_loss/len(val_loader):.4f}, '
+        train_loss, train_acc = train_one_epoch(
+            model, train_loader, criterion, optimizer, device, desc=f'Epoch {epoch+1}/{epochs}'
+        )
+        val_loss, val_acc = evaluate(model, val_loader, criterion, device)
+        print(f'Epoch {epoch+1}: Train Loss: {train_loss:.4f}, '
+              f'Train Acc: {train_acc:.2f}%, '
+              f'Val Loss: {val_loss:.4f}, '
               f'Val Acc: {val_acc:.2f}%')
         
         # Save best model and checkpoint
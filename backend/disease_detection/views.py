@@ -1,4 +1,3 @@
-import json
 import os
 from pathlib import Path
 from django.conf import settings
@@ -9,7 +8,8 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
-from .infer import DiseaseDetector
+from inference_service.client import get_client, InferenceServiceError
+from .services import get_treatment
 
 
 @api_view(['POST'])
@@ -21,6 +21,19 @@ def detect_disease(request):
     
     image_file = request.FILES['image']
     
+    # Served by the local inference service when configured
+    if settings.INFERENCE_SERVICE_SOCKET:
+        try:
+            client = get_client(settings.INFERENCE_SERVICE_SOCKET, settings.INFERENCE_SERVICE_TIMEOUT)
+            result = client.predict_disease(image_file.read())
+        except InferenceServiceError as e:
+            if e.status == status.HTTP_400_BAD_REQUEST:
+                return Response({'error': 'Invalid image file'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        
+        result['treatment'] = get_treatment(result['predicted_class'])
+        return Response(result, status=status.HTTP_200_OK)
+    
     # Save uploaded image temporarily
     file_name = default_storage.save(f'temp_{image_file.name}', ContentFile(image_file.read()))
     file_path = default_storage.path(file_name)
@@ -35,27 +48,15 @@ def detect_disease(request):
                 'error': 'Model not found. Please train the model first.'
             }, status=status.HTTP_404_NOT_FOUND)
         
-        # Initialize detector
-        detector = DiseaseDetector(model_path, label_map_path)
+        # Reuse the process-wide detector
+        from .infer import get_detector
+        detector = get_detector(model_path, label_map_path)
         
         # Predict
         result = detector.predict(file_path)
         
-        # Load disease treatments
-        treatments_path = settings.MODELS_DIR / 'disease_treatments.json'
-        treatments = {}
-        if treatments_path.exists():
-            with open(treatments_path, 'r') as f:
-                treatments = json.load(f)
-        
         # Add treatment information
-        predicted_class = result['predicted_class']
-        treatment = treatments.get(predicted_class, {
-            'general': 'Consult with agricultural experts for specific treatment recommendations.',
-            'prevention': 'Maintain good crop hygiene and monitor regularly.'
-        })
-        
-        result['treatment'] = treatment
+        result['treatment'] = get_treatment(result['predicted_class'])
         
         return Response(result, status=status.HTTP_200_OK)
     
@@ -94,7 +95,8 @@ def train_model(request):
             str(dataset_dir),
             str(model_dir),
             epochs=request.data.get('epochs', 10),
-            batch_size=request.data.get('batch_size', 32)
+            batch_size=request.data.get('batch_size', 32),
+            split_file=settings.DATASET_SPLIT_FILE
         )
         
         return Response({
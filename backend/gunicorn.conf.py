@@ -0,0 +1,20 @@
+"""
+Gunicorn configuration.
+Usage: gunicorn -c gunicorn.conf.py backend.wsgi
+
+Set PRELOAD_MODELS=1 to load the app and model weights once in the master
+before workers fork (see backend/preload.py). With WARMUP_ENABLED=1 every
+worker warms its own models and indexes after it starts (see backend/warmup.py).
+"""
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', '2'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+preload_app = os.getenv('PRELOAD_MODELS', 'False').lower() in ('1', 'true', 'yes')
+
+
+def post_worker_init(worker):
+    # No-op if wsgi.py already started warmup in this worker
+    from backend.warmup import start_warmup
+    start_warmup()
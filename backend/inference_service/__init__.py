@@ -0,0 +1,9 @@
+"""
+Standalone inference service.
+
+Owns the disease detection and embedding models in a dedicated process,
+served by FastAPI/uvicorn on a Unix domain socket, so Django workers stay
+small and the model process can be sized independently.
+
+Run with: python -m inference_service --socket /tmp/inference.sock
+"""
@@ -0,0 +1,20 @@
+import argparse
+import os
+import uvicorn
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the inference service on a Unix domain socket')
+    parser.add_argument('--socket', default=os.getenv('INFERENCE_SERVICE_SOCKET', '/tmp/smart_advisory_inference.sock'))
+    parser.add_argument('--log-level', default='info')
+    args = parser.parse_args()
+
+    # Remove a stale socket left by a previous run
+    if os.path.exists(args.socket):
+        os.unlink(args.socket)
+
+    uvicorn.run('inference_service.app:app', uds=args.socket, log_level=args.log_level)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+import asyncio
+import io
+import os
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import List
+from fastapi import FastAPI, HTTPException, Request
+from pydantic import BaseModel
+from .batching import MicroBatcher
+
+
+MODELS_DIR = Path(os.getenv('INFERENCE_MODELS_DIR', Path(__file__).resolve().parent.parent.parent / 'models'))
+# The same variables (and defaults) as Django's RAG settings, so both sides
+# agree on the model; Django checks the name on connecting
+EMBEDDING_MODEL_NAME = os.getenv('RAG_EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
+# 'onnx' serves the export written by `manage.py export_embedding_model` without torch
+EMBEDDING_BACKEND = os.getenv('RAG_EMBEDDING_BACKEND', 'sentence-transformers')
+EMBEDDING_ONNX_DIR = Path(os.getenv(
+    'RAG_ONNX_MODEL_DIR', MODELS_DIR / 'embeddings' / EMBEDDING_MODEL_NAME.replace('/', '__')
+))
+EMBEDDING_ONNX_QUANTIZED = os.getenv('RAG_ONNX_QUANTIZED', 'false').lower() in ('1', 'true', 'yes')
+MAX_BATCH_SIZE = int(os.getenv('INFERENCE_MAX_BATCH_SIZE', '32'))
+MAX_WAIT_MS = float(os.getenv('INFERENCE_MAX_WAIT_MS', '5'))
+
+# Models and batchers owned by this process
+state = {}
+
+
+class EmbedRequest(BaseModel):
+    texts: List[str]
+
+
+def load_disease_detector():
+    from disease_detection.infer import get_detector
+    model_path = MODELS_DIR / 'disease_detector.onnx'
+    label_map_path = MODELS_DIR / 'label_map.json'
+    if not model_path.exists() or not label_map_path.exists():
+        return None
+    return get_detector(model_path, label_map_path)
+
+
+def load_embedding_model():
+    if EMBEDDING_BACKEND == 'onnx':
+        from rag.onnx_embeddings import OnnxEmbeddingModel
+        return OnnxEmbeddingModel(EMBEDDING_ONNX_DIR, quantized=EMBEDDING_ONNX_QUANTIZED)
+
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+
+def preprocess_disease_image(image):
+    """Decode one request's image bytes; raises on an unreadable image."""
+    return state['disease_detector'].preprocess_image(io.BytesIO(image))
+
+
+def predict_disease_batch(img_arrays):
+    return state['disease_detector'].predict_preprocessed(img_arrays)
+
+
+def embed_batch(text_lists):
+    # Flatten every request's texts into one forward pass, then split back
+    texts = [text for texts in text_lists for text in texts]
+    embeddings = state['embedding_model'].encode(texts, batch_size=64).tolist()
+    results = []
+    offset = 0
+    for texts in text_lists:
+        results.append(embeddings[offset:offset + len(texts)])
+        offset += len(texts)
+    return results
+
+
+@asynccontextmanager
+async def lifespan(app):
+    start = time.perf_counter()
+    state['disease_detector'] = load_disease_detector()
+    state['embedding_model'] = load_embedding_model()
+    state['load_seconds'] = time.perf_counter() - start
+
+    state['disease_batcher'] = MicroBatcher(predict_disease_batch, MAX_BATCH_SIZE, MAX_WAIT_MS)
+    state['embed_batcher'] = MicroBatcher(embed_batch, MAX_BATCH_SIZE, MAX_WAIT_MS)
+    state['disease_batcher'].start()
+    state['embed_batcher'].start()
+    yield
+    await state['disease_batcher'].stop()
+    await state['embed_batcher'].stop()
+
+
+app = FastAPI(title='Smart AI Advisory inference service', lifespan=lifespan)
+
+
+@app.get('/health')
+async def health():
+    return {
+        'disease_model': state.get('disease_detector') is not None,
+        'embedding_model': state.get('embedding_model') is not None,
+        'embedding_model_name': EMBEDDING_MODEL_NAME,
+        'load_seconds': state.get('load_seconds'),
+    }
+
+
+@app.post('/v1/disease/predict')
+async def predict_disease(request: Request):
+    """Predict disease from raw image bytes in the request body."""
+    if state.get('disease_detector') is None:
+        raise HTTPException(status_code=503, detail='Disease model not loaded')
+
+    image = await request.body()
+    if not image:
+        raise HTTPException(status_code=400, detail='No image provided')
+
+    # Decoded before batching, so a bad image only fails its own request
+    try:
+        img_array = await asyncio.get_running_loop().run_in_executor(None, preprocess_disease_image, image)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f'Invalid image ({type(e).__name__})')
+
+    try:
+        return await state['disease_batcher'].submit(img_array)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post('/v1/embed')
+async def embed(payload: EmbedRequest):
+    """Encode texts with the sentence embedding model."""
+    if not payload.texts:
+        return {'model': EMBEDDING_MODEL_NAME, 'embeddings': []}
+
+    try:
+        embeddings = await state['embed_batcher'].submit(payload.texts)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {'model': EMBEDDING_MODEL_NAME, 'embeddings': embeddings}
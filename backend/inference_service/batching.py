@@ -0,0 +1,73 @@
+import asyncio
+
+
+class MicroBatcher:
+    """Collects concurrent requests into batches for a blocking batch function.
+
+    A single consumer task takes the first pending item, waits up to
+    max_wait_ms for more (up to max_batch_size), runs batch_fn on the whole
+    batch in a thread and resolves each caller's future with its result.
+    Items arriving while a batch runs form the next batch.
+
+    Callers should validate their item before submitting it. If batch_fn
+    still fails on a batch, each item is run again on its own, so only the
+    callers whose item fails get the exception.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=32, max_wait_ms=5):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = None
+        self.task = None
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, item):
+        """Queue one item and wait for its result."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._run_batch(loop, batch, isolate=len(batch) > 1)
+
+    async def _run_batch(self, loop, batch, isolate):
+        try:
+            results = await loop.run_in_executor(None, self.batch_fn, [item for item, _ in batch])
+        except Exception as e:
+            if isolate:
+                for entry in batch:
+                    await self._run_batch(loop, [entry], isolate=False)
+                return
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
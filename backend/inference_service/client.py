@@ -0,0 +1,141 @@
+"""
+Thin client for the inference service.
+
+Keeps one keep-alive HTTP connection per thread and process over the Unix
+socket and applies a timeout to every call. Only depends on the standard
+library and numpy so Django workers don't import torch or onnxruntime.
+"""
+import http.client
+import json
+import os
+import socket
+import threading
+import numpy as np
+
+
+class InferenceServiceError(Exception):
+    """The inference service could not be reached or returned an error (status is its HTTP status)."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a Unix domain socket."""
+
+    def __init__(self, socket_path, timeout):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+class InferenceClient:
+    def __init__(self, socket_path, timeout=10.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        # A connection inherited through fork (e.g. opened by a preloading
+        # master) is shared with the parent: leave it and open our own
+        if connection is None or self._local.pid != os.getpid():
+            connection = UnixHTTPConnection(self.socket_path, self.timeout)
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def _reset_connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            connection.close()
+        self._local.connection = None
+
+    def _request(self, method, path, body=None, headers=None):
+        # A reused keep-alive connection may have been closed by the server;
+        # retry once on a fresh connection in that case only
+        for attempt in range(2):
+            connection = self._connection()
+            try:
+                connection.request(method, path, body=body, headers=headers or {})
+                response = connection.getresponse()
+                data = response.read()
+            except socket.timeout as e:
+                self._reset_connection()
+                raise InferenceServiceError(f'Inference service timed out after {self.timeout}s') from e
+            except (ConnectionResetError, BrokenPipeError, http.client.RemoteDisconnected) as e:
+                self._reset_connection()
+                if attempt:
+                    raise InferenceServiceError(f'Inference service connection failed: {e}') from e
+                continue
+            except OSError as e:
+                self._reset_connection()
+                raise InferenceServiceError(f'Inference service unavailable: {e}') from e
+
+            if response.status != 200:
+                raise InferenceServiceError(f'Inference service error {response.status}: {data[:200]!r}',
+                                            status=response.status)
+            return json.loads(data)
+
+    def health(self):
+        return self._request('GET', '/health')
+
+    def predict_disease(self, image_bytes):
+        """Predict disease from raw image bytes."""
+        return self._request('POST', '/v1/disease/predict', body=image_bytes,
+                             headers={'Content-Type': 'application/octet-stream'})
+
+    def embed(self, texts, model=None):
+        """Encode texts; returns a float32 array of shape (len(texts), dim).
+
+        With model set, raises if the service encoded them with another model.
+        """
+        body = json.dumps({'texts': list(texts)})
+        data = self._request('POST', '/v1/embed', body=body, headers={'Content-Type': 'application/json'})
+        if model and data['model'] != model:
+            raise InferenceServiceError(f'Inference service embeds with {data["model"]}, expected {model}')
+        return np.array(data['embeddings'], dtype=np.float32)
+
+
+class RemoteEmbeddingModel:
+    """Stand-in for SentenceTransformer.encode backed by the inference service.
+
+    Checks on connecting (and with every response) that the service serves
+    model_name, so queries are never embedded with a different model than
+    the index.
+    """
+
+    def __init__(self, client, model_name):
+        self.client = client
+        self.model_name = model_name
+        health = client.health()
+        if not health.get('embedding_model'):
+            raise InferenceServiceError('Inference service has no embedding model loaded')
+        if health.get('embedding_model_name') != model_name:
+            raise InferenceServiceError(
+                f'Inference service embeds with {health.get("embedding_model_name")}, expected {model_name}'
+            )
+
+    def encode(self, sentences, **kwargs):
+        if isinstance(sentences, str):
+            return self.client.embed([sentences], model=self.model_name)[0]
+        return self.client.embed(sentences, model=self.model_name)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(socket_path, timeout=10.0):
+    """Return the process-wide client for a socket path."""
+    with _clients_lock:
+        client = _clients.get((socket_path, timeout))
+        if client is None:
+            client = InferenceClient(socket_path, timeout)
+            _clients[(socket_path, timeout)] = client
+    return client
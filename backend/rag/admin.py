@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import IngestionJob
+
+
+@admin.register(IngestionJob)
+class IngestionJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'status', 'document_count', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    exclude = ('documents',)
@@ -1,13 +1,25 @@
 from django.apps import AppConfig
 
 
-class RagConfig(AppConfig):
-    default_auto_field = 'django.db.models.BigAutoField'
-    name = 'rag'
-
-
+def warm_embedding_model():
+    from .embeddings import get_embedding_provider, EmbeddingModelUnavailable
+    provider = get_embedding_provider()
+    if not provider.warmup():
+        raise EmbeddingModelUnavailable(provider.last_error or 'Embedding model not initialized')
+    return provider.backend
 
 
+def warm_vector_store():
+    # Opens the collection, seeds an empty one, and builds the lexical index
+    from .services import search_knowledge
+    return f'{search_knowledge("How often should I water tomatoes?", mode="hybrid")["mode"]} search'
 
 
+class RagConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'rag'
 
+    def ready(self):
+        from backend.warmup import register_warmup
+        register_warmup('embedding_model', warm_embedding_model)
+        register_warmup('vector_store', warm_vector_store, after=['embedding_model'])
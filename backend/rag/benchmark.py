@@ -0,0 +1,129 @@
+"""
+Helpers for RAG retrieval benchmarks.
+"""
+import json
+import random
+import re
+import time
+from pathlib import Path
+import numpy as np
+
+
+EMBEDDING_DIM = 384
+
+# Hand-labelled questions over DEFAULT_KNOWLEDGE: [{'query', 'relevant': [ids]}]
+EVAL_QUERIES_PATH = Path(__file__).resolve().parent / 'eval_queries.json'
+
+SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+
+
+def synthetic_embeddings(count, dim=EMBEDDING_DIM, seed=0):
+    """Random unit vectors standing in for document embeddings."""
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def clustered_embeddings(count, dim=EMBEDDING_DIM, clusters=200, spread=0.35, seed=0, centers_seed=1):
+    """Unit vectors grouped around topic centers, closer to real chunk embeddings than uniform noise.
+
+    Calls with the same centers_seed share topics (e.g. a corpus and its queries).
+    """
+    rng = np.random.default_rng(seed)
+    centers = synthetic_embeddings(clusters, dim, seed=centers_seed)
+    vectors = centers[rng.integers(0, clusters, count)] + spread * synthetic_embeddings(count, dim, seed=seed + 2)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+
+def recall_at_k(retrieved, relevant, k):
+    """Fraction of the relevant top-k ids found in the retrieved top-k."""
+    relevant = set(relevant[:k])
+    if not relevant:
+        return 0.0
+    return len(relevant & set(retrieved[:k])) / len(relevant)
+
+
+def reciprocal_rank(retrieved, relevant):
+    """1 / rank of the first relevant id in retrieved, 0 if none was retrieved."""
+    relevant = set(relevant)
+    for rank, doc_id in enumerate(retrieved, start=1):
+        if doc_id in relevant:
+            return 1.0 / rank
+    return 0.0
+
+
+def retrieval_quality(retrieved_lists, queries, k):
+    """Mean recall@k and MRR of retrieved id lists for labelled queries."""
+    return {
+        f'recall@{k}': float(np.mean([
+            recall_at_k(retrieved, query['relevant'], k) for retrieved, query in zip(retrieved_lists, queries)
+        ])),
+        'mrr': float(np.mean([
+            reciprocal_rank(retrieved[:k], query['relevant']) for retrieved, query in zip(retrieved_lists, queries)
+        ])),
+    }
+
+
+def load_labeled_queries(path=EVAL_QUERIES_PATH):
+    """Labelled queries from a JSON file of {'query', 'relevant': [document ids]}."""
+    with open(path, 'r') as f:
+        queries = json.load(f)
+    if not isinstance(queries, list) or not all(q.get('query') and q.get('relevant') for q in queries):
+        raise ValueError(f'{path}: expected a list of {{"query", "relevant"}} objects')
+    return queries
+
+
+def generate_labeled_queries(documents, per_document=2, seed=0):
+    """Queries made of sentences sampled from each document, labelled with that document.
+
+    Verbatim sentences are easier than real questions, so these give an upper
+    bound; they are useful for corpora without hand-labelled queries.
+    """
+    rng = random.Random(seed)
+    queries = []
+    for document in documents:
+        sentences = [s.strip() for s in SENTENCE_RE.split(document['content']) if len(s.split()) >= 4]
+        for sentence in rng.sample(sentences, min(per_document, len(sentences))):
+            queries.append({'query': sentence.rstrip('.'), 'relevant': [document['id']]})
+    return queries
+
+
+def percentile_ms(samples, p):
+    return float(np.percentile(np.array(samples) * 1000, p))
+
+
+def summarize_latency(samples):
+    """p50/p95/p99/mean of a list of durations in seconds, in milliseconds."""
+    return {
+        'p50_ms': percentile_ms(samples, 50),
+        'p95_ms': percentile_ms(samples, 95),
+        'p99_ms': percentile_ms(samples, 99),
+        'mean_ms': float(np.mean(samples) * 1000),
+    }
+
+
+def time_calls(fn, args_list):
+    """Call fn once per args tuple; return the durations in seconds."""
+    durations = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def grow_collection(collection, target_size, dim=EMBEDDING_DIM, batch_size=5000, seed=0):
+    """Fill a collection with synthetic chunks up to target_size."""
+    current = collection.count()
+    while current < target_size:
+        count = min(batch_size, target_size - current)
+        vectors = synthetic_embeddings(count, dim, seed=seed + current)
+        collection.upsert(
+            ids=[f'bench_{i}' for i in range(current, current + count)],
+            embeddings=vectors.tolist(),
+            documents=[f'Synthetic agricultural advisory chunk {i}' for i in range(current, current + count)],
+            metadatas=[{'source': 'benchmark'} for _ in range(count)],
+        )
+        current += count
@@ -0,0 +1,161 @@
+"""
+Query embedding cache.
+
+Chat traffic repeats the same questions constantly, so query embeddings are
+cached by normalized text in a bounded in-process LRU, optionally backed by a
+SQLite file that survives restarts and is shared by workers on the node.
+Entries are keyed by embedding model name, so switching models never serves
+stale vectors, and workers on different models can share the file. Rows of
+models no longer in use are dropped explicitly with
+`python manage.py clear_query_cache`.
+
+The SQLite connection is opened on first use in each process: the cache may
+be created in a preloading master, and a connection must not cross a fork.
+"""
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+import numpy as np
+
+
+def normalize_query(text):
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    text = ' '.join(text.lower().split())
+    return re.sub(r'[\s?!.]+$', '', text)
+
+
+class QueryEmbeddingCache:
+    def __init__(self, model_name, max_size=10000, sqlite_path=None, sqlite_max_rows=100000):
+        self.model_name = model_name
+        self.max_size = max_size
+        self.sqlite_path = Path(sqlite_path) if sqlite_path else None
+        self.sqlite_max_rows = sqlite_max_rows
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_pid = None
+        self._writes = 0
+
+    def _connection(self):
+        """This process's SQLite connection (None without a sqlite_path). Call with the lock held."""
+        if self.sqlite_path is None:
+            return None
+        if self._db_pid != os.getpid():
+            # A connection inherited through fork is left alone, never used or closed here
+            self.sqlite_path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(str(self.sqlite_path), check_same_thread=False, timeout=5)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS query_embeddings ('
+                ' model TEXT NOT NULL, query TEXT NOT NULL, embedding BLOB NOT NULL, dim INTEGER NOT NULL,'
+                ' PRIMARY KEY (model, query))'
+            )
+            db.commit()
+            self._db, self._db_pid = db, os.getpid()
+        return self._db
+
+    def _remember(self, key, embedding):
+        self._entries[key] = embedding
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get(self, text):
+        """Cached embedding for a query, or None."""
+        key = normalize_query(text)
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return embedding
+
+            db = self._connection()
+            if db is not None:
+                row = db.execute(
+                    'SELECT embedding, dim FROM query_embeddings WHERE model = ? AND query = ?',
+                    (self.model_name, key)
+                ).fetchone()
+                if row is not None:
+                    embedding = np.frombuffer(row[0], dtype=np.float32)
+                    self._remember(key, embedding)
+                    self.hits += 1
+                    self.persistent_hits += 1
+                    return embedding
+
+            self.misses += 1
+            return None
+
+    def put(self, text, embedding):
+        key = normalize_query(text)
+        embedding = np.asarray(embedding, dtype=np.float32)
+        embedding.setflags(write=False)
+        with self._lock:
+            self._remember(key, embedding)
+            db = self._connection()
+            if db is not None:
+                db.execute(
+                    'INSERT OR REPLACE INTO query_embeddings (model, query, embedding, dim) VALUES (?, ?, ?, ?)',
+                    (self.model_name, key, embedding.tobytes(), embedding.shape[0])
+                )
+                db.commit()
+                self._writes += 1
+                if self._writes % 1000 == 0:
+                    self._trim_db()
+
+    def _trim_db(self):
+        # Keep the most recently inserted rows
+        self._db.execute(
+            'DELETE FROM query_embeddings WHERE rowid IN ('
+            ' SELECT rowid FROM query_embeddings ORDER BY rowid DESC LIMIT -1 OFFSET ?)',
+            (self.sqlite_max_rows,)
+        )
+        self._db.commit()
+
+    def encode(self, texts, encoder):
+        """Embeddings for texts, encoding only the cache misses in one batch."""
+        embeddings = [self.get(text) for text in texts]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            encoded = np.asarray(encoder.encode([texts[i] for i in missing]), dtype=np.float32)
+            for i, embedding in zip(missing, encoded):
+                self.put(texts[i], embedding)
+                embeddings[i] = embedding
+        return embeddings
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            db = self._connection()
+            if db is not None:
+                db.execute('DELETE FROM query_embeddings')
+                db.commit()
+
+    def drop_other_models(self):
+        """Delete persisted rows of every other embedding model. Returns the number deleted."""
+        with self._lock:
+            db = self._connection()
+            if db is None:
+                return 0
+            deleted = db.execute('DELETE FROM query_embeddings WHERE model != ?', (self.model_name,)).rowcount
+            db.commit()
+            return deleted
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'model': self.model_name,
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'persistent': self.sqlite_path is not None,
+            'hits': self.hits,
+            'persistent_hits': self.persistent_hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
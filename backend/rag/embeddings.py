@@ -0,0 +1,158 @@
+"""
+Process-wide embedding model provider.
+
+The model is loaded on first use (or an explicit warmup) instead of at import
+time, so processes that never touch RAG - management commands, migrations,
+tests - start fast. A failed load is retried with backoff rather than leaving
+the process without a model until restart.
+"""
+import threading
+import time
+from django.conf import settings
+from inference_service.client import get_client, RemoteEmbeddingModel
+from .cache import QueryEmbeddingCache
+
+
+class EmbeddingModelUnavailable(Exception):
+    """The embedding model could not be loaded."""
+
+
+class EmbeddingProvider:
+    def __init__(self, model_name, min_retry_seconds=5, max_retry_seconds=300, query_cache=None,
+                 backend='sentence-transformers'):
+        self.model_name = model_name
+        self.backend = backend
+        self.query_cache = query_cache
+        self.min_retry_seconds = min_retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self.load_seconds = None
+        self.load_attempts = 0
+        self.last_error = None
+        self._model = None
+        self._next_retry = 0.0
+        self._lock = threading.Lock()
+
+    def _load_model(self):
+        # Served by the inference service if configured
+        if settings.INFERENCE_SERVICE_SOCKET:
+            return RemoteEmbeddingModel(
+                get_client(settings.INFERENCE_SERVICE_SOCKET, settings.INFERENCE_SERVICE_TIMEOUT),
+                self.model_name,
+            )
+
+        if self.backend == 'onnx':
+            from .onnx_embeddings import OnnxEmbeddingModel
+            return OnnxEmbeddingModel(
+                settings.RAG_ONNX_MODEL_DIR,
+                quantized=settings.RAG_ONNX_QUANTIZED,
+                intra_op_threads=settings.RAG_ONNX_THREADS,
+            )
+
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(self.model_name)
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    def get(self):
+        """Return the model, loading it on first use.
+
+        Returns None if loading failed; the next call after the backoff
+        period tries again.
+        """
+        if self._model is not None:
+            return self._model
+
+        with self._lock:
+            if self._model is not None:
+                return self._model
+            if time.monotonic() < self._next_retry:
+                return None
+
+            self.load_attempts += 1
+            start = time.perf_counter()
+            try:
+                self._model = self._load_model()
+            except Exception as e:
+                self.last_error = str(e)
+                backoff = min(self.min_retry_seconds * 2 ** (self.load_attempts - 1), self.max_retry_seconds)
+                self._next_retry = time.monotonic() + backoff
+                print(f'Failed to load embedding model {self.model_name} '
+                      f'(attempt {self.load_attempts}, retrying in {backoff}s): {e}')
+                return None
+
+            self.load_seconds = time.perf_counter() - start
+            self.last_error = None
+            print(f'Loaded embedding model {self.model_name} in {self.load_seconds:.2f}s')
+        return self._model
+
+    def encode(self, sentences, **kwargs):
+        """Encode with the loaded model; raises EmbeddingModelUnavailable if it cannot be loaded."""
+        model = self.get()
+        if model is None:
+            raise EmbeddingModelUnavailable(self.last_error or 'Embedding model not initialized')
+        return model.encode(sentences, **kwargs)
+
+    def encode_query(self, query):
+        """Embedding of a search query, served from the query cache when possible."""
+        if self.query_cache is None:
+            return self.encode(query)
+        return self.query_cache.encode([query], self)[0]
+
+    def encode_queries(self, queries):
+        """Embeddings of several search queries; cache misses are encoded in one batch."""
+        if self.query_cache is None:
+            return list(self.encode(list(queries)))
+        return self.query_cache.encode(list(queries), self)
+
+    def warmup(self):
+        """Load the model and run one dummy encode. Returns True if the model is ready."""
+        model = self.get()
+        if model is None:
+            return False
+        model.encode('warmup')
+        return True
+
+    def status(self):
+        return {
+            'model': self.model_name,
+            'backend': self.backend,
+            'loaded': self.loaded,
+            'load_seconds': self.load_seconds,
+            'load_attempts': self.load_attempts,
+            'last_error': self.last_error,
+            'query_cache': self.query_cache.stats() if self.query_cache else None,
+        }
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_embedding_provider():
+    """Return the process-wide embedding provider."""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                query_cache = None
+                if settings.RAG_QUERY_CACHE_SIZE > 0:
+                    # int8 embeddings differ slightly, so they get their own cache entries
+                    cache_key = settings.RAG_EMBEDDING_MODEL
+                    if settings.RAG_EMBEDDING_BACKEND == 'onnx' and settings.RAG_ONNX_QUANTIZED:
+                        cache_key += ':onnx-int8'
+                    query_cache = QueryEmbeddingCache(
+                        cache_key,
+                        max_size=settings.RAG_QUERY_CACHE_SIZE,
+                        sqlite_path=settings.RAG_QUERY_CACHE_PATH or None,
+                    )
+                _provider = EmbeddingProvider(
+                    settings.RAG_EMBEDDING_MODEL, query_cache=query_cache, backend=settings.RAG_EMBEDDING_BACKEND
+                )
+    return _provider
+
+
+def get_embedding_model():
+    """Return the loaded embedding model, or None if it is unavailable."""
+    return get_embedding_provider().get()
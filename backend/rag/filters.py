@@ -0,0 +1,156 @@
+"""
+Metadata filters for RAG retrieval.
+
+Chunks are labelled with source, crop and region when they are ingested.
+MetadataIndex keeps, per label value, the rows that carry it, so a filtered
+search scores only the matching rows instead of the whole collection.
+"""
+import re
+import numpy as np
+
+
+FILTER_FIELDS = ('source', 'crop', 'region')
+
+# Label of chunks that are not specific to one crop or region
+GENERAL = 'general'
+
+# Canonical crop names and the words that mention them
+CROP_NAMES = {
+    'apple': ('apple', 'apples'),
+    'beans': ('bean', 'beans'),
+    'cassava': ('cassava',),
+    'cherry': ('cherry', 'cherries'),
+    'grape': ('grape', 'grapes'),
+    'maize': ('maize', 'corn'),
+    'peach': ('peach', 'peaches'),
+    'pepper': ('pepper', 'peppers'),
+    'potato': ('potato', 'potatoes'),
+    'rice': ('rice',),
+    'strawberry': ('strawberry', 'strawberries'),
+    'tomato': ('tomato', 'tomatoes'),
+}
+CROP_ALIASES = {alias: crop for crop, aliases in CROP_NAMES.items() for alias in aliases}
+CROP_RE = re.compile(r'\b(' + '|'.join(sorted(CROP_ALIASES, key=len, reverse=True)) + r')\b')
+
+FILTER_OPERATORS = ('$eq', '$ne', '$in', '$nin')
+
+
+def normalize_crop(value):
+    """Canonical crop name ('Tomatoes', 'Tomato___Late_blight' -> 'tomato')."""
+    value = str(value).strip().lower()
+    value = value.split('___')[0].replace('_', ' ')
+    if value in CROP_ALIASES:
+        return CROP_ALIASES[value]
+    match = CROP_RE.search(value)
+    return CROP_ALIASES[match.group(1)] if match else value
+
+
+def normalize_label(field, value):
+    if field == 'crop':
+        return normalize_crop(value)
+    if field == 'region':
+        return str(value).strip().lower()
+    return value
+
+
+def infer_crop(text):
+    """The crop a text is about, when it mentions exactly one known crop."""
+    crops = {CROP_ALIASES[word] for word in CROP_RE.findall(text.lower())}
+    return crops.pop() if len(crops) == 1 else GENERAL
+
+
+def document_labels(document):
+    """crop/region metadata of a document; explicit fields win over inference."""
+    crop = document.get('crop')
+    region = document.get('region')
+    return {
+        'crop': normalize_crop(crop) if crop else infer_crop(document.get('content', '')),
+        'region': normalize_label('region', region) if region else GENERAL,
+    }
+
+
+def build_where(filters):
+    """Chroma-style metadata filter from {'field': value or [values]}."""
+    if not filters:
+        return None
+    if not isinstance(filters, dict):
+        raise ValueError('filters must be an object of metadata field to value(s)')
+    conditions = []
+    for field, value in sorted(filters.items()):
+        if field not in FILTER_FIELDS:
+            raise ValueError(f'Unknown filter field: {field} (expected one of {", ".join(FILTER_FIELDS)})')
+        if isinstance(value, (list, tuple)):
+            conditions.append({field: {'$in': [normalize_label(field, v) for v in value]}})
+        else:
+            conditions.append({field: normalize_label(field, value)})
+    return conditions[0] if len(conditions) == 1 else {'$and': conditions}
+
+
+class MetadataIndex:
+    """Rows per value of the filterable metadata fields.
+
+    Rows are only ever added; callers combine the result with their live-row
+    mask, so overwritten and deleted rows need no bookkeeping here.
+    """
+
+    def __init__(self, fields=FILTER_FIELDS):
+        self.fields = tuple(fields)
+        self._rows = {field: {} for field in self.fields}
+        self._arrays = {}
+
+    def add(self, row, metadata):
+        if not metadata:
+            return
+        for field in self.fields:
+            value = metadata.get(field)
+            if value is not None:
+                self._rows[field].setdefault(value, []).append(row)
+        self._arrays.clear()
+
+    def covers(self, where):
+        """Whether a filter only uses indexed fields and supported operators."""
+        for key, condition in where.items():
+            if key in ('$and', '$or'):
+                if not condition or not all(self.covers(sub) for sub in condition):
+                    return False
+            elif key not in self.fields:
+                return False
+            elif isinstance(condition, dict) and not set(condition) <= set(FILTER_OPERATORS):
+                return False
+        return True
+
+    def _value_rows(self, field, value):
+        rows = self._arrays.get((field, value))
+        if rows is None:
+            rows = np.array(self._rows[field].get(value, ()), dtype=np.int64)
+            self._arrays[(field, value)] = rows
+        return rows
+
+    def _match(self, field, values, size):
+        matched = np.zeros(size, dtype=bool)
+        for value in values:
+            rows = self._value_rows(field, value)
+            matched[rows[rows < size]] = True
+        return matched
+
+    def mask(self, where, size):
+        """Boolean mask over rows [0, size) of the rows matching a filter."""
+        mask = np.ones(size, dtype=bool)
+        for key, condition in where.items():
+            if key in ('$and', '$or'):
+                parts = [self.mask(sub, size) for sub in condition]
+                mask &= np.logical_and.reduce(parts) if key == '$and' else np.logical_or.reduce(parts)
+                continue
+
+            if not isinstance(condition, dict):
+                condition = {'$eq': condition}
+            for op, value in condition.items():
+                matched = self._match(key, value if op in ('$in', '$nin') else [value], size)
+                if op == '$ne':
+                    # Like SQL: rows without the field match $ne ...
+                    matched = ~matched
+                elif op == '$nin':
+                    # ... but not $nin
+                    matched = self._match(key, self._rows[key], size) & ~matched
+                mask &= matched
+        return mask
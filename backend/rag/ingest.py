@@ -0,0 +1,310 @@
+"""
+Bulk document ingestion for the RAG module.
+
+Documents are split into overlapping chunks bounded by the embedding model's
+token limit (so nothing is silently truncated), encoded in large batches and
+upserted into the collection in bulk. Writing a batch overlaps with encoding
+the next one.
+
+Ingestion is incremental: every chunk records its own hash and its source
+document's hash, so re-ingesting a corpus only embeds new or modified chunks
+and removes chunks that no longer exist.
+
+Chunks are labelled with their document's crop and region (given, or the crop
+inferred from the text) so searches can be filtered on them.
+"""
+import hashlib
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from .filters import document_labels
+from .store import content_id, invalidate_count, iter_collection
+from .lexical import update_lexical_index
+
+
+SUPPORTED_EXTENSIONS = {'.txt', '.md', '.markdown', '.pdf'}
+
+# Defaults sized for all-MiniLM-L6-v2 (256 word pieces per input)
+DEFAULT_CHUNK_TOKENS = 200
+DEFAULT_OVERLAP_TOKENS = 40
+DEFAULT_BATCH_SIZE = 256
+
+
+def token_spans(text, tokenizer=None):
+    """Character spans of the tokens in text.
+
+    Uses the model's fast tokenizer when available; falls back to
+    whitespace-separated words, which undercounts word pieces slightly.
+    """
+    if tokenizer is not None and getattr(tokenizer, 'is_fast', False):
+        encoding = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+        return [tuple(span) for span in encoding['offset_mapping']]
+    if tokenizer is not None and hasattr(tokenizer, 'encode_batch'):
+        # tokenizers.Tokenizer, as used by the ONNX embedding backend
+        return [tuple(span) for span in tokenizer.encode(text, add_special_tokens=False).offsets]
+    return [match.span() for match in re.finditer(r'\S+', text)]
+
+
+def check_chunking(chunk_tokens, overlap_tokens):
+    """Raise ValueError unless chunk_tokens > overlap_tokens >= 0."""
+    if overlap_tokens < 0:
+        raise ValueError('overlap_tokens must not be negative')
+    if overlap_tokens >= chunk_tokens:
+        raise ValueError('overlap_tokens must be smaller than chunk_tokens')
+
+
+def chunk_text(text, tokenizer=None, chunk_tokens=DEFAULT_CHUNK_TOKENS, overlap_tokens=DEFAULT_OVERLAP_TOKENS):
+    """Split text into overlapping chunks of at most chunk_tokens tokens."""
+    check_chunking(chunk_tokens, overlap_tokens)
+
+    spans = token_spans(text, tokenizer)
+    chunks = []
+    step = chunk_tokens - overlap_tokens
+    for start in range(0, len(spans), step):
+        window = spans[start:start + chunk_tokens]
+        chunk = text[window[0][0]:window[-1][1]].strip()
+        if chunk:
+            chunks.append(chunk)
+        if start + chunk_tokens >= len(spans):
+            break
+    return chunks
+
+
+def model_tokenizer(embedding_model):
+    """Tokenizer of a SentenceTransformer or ONNX model, or None (e.g. a remote model)."""
+    return getattr(embedding_model, 'tokenizer', None)
+
+
+def read_document(path):
+    """Text content of a .txt/.md/.pdf file."""
+    path = Path(path)
+    if path.suffix.lower() == '.pdf':
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            raise ImportError('PDF ingestion requires pypdf (pip install pypdf)')
+        reader = PdfReader(str(path))
+        return '\n'.join(page.extract_text() or '' for page in reader.pages)
+
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        return f.read()
+
+
+def find_documents(paths):
+    """Supported files under the given files/directories, sorted."""
+    files = []
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            files.extend(p for p in path.rglob('*') if p.is_file() and p.suffix.lower() in SUPPORTED_EXTENSIONS)
+        elif path.suffix.lower() in SUPPORTED_EXTENSIONS:
+            files.append(path)
+    return sorted(set(files))
+
+
+def load_documents(paths, source=None, crop=None, region=None):
+    """Documents ({'id', 'content', 'source', 'crop', 'region'}) read from files/directories."""
+    documents = []
+    for path in find_documents(paths):
+        documents.append({
+            'id': content_id(str(path.resolve()), prefix='file'),
+            'content': read_document(path),
+            'source': source or path.name,
+            'crop': crop,
+            'region': region,
+            'path': str(path.resolve()),
+        })
+    return documents
+
+
+def document_hash(content):
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def build_chunks(document, tokenizer=None, chunk_tokens=DEFAULT_CHUNK_TOKENS, overlap_tokens=DEFAULT_OVERLAP_TOKENS):
+    """Chunk one document. Returns parallel lists of ids, texts and metadatas.
+
+    Chunk ids hash the document key, chunk text and the occurrence of that
+    text in the document, so an unchanged chunk keeps its id across runs.
+    """
+    doc_id = document.get('id') or content_id(document['content'])
+    doc_hash = document_hash(document['content'])
+    labels = document_labels(document)
+    ids, texts, metadatas = [], [], []
+    occurrences = {}
+    for index, chunk in enumerate(chunk_text(document['content'], tokenizer, chunk_tokens, overlap_tokens)):
+        chunk_hash = document_hash(chunk)
+        occurrence = occurrences.get(chunk_hash, 0)
+        occurrences[chunk_hash] = occurrence + 1
+        ids.append(content_id(f'{doc_id}\n{occurrence}\n{chunk}', prefix='chunk'))
+        texts.append(chunk)
+        metadatas.append({
+            'source': document.get('source', 'manual'),
+            **labels,
+            'document_id': doc_id,
+            'source_path': document.get('path', ''),
+            'doc_hash': doc_hash,
+            'chunk_hash': chunk_hash,
+            'chunk_index': index,
+            'chunking': f'{chunk_tokens}/{overlap_tokens}',
+        })
+    return ids, texts, metadatas
+
+
+def _existing_chunks(collection, doc_id):
+    existing = collection.get(where={'document_id': doc_id}, include=['metadatas'])
+    return dict(zip(existing['ids'], existing['metadatas']))
+
+
+def plan_ingestion(collection, documents, tokenizer=None, chunk_tokens=DEFAULT_CHUNK_TOKENS,
+                   overlap_tokens=DEFAULT_OVERLAP_TOKENS, prune_roots=None):
+    """Work out which chunks must be embedded, deleted or only re-labelled.
+
+    Documents whose hash matches the stored chunks are skipped without being
+    re-chunked. With prune_roots, chunks of files under those directories that
+    are no longer present are scheduled for deletion.
+    """
+    plan = {
+        'ids': [], 'texts': [], 'metadatas': [],
+        'delete_ids': [],
+        'update_ids': [], 'update_metadatas': [],
+        'chunks_unchanged': 0,
+        'documents_new': 0, 'documents_changed': 0, 'documents_unchanged': 0, 'documents_removed': 0,
+    }
+
+    for document in documents:
+        doc_id = document.get('id') or content_id(document['content'])
+        existing = _existing_chunks(collection, doc_id)
+        doc_hash = document_hash(document['content'])
+        chunking = f'{chunk_tokens}/{overlap_tokens}'
+        labels = document_labels(document)
+        # Relabelled documents (or chunks from before labels existed) count as
+        # changed; their chunks keep their vectors and only get new metadata
+        if existing and all(meta.get('doc_hash') == doc_hash and meta.get('chunking') == chunking
+                            and all(meta.get(field) == value for field, value in labels.items())
+                            for meta in existing.values()):
+            plan['documents_unchanged'] += 1
+            plan['chunks_unchanged'] += len(existing)
+            continue
+
+        plan['documents_changed' if existing else 'documents_new'] += 1
+        ids, texts, metadatas = build_chunks({**document, 'id': doc_id}, tokenizer, chunk_tokens, overlap_tokens)
+        for chunk_id, text, metadata in zip(ids, texts, metadatas):
+            if chunk_id in existing:
+                # Same text at the same occurrence: keep the vector, refresh metadata
+                plan['update_ids'].append(chunk_id)
+                plan['update_metadatas'].append(metadata)
+                plan['chunks_unchanged'] += 1
+            else:
+                plan['ids'].append(chunk_id)
+                plan['texts'].append(text)
+                plan['metadatas'].append(metadata)
+        kept = set(ids)
+        plan['delete_ids'].extend(chunk_id for chunk_id in existing if chunk_id not in kept)
+
+    if prune_roots:
+        present = {document.get('path') for document in documents}
+        roots = [os.path.join(str(Path(root).resolve()), '') for root in prune_roots]
+        removed = set()
+        for ids, _, metadatas in iter_collection(collection, include=('metadatas',)):
+            for chunk_id, metadata in zip(ids, metadatas):
+                path = (metadata or {}).get('source_path')
+                if path and path not in present and any(path.startswith(root) for root in roots):
+                    plan['delete_ids'].append(chunk_id)
+                    removed.add(path)
+        plan['documents_removed'] = len(removed)
+
+    return plan
+
+
+def summarize_plan(plan):
+    """Counts of a plan, without the chunk payloads."""
+    return {
+        'documents_new': plan['documents_new'],
+        'documents_changed': plan['documents_changed'],
+        'documents_unchanged': plan['documents_unchanged'],
+        'documents_removed': plan['documents_removed'],
+        'chunks_added': len(plan['ids']),
+        'chunks_deleted': len(plan['delete_ids']),
+        'chunks_unchanged': plan['chunks_unchanged'],
+    }
+
+
+def merge_plans(plans):
+    """One plan covering several plans of disjoint documents, so their chunks are embedded together."""
+    merged = {key: [] for key in ('ids', 'texts', 'metadatas', 'delete_ids', 'update_ids', 'update_metadatas')}
+    for plan in plans:
+        for key in merged:
+            merged[key].extend(plan[key])
+    return merged
+
+
+def apply_plan(collection, embedding_model, plan, batch_size=DEFAULT_BATCH_SIZE, log=None):
+    """Embed and write the chunks of a plan. Returns the seconds spent encoding."""
+    ids, texts, metadatas = plan['ids'], plan['texts'], plan['metadatas']
+    encode_seconds = 0.0
+    pending = None
+    with ThreadPoolExecutor(max_workers=1) as writer:
+        for i in range(0, len(texts), batch_size):
+            encode_start = time.perf_counter()
+            embeddings = embedding_model.encode(texts[i:i + batch_size], batch_size=64).tolist()
+            encode_seconds += time.perf_counter() - encode_start
+
+            # Only one write in flight; it runs while the next batch encodes
+            if pending is not None:
+                pending.result()
+            pending = writer.submit(
+                collection.upsert,
+                ids=ids[i:i + batch_size],
+                embeddings=embeddings,
+                documents=texts[i:i + batch_size],
+                metadatas=metadatas[i:i + batch_size],
+            )
+            if log:
+                log(f'Encoded {min(i + batch_size, len(texts))}/{len(texts)} chunks')
+        if pending is not None:
+            pending.result()
+
+    for i in range(0, len(plan['update_ids']), batch_size):
+        collection.update(
+            ids=plan['update_ids'][i:i + batch_size],
+            metadatas=plan['update_metadatas'][i:i + batch_size],
+        )
+    for i in range(0, len(plan['delete_ids']), batch_size):
+        collection.delete(ids=plan['delete_ids'][i:i + batch_size])
+    invalidate_count(collection)
+    update_lexical_index(
+        collection, ids, texts, delete_ids=plan['delete_ids'], metadatas=metadatas,
+        relabel_ids=plan['update_ids'], relabel_metadatas=plan['update_metadatas']
+    )
+    return encode_seconds
+
+
+def ingest_documents_bulk(collection, embedding_model, documents, chunk_tokens=DEFAULT_CHUNK_TOKENS,
+                          overlap_tokens=DEFAULT_OVERLAP_TOKENS, batch_size=DEFAULT_BATCH_SIZE,
+                          prune_roots=None, dry_run=False, log=None):
+    """Incrementally ingest documents: only new or modified chunks are embedded.
+
+    Returns ingestion stats. With dry_run nothing is encoded or written.
+    """
+    start = time.perf_counter()
+    plan = plan_ingestion(
+        collection, documents, model_tokenizer(embedding_model), chunk_tokens, overlap_tokens, prune_roots
+    )
+    plan_seconds = time.perf_counter() - start
+    stats = {'documents': len(documents), 'dry_run': dry_run, **summarize_plan(plan)}
+    if dry_run:
+        return {**stats, 'seconds': round(plan_seconds, 3)}
+
+    encode_seconds = apply_plan(collection, embedding_model, plan, batch_size, log)
+
+    seconds = time.perf_counter() - start
+    return {
+        **stats,
+        'seconds': round(seconds, 3),
+        'plan_seconds': round(plan_seconds, 3),
+        'encode_seconds': round(encode_seconds, 3),
+        'chunks_per_second': round(len(plan['texts']) / seconds, 1) if seconds > 0 else 0.0,
+    }
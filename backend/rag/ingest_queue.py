@@ -0,0 +1,245 @@
+"""
+Asynchronous ingestion queue.
+
+The ingest endpoints store documents as IngestionJob rows and return at once;
+`manage.py process_ingestion_queue` claims pending jobs in order, plans each
+one incrementally and embeds the new chunks of all claimed jobs in shared
+batches; if a shared batch fails, its jobs are retried one by one. Jobs are
+claimed with a conditional UPDATE, so several workers can share the queue. A job that fails is retried up to RAG_INGEST_MAX_ATTEMPTS
+times. While a worker processes jobs it refreshes their heartbeat; a job
+whose heartbeat is older than RAG_INGEST_STALE_SECONDS (its worker died) is
+requeued by the next poll, or failed if it has used up its attempts, so a
+document that kills the worker is not retried forever.
+
+New jobs are refused (QueueFull) while more than RAG_INGEST_QUEUE_MAX_DOCUMENTS
+documents are waiting, with a retry delay estimated from recent throughput.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+from .ingest import (
+    plan_ingestion, merge_plans, apply_plan, summarize_plan, model_tokenizer, check_chunking,
+    DEFAULT_BATCH_SIZE, DEFAULT_CHUNK_TOKENS, DEFAULT_OVERLAP_TOKENS
+)
+from .models import IngestionJob
+from .store import content_id
+
+# Fields of a document kept in the queue
+DOCUMENT_FIELDS = ('id', 'content', 'source', 'crop', 'region')
+
+# Bounds of the Retry-After estimate, in seconds
+MIN_RETRY_AFTER = 5
+MAX_RETRY_AFTER = 600
+
+
+class QueueFull(Exception):
+    """Too many documents are waiting to be ingested."""
+
+    def __init__(self, waiting, retry_after):
+        super().__init__(f'{waiting} documents are waiting to be ingested')
+        self.waiting = waiting
+        self.retry_after = retry_after
+
+
+def waiting_documents():
+    """Documents in pending or processing jobs."""
+    total = IngestionJob.objects.filter(
+        status__in=[IngestionJob.STATUS_PENDING, IngestionJob.STATUS_PROCESSING]
+    ).aggregate(total=Sum('document_count'))['total']
+    return total or 0
+
+
+def estimate_retry_after(waiting, recent_jobs=20):
+    """Seconds until the queue has drained, from the throughput of recently finished jobs."""
+    documents, seconds = 0, 0.0
+    recent = IngestionJob.objects.filter(
+        status=IngestionJob.STATUS_DONE, started_at__isnull=False, finished_at__isnull=False
+    ).order_by('-id')[:recent_jobs]
+    for job in recent:
+        documents += job.document_count
+        seconds += (job.finished_at - job.started_at).total_seconds()
+    if not documents or seconds <= 0:
+        return settings.RAG_INGEST_RETRY_AFTER
+    return int(min(max(waiting * seconds / documents, MIN_RETRY_AFTER), MAX_RETRY_AFTER))
+
+
+def enqueue_ingestion(documents, user=None, chunk_tokens=DEFAULT_CHUNK_TOKENS, overlap_tokens=DEFAULT_OVERLAP_TOKENS):
+    """Queue documents for ingestion. Raises QueueFull when the queue is too deep."""
+    check_chunking(chunk_tokens, overlap_tokens)
+
+    # A job larger than the limit is still accepted into an empty queue
+    waiting = waiting_documents()
+    if waiting and waiting + len(documents) > settings.RAG_INGEST_QUEUE_MAX_DOCUMENTS:
+        raise QueueFull(waiting, estimate_retry_after(waiting))
+
+    documents = [{field: document[field] for field in DOCUMENT_FIELDS if document.get(field) is not None}
+                 for document in documents]
+    for document in documents:
+        document.setdefault('id', content_id(document['content']))
+    return IngestionJob.objects.create(
+        user=user if user is not None and user.is_authenticated else None,
+        documents=documents,
+        document_count=len(documents),
+        chunk_tokens=chunk_tokens,
+        overlap_tokens=overlap_tokens,
+    )
+
+
+def queue_position(job):
+    """Number of pending jobs ahead of a pending job."""
+    return IngestionJob.objects.filter(status=IngestionJob.STATUS_PENDING, id__lt=job.id).count()
+
+
+def requeue_stale_jobs(max_age=None):
+    """Put jobs left in processing by a worker that died back in the queue.
+
+    Jobs that have used up their attempts are failed instead. Returns
+    (requeued, failed).
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=max_age or settings.RAG_INGEST_STALE_SECONDS)
+    stale = IngestionJob.objects.filter(status=IngestionJob.STATUS_PROCESSING).filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+    )
+    failed = stale.filter(attempts__gte=settings.RAG_INGEST_MAX_ATTEMPTS).update(
+        status=IngestionJob.STATUS_FAILED,
+        error='The worker stopped while processing this job on its last attempt',
+        finished_at=now,
+    )
+    requeued = stale.filter(attempts__lt=settings.RAG_INGEST_MAX_ATTEMPTS).update(status=IngestionJob.STATUS_PENDING)
+    return requeued, failed
+
+
+@contextmanager
+def heartbeat(jobs, interval=None):
+    """Refresh the jobs' heartbeat while the block runs, so they are not taken for stale."""
+    interval = interval or max(settings.RAG_INGEST_STALE_SECONDS / 3, 1)
+    job_ids = [job.id for job in jobs]
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(interval):
+                IngestionJob.objects.filter(id__in=job_ids, status=IngestionJob.STATUS_PROCESSING).update(
+                    heartbeat_at=timezone.now()
+                )
+        finally:
+            # This thread's own database connection
+            connection.close()
+
+    thread = threading.Thread(target=beat, name='ingest-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def claim_jobs(max_documents):
+    """Claim pending jobs in order, up to max_documents documents (at least one job).
+
+    Stops before a job that touches a document of an already claimed job, so
+    that document's versions are ingested one after the other.
+    """
+    claimed, document_ids, total = [], set(), 0
+    candidates = IngestionJob.objects.filter(
+        status=IngestionJob.STATUS_PENDING, attempts__lt=settings.RAG_INGEST_MAX_ATTEMPTS
+    ).order_by('id')
+    for job in candidates[:max(max_documents, 1)]:
+        ids = {document['id'] for document in job.documents}
+        if claimed and (total + job.document_count > max_documents or ids & document_ids):
+            break
+
+        started_at = timezone.now()
+        updated = IngestionJob.objects.filter(id=job.id, status=IngestionJob.STATUS_PENDING).update(
+            status=IngestionJob.STATUS_PROCESSING, started_at=started_at, heartbeat_at=started_at,
+            attempts=F('attempts') + 1
+        )
+        if not updated:
+            # Claimed by another worker
+            continue
+        job.status = IngestionJob.STATUS_PROCESSING
+        job.started_at = started_at
+        job.attempts += 1
+        claimed.append(job)
+        document_ids |= ids
+        total += job.document_count
+    return claimed
+
+
+def fail_job(job, error):
+    """Record a failed attempt; the job is retried until RAG_INGEST_MAX_ATTEMPTS."""
+    retry = job.attempts < settings.RAG_INGEST_MAX_ATTEMPTS
+    job.status = IngestionJob.STATUS_PENDING if retry else IngestionJob.STATUS_FAILED
+    job.error = str(error)
+    job.finished_at = None if retry else timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at'])
+
+
+def process_jobs(collection, embedding_model, jobs, batch_size=DEFAULT_BATCH_SIZE, log=None):
+    """Ingest claimed jobs together. Returns the number of chunks embedded."""
+    start = time.perf_counter()
+    tokenizer = model_tokenizer(embedding_model)
+    planned = []
+    for job in jobs:
+        try:
+            plan = plan_ingestion(collection, job.documents, tokenizer, job.chunk_tokens, job.overlap_tokens)
+        except Exception as e:
+            fail_job(job, e)
+            continue
+        planned.append((job, plan))
+    if not planned:
+        return 0
+
+    merged = merge_plans([plan for _, plan in planned])
+    try:
+        encode_seconds = apply_plan(collection, embedding_model, merged, batch_size, log)
+    except Exception as e:
+        if len(planned) == 1:
+            fail_job(planned[0][0], e)
+            return 0
+        # Retry each job on its own so one bad job doesn't fail the others;
+        # they are planned again against what the batch already wrote
+        return sum(process_jobs(collection, embedding_model, [job], batch_size, log) for job, _ in planned)
+
+    seconds = time.perf_counter() - start
+    finished_at = timezone.now()
+    for job, plan in planned:
+        job.status = IngestionJob.STATUS_DONE
+        job.stats = {
+            'documents': job.document_count,
+            **summarize_plan(plan),
+            'batch_jobs': len(planned),
+            'batch_chunks_added': len(merged['ids']),
+            'batch_seconds': round(seconds, 3),
+            'batch_encode_seconds': round(encode_seconds, 3),
+        }
+        job.documents = []
+        job.error = ''
+        job.finished_at = finished_at
+        job.save(update_fields=['status', 'stats', 'documents', 'error', 'finished_at'])
+    return len(merged['ids'])
+
+
+def job_status(job):
+    """API representation of a job."""
+    data = {
+        'job_id': job.id,
+        'status': job.status,
+        'documents': job.document_count,
+        'attempts': job.attempts,
+        'stats': job.stats,
+        'error': job.error or None,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+    }
+    if job.status == IngestionJob.STATUS_PENDING:
+        data['queue_position'] = queue_position(job)
+    return data
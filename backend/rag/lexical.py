@@ -0,0 +1,273 @@
+"""
+In-process BM25 index over the RAG documents.
+
+Exact terms - pesticide names, "NPK 10-10-10", variety names - are matched
+poorly by sentence embeddings, and lexical search needs no transformer
+forward pass. The index is built from the active collection on first use
+and kept up to date by this process's writes. It records the store's count
+of writes by other processes when it was built; once that count moves (or,
+for writers the count cannot see, the document count no longer matches), a
+new index is built in a background thread while searches keep using the
+current one. Writes this process makes during the rebuild are replayed onto
+the new index before it is swapped in.
+"""
+import math
+import re
+import threading
+import time
+from collections import Counter
+import numpy as np
+from .filters import MetadataIndex
+from .store import collection_count, external_write_count, iter_collection
+
+
+TOKEN_RE = re.compile(r'[a-z0-9]+(?:[-./][a-z0-9]+)*')
+SPLIT_RE = re.compile(r'[-./]')
+
+# Rebuild once this fraction of the indexed rows are deleted/overwritten
+MAX_DEAD_FRACTION = 0.2
+
+# Minimum seconds between background rebuilds of a collection's index
+REBUILD_INTERVAL_SECONDS = 5
+
+
+def tokenize(text):
+    """Lowercased terms; compounds like 10-10-10 are kept whole and split."""
+    tokens = TOKEN_RE.findall(text.lower())
+    compounds = [token for token in tokens if not token.isalnum()]
+    for token in compounds:
+        tokens.extend(part for part in SPLIT_RE.split(token) if part)
+    return tokens
+
+
+class BM25Index:
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._ids = []
+        self._documents = []
+        self._metadatas = []
+        self._lengths = []
+        self._alive = []
+        self._rows = {}
+        self._postings = {}
+        self.filters = MetadataIndex()
+        self._compiled = None
+        self._lock = threading.Lock()
+        # external_write_count() of the store the index reflects
+        self.external_writes = None
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, ids, documents, metadatas=None):
+        """Index documents; an existing id is replaced."""
+        with self._lock:
+            self._add(ids, documents, metadatas)
+            if self._ids and 1 - len(self._rows) / len(self._ids) > MAX_DEAD_FRACTION:
+                self._compact()
+
+    def _add(self, ids, documents, metadatas=None):
+        for doc_id, document, metadata in zip(ids, documents, metadatas or [None] * len(ids)):
+            self._remove_row(doc_id)
+            row = len(self._ids)
+            self._ids.append(doc_id)
+            self._documents.append(document)
+            self._metadatas.append(metadata)
+            self._alive.append(True)
+            self._rows[doc_id] = row
+            self.filters.add(row, metadata)
+            terms = tokenize(document or '')
+            self._lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                rows, tfs = self._postings.setdefault(term, ([], []))
+                rows.append(row)
+                tfs.append(tf)
+        self._compiled = None
+
+    def relabel(self, ids, metadatas):
+        """Replace the metadata of indexed documents, keeping their text."""
+        with self._lock:
+            known = [(doc_id, metadata) for doc_id, metadata in zip(ids, metadatas) if doc_id in self._rows]
+            self._add(
+                [doc_id for doc_id, _ in known],
+                [self._documents[self._rows[doc_id]] for doc_id, _ in known],
+                [metadata for _, metadata in known]
+            )
+            if self._ids and 1 - len(self._rows) / len(self._ids) > MAX_DEAD_FRACTION:
+                self._compact()
+
+    def remove(self, ids):
+        with self._lock:
+            for doc_id in ids:
+                self._remove_row(doc_id)
+            self._compiled = None
+
+    def _remove_row(self, doc_id):
+        row = self._rows.pop(doc_id, None)
+        if row is not None:
+            self._alive[row] = False
+
+    def _compact(self):
+        live = sorted(self._rows.values())
+        ids = [self._ids[row] for row in live]
+        documents = [self._documents[row] for row in live]
+        metadatas = [self._metadatas[row] for row in live]
+        self._ids, self._documents, self._metadatas, self._lengths, self._alive = [], [], [], [], []
+        self._rows, self._postings = {}, {}
+        self.filters = MetadataIndex()
+        self._add(ids, documents, metadatas)
+
+    def _compile(self):
+        # Postings as arrays so scoring a term is one vectorized update
+        alive = np.array(self._alive, dtype=bool)
+        lengths = np.array(self._lengths, dtype=np.float32)
+        postings = {}
+        for term, (rows, tfs) in self._postings.items():
+            rows = np.array(rows, dtype=np.int64)
+            tfs = np.array(tfs, dtype=np.float32)
+            keep = alive[rows]
+            if keep.any():
+                postings[term] = (rows[keep], tfs[keep])
+        num_docs = int(alive.sum())
+        avg_length = float(lengths[alive].mean()) if num_docs else 0.0
+        self._compiled = (postings, lengths, num_docs, avg_length)
+        return self._compiled
+
+    def search(self, query, top_k=5, where=None):
+        """Top documents for a query as (id, score, document), best first.
+
+        where is a filter on the indexed metadata fields (see MetadataIndex).
+        """
+        with self._lock:
+            postings, lengths, num_docs, avg_length = self._compiled or self._compile()
+            if not num_docs:
+                return []
+
+            scores = np.zeros(len(lengths), dtype=np.float32)
+            norm = self.k1 * (1 - self.b + self.b * lengths / (avg_length or 1.0))
+            for term in set(tokenize(query)):
+                if term not in postings:
+                    continue
+                rows, tfs = postings[term]
+                idf = math.log(1 + (num_docs - len(rows) + 0.5) / (len(rows) + 0.5))
+                scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + norm[rows])
+
+            if where:
+                scores[~self.filters.mask(where, len(scores))] = 0
+            matched = np.flatnonzero(scores)
+            if not len(matched):
+                return []
+            if len(matched) > top_k:
+                matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+            matched = matched[np.argsort(-scores[matched])]
+            return [(self._ids[row], float(scores[row]), self._documents[row]) for row in matched]
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+# Collection name -> writes made by this process while its index is rebuilt
+_pending = {}
+_last_rebuild = {}
+
+
+def _build_index(collection):
+    index = BM25Index()
+    # Read first: anything written while iterating makes the index stale again
+    index.external_writes = external_write_count()
+    for ids, documents, metadatas in iter_collection(collection, include=('documents', 'metadatas')):
+        index.add(ids, documents, metadatas)
+    return index
+
+
+def _is_stale(index, collection):
+    return index.external_writes != external_write_count() or len(index) != collection_count(collection)
+
+
+def _rebuild_in_background(collection):
+    try:
+        index = _build_index(collection)
+    except Exception as e:
+        print(f'Lexical index rebuild of {collection.name} failed: {e}')
+        with _indexes_lock:
+            _pending.pop(collection.name, None)
+        return
+
+    with _indexes_lock:
+        for update in _pending.pop(collection.name, []):
+            _apply_update(index, *update)
+        if collection.name in _indexes:
+            _indexes[collection.name] = index
+
+
+def get_lexical_index(collection):
+    """BM25 index of a collection.
+
+    Built on first use; afterwards a stale index is returned while a new one
+    is built in the background.
+    """
+    index = _indexes.get(collection.name)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(collection.name)
+            if index is None:
+                index = _build_index(collection)
+                # Indexes of collections this process no longer serves
+                _indexes.clear()
+                _pending.clear()
+                _indexes[collection.name] = index
+        return index
+
+    if collection.name in _pending or not _is_stale(index, collection):
+        return index
+    with _indexes_lock:
+        now = time.monotonic()
+        if collection.name in _pending or now - _last_rebuild.get(collection.name, 0) < REBUILD_INTERVAL_SECONDS:
+            return index
+        _pending[collection.name] = []
+        _last_rebuild[collection.name] = now
+    threading.Thread(
+        target=_rebuild_in_background, args=(collection,), name='lexical-rebuild', daemon=True
+    ).start()
+    return index
+
+
+def _apply_update(index, ids, documents, delete_ids, metadatas, relabel_ids, relabel_metadatas):
+    if delete_ids:
+        index.remove(delete_ids)
+    if ids:
+        index.add(ids, documents, metadatas)
+    if relabel_ids:
+        index.relabel(relabel_ids, relabel_metadatas)
+
+
+def update_lexical_index(collection, ids=(), documents=(), delete_ids=(), metadatas=None,
+                         relabel_ids=(), relabel_metadatas=()):
+    """Apply this process's writes to an already built index (and to one being rebuilt)."""
+    update = (ids, documents, delete_ids, metadatas, relabel_ids, relabel_metadatas)
+    with _indexes_lock:
+        index = _indexes.get(collection.name)
+        if index is None:
+            return
+        _apply_update(index, *update)
+        if collection.name in _pending:
+            _pending[collection.name].append(update)
+
+
+def fuse_results(vector_hits, lexical_hits, top_k=5, alpha=0.5):
+    """Blend vector and BM25 hits into one ranking.
+
+    Both hit lists are (id, score, document) with higher scores better.
+    Scores are max-normalized per list and combined as
+    alpha * vector + (1 - alpha) * lexical.
+    """
+    fused = {}
+    for hits, weight in ((vector_hits, alpha), (lexical_hits, 1 - alpha)):
+        if not hits:
+            continue
+        best = max(score for _, score, _ in hits) or 1.0
+        for doc_id, score, document in hits:
+            entry = fused.setdefault(doc_id, [0.0, document])
+            entry[0] += weight * max(score, 0.0) / best
+    ranked = sorted(fused.items(), key=lambda item: item[1][0], reverse=True)[:top_k]
+    return [(doc_id, score, document) for doc_id, (score, document) in ranked]
@@ -0,0 +1,105 @@
+"""
+Django management command to compare quantized vector storage with exact float32 search.
+Usage: python manage.py benchmark_rag_quantization [--size 50000] [--queries 100] [--top-k 5] [--active]
+
+Reports, per mode, the memory of the scanned index, recall@k against exact
+search and query latency. With --active the vectors of the active RAG index
+are used instead of synthetic clustered embeddings.
+"""
+import shutil
+import tempfile
+from pathlib import Path
+import numpy as np
+from django.core.management.base import BaseCommand
+from rag.benchmark import clustered_embeddings, recall_at_k, summarize_latency, time_calls
+from rag.store import get_collection
+from rag.vector_store import NumpyVectorStore
+
+
+def index_bytes(mode, rows, dim):
+    """Bytes a query has to scan (and should keep resident) per mode."""
+    if mode == 'int8':
+        return rows * dim + rows * 4
+    if mode == 'binary':
+        return rows * ((dim + 7) // 8)
+    return rows * dim * 4
+
+
+class Command(BaseCommand):
+    help = 'Report memory savings versus recall@k of int8/binary quantized vector search'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=50000, help='Synthetic corpus size (chunks)')
+        parser.add_argument('--queries', type=int, default=100, help='Number of queries')
+        parser.add_argument('--top-k', type=int, default=5)
+        parser.add_argument('--rescore-factor', type=int, default=8,
+                            help='Rows rescored at full precision = top_k * factor')
+        parser.add_argument('--modes', default='none,int8,binary', help='Comma-separated modes to compare')
+        parser.add_argument('--active', action='store_true',
+                            help='Use the vectors of the active RAG index instead of synthetic ones')
+
+    def load_active_vectors(self):
+        collection = get_collection()
+        vectors, offset = [], 0
+        while True:
+            page = collection.get(limit=1000, offset=offset, include=('embeddings',))
+            if not page['ids']:
+                break
+            vectors.extend(page['embeddings'])
+            offset += len(page['ids'])
+        return np.asarray(vectors, dtype=np.float32)
+
+    def handle(self, *args, **options):
+        top_k = options['top_k']
+        if options['active']:
+            vectors = self.load_active_vectors()
+            if len(vectors) == 0:
+                self.stdout.write(self.style.ERROR('Active index is empty'))
+                return
+            rng = np.random.default_rng(0)
+            # Perturbed stored chunks stand in for queries about them
+            queries = vectors[rng.integers(0, len(vectors), options['queries'])]
+            queries = queries + 0.1 * rng.standard_normal(queries.shape).astype(np.float32)
+        else:
+            vectors = clustered_embeddings(options['size'])
+            queries = clustered_embeddings(options['queries'], seed=10**6)
+        dim = vectors.shape[1]
+        ids = [f'v{i}' for i in range(len(vectors))]
+
+        self.stdout.write(f'{len(vectors)} vectors x {dim} dims, {len(queries)} queries, top_k={top_k}')
+        # Ground truth: exact cosine top-k
+        unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        exact_results = [[ids[i] for i in np.argsort(-(unit @ q))[:top_k]] for q in queries]
+
+        work_dir = tempfile.mkdtemp(prefix='rag_quant_')
+        try:
+            baseline_bytes = index_bytes('none', len(vectors), dim)
+            self.stdout.write(f'{"mode":>7} {"index":>10} {"saved":>7} {"recall@k":>9} {"p50":>9} {"p95":>9}')
+            for mode in options['modes'].split(','):
+                store = NumpyVectorStore(
+                    Path(work_dir) / mode, mode,
+                    quantization=None if mode == 'none' else mode,
+                    rescore_factor=options['rescore_factor'],
+                )
+                for start in range(0, len(vectors), 5000):
+                    store.upsert(ids[start:start + 5000], vectors[start:start + 5000])
+
+                results = [store.query([q], n_results=top_k, include=())['ids'][0] for q in queries]
+                recall = np.mean([recall_at_k(got, want, top_k) for got, want in zip(results, exact_results)])
+                latency = summarize_latency(time_calls(
+                    lambda q: store.query([q], n_results=top_k, include=()), [(q,) for q in queries]
+                ))
+
+                size = index_bytes(mode, len(vectors), dim)
+                self.stdout.write(
+                    f'{mode:>7} {size / 1024 / 1024:>8.1f}MB {1 - size / baseline_bytes:>6.0%} '
+                    f'{recall:>9.3f} {latency["p50_ms"]:>7.2f}ms {latency["p95_ms"]:>7.2f}ms'
+                )
+                store.close()
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        self.stdout.write(self.style.SUCCESS(
+            '✓ Quantized modes keep float32 vectors on disk and only read '
+            f'top_k x {options["rescore_factor"]} rows of them per query'
+        ))
@@ -0,0 +1,223 @@
+"""
+Django management command to measure RAG retrieval quality and latency as the corpus grows.
+Usage: python manage.py benchmark_rag_retrieval [--sizes 20,1000,10000,100000] [--backends chroma,numpy] [--output results.json]
+
+The default knowledge base is searched with a labelled query set
+(rag/eval_queries.json, --queries for another file, or --generate to build one
+from the documents' sentences), after padding the index with distractor chunks
+up to each size. Reports recall@k and MRR per search mode together with query
+encode and search latency percentiles, and writes everything as JSON so runs
+with different backends, quantization or caching settings can be compared.
+
+Distractors are random vectors unless --distractor-docs gives real text to
+chunk and embed; random vectors load the index like real chunks but are
+never closer to a query than a relevant document, so only real distractors
+show how quality holds up at scale.
+"""
+import json
+import shutil
+import tempfile
+from pathlib import Path
+import chromadb
+import numpy as np
+from chromadb.config import Settings
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from rag.benchmark import (
+    EVAL_QUERIES_PATH, synthetic_embeddings, load_labeled_queries, generate_labeled_queries,
+    retrieval_quality, summarize_latency, time_calls
+)
+from rag.cache import QueryEmbeddingCache
+from rag.embeddings import get_embedding_model
+from rag.filters import document_labels
+from rag.ingest import load_documents, build_chunks, model_tokenizer
+from rag.knowledge import DEFAULT_KNOWLEDGE
+from rag.lexical import BM25Index, fuse_results
+from rag.search import HYBRID_CANDIDATES, SEARCH_MODES, vector_search_batch
+from rag.store import encode_and_add
+from rag.vector_store import ChromaVectorStore, NumpyVectorStore
+
+
+class Command(BaseCommand):
+    help = 'Measure RAG recall@k/MRR and encode/search latency at growing corpus sizes, as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='20,1000,10000,100000',
+                            help='Comma-separated corpus sizes (number of chunks)')
+        parser.add_argument('--backends', default='chroma,numpy',
+                            help='Comma-separated backends (chroma, numpy, numpy-int8, numpy-binary)')
+        parser.add_argument('--modes', default=','.join(SEARCH_MODES),
+                            help='Comma-separated search modes (vector, hybrid, lexical)')
+        parser.add_argument('--top-k', type=int, default=3)
+        parser.add_argument('--queries', default=None,
+                            help=f'Labelled query set (default: {EVAL_QUERIES_PATH.name})')
+        parser.add_argument('--generate', action='store_true',
+                            help='Build the query set from sentences of the knowledge base instead')
+        parser.add_argument('--distractor-docs', default=None,
+                            help='File or directory of real documents to chunk and embed as distractors')
+        parser.add_argument('--repeat', type=int, default=3, help='Timed passes over the query set')
+        parser.add_argument('--output', default=None, help='Write the JSON results to this file ("-" for stdout)')
+
+    def make_store(self, backend, persist_dir):
+        if backend.startswith('numpy'):
+            quantization = backend.partition('-')[2] or None
+            return NumpyVectorStore(Path(persist_dir) / 'numpy' / 'benchmark', 'benchmark', quantization=quantization)
+        client = chromadb.PersistentClient(path=persist_dir, settings=Settings(anonymized_telemetry=False))
+        return ChromaVectorStore(client.create_collection('benchmark'))
+
+    def load_distractors(self, embedding_model, path):
+        """Chunk texts and embeddings of real distractor documents."""
+        if not path:
+            return [], np.zeros((0, 0), dtype=np.float32)
+        tokenizer = model_tokenizer(embedding_model)
+        texts = []
+        for document in load_documents([path]):
+            texts.extend(build_chunks(document, tokenizer)[1])
+        self.stdout.write(f'Embedding {len(texts)} distractor chunks...')
+        return texts, np.asarray(embedding_model.encode(texts, batch_size=64), dtype=np.float32)
+
+    def add_distractors(self, store, index, start, stop, dim, distractor_texts, distractor_vectors):
+        """Pad the store and lexical index with distractor chunks start..stop-1."""
+        for batch_start in range(start, stop, 5000):
+            batch = range(batch_start, min(batch_start + 5000, stop))
+            real = [i for i in batch if i < len(distractor_texts)]
+            synthetic = len(batch) - len(real)
+            vectors = [distractor_vectors[i] for i in real]
+            if synthetic:
+                vectors.extend(synthetic_embeddings(synthetic, dim, seed=batch_start))
+            ids = [f'distractor_{i}' for i in batch]
+            documents = [distractor_texts[i] if i < len(distractor_texts) else f'Synthetic distractor chunk {i}'
+                         for i in batch]
+            store.upsert(
+                ids=ids,
+                embeddings=np.asarray(vectors, dtype=np.float32).tolist(),
+                documents=documents,
+                metadatas=[{'source': 'benchmark'} for _ in batch],
+            )
+            index.add(ids, documents)
+
+    def measure_encoding(self, embedding_model, texts):
+        """Per-query encode latency: uncached, as one batch, and from the query cache."""
+        embedding_model.encode(texts[0])
+        uncached = time_calls(embedding_model.encode, [(text,) for text in texts])
+
+        batched = time_calls(embedding_model.encode, [(texts,)])[0] / len(texts)
+
+        cache = QueryEmbeddingCache(settings.RAG_EMBEDDING_MODEL, max_size=len(texts))
+        cache.encode(texts, embedding_model)
+        cached = time_calls(lambda text: cache.encode([text], embedding_model), [(text,) for text in texts])
+        return {
+            'uncached': summarize_latency(uncached),
+            'batched_per_query_ms': batched * 1000,
+            'cached': summarize_latency(cached),
+        }
+
+    def search(self, store, index, mode, query, embedding, top_k):
+        if mode == 'lexical':
+            return index.search(query, top_k)
+        if mode == 'hybrid':
+            candidates = top_k * HYBRID_CANDIDATES
+            return fuse_results(
+                vector_search_batch(store, [embedding], candidates)[0],
+                index.search(query, candidates),
+                top_k=top_k
+            )
+        return vector_search_batch(store, [embedding], top_k)[0]
+
+    def handle(self, *args, **options):
+        embedding_model = get_embedding_model()
+        if embedding_model is None:
+            self.stdout.write(self.style.ERROR('Embedding model not initialized'))
+            return
+
+        if options['generate']:
+            queries = generate_labeled_queries(DEFAULT_KNOWLEDGE)
+        else:
+            try:
+                queries = load_labeled_queries(options['queries'] or EVAL_QUERIES_PATH)
+            except (OSError, ValueError) as e:
+                self.stdout.write(self.style.ERROR(str(e)))
+                return
+
+        modes = options['modes'].split(',')
+        unknown = [mode for mode in modes if mode not in SEARCH_MODES]
+        if unknown:
+            self.stdout.write(self.style.ERROR(f'Unknown search mode(s): {", ".join(unknown)}'))
+            return
+
+        top_k = options['top_k']
+        sizes = sorted(max(int(size), len(DEFAULT_KNOWLEDGE)) for size in options['sizes'].split(','))
+        texts = [query['query'] for query in queries]
+
+        self.stdout.write(f'{len(queries)} labelled queries, top_k={top_k}, corpus of {len(DEFAULT_KNOWLEDGE)} documents')
+        encoding = self.measure_encoding(embedding_model, texts)
+        self.stdout.write(
+            f'Encode p50: {encoding["uncached"]["p50_ms"]:.2f}ms uncached, '
+            f'{encoding["batched_per_query_ms"]:.2f}ms/query batched, {encoding["cached"]["p50_ms"]:.3f}ms cached'
+        )
+
+        embeddings = np.asarray(embedding_model.encode(texts), dtype=np.float32).tolist()
+        distractor_texts, distractor_vectors = self.load_distractors(embedding_model, options['distractor_docs'])
+
+        results = []
+        for backend in options['backends'].split(','):
+            persist_dir = tempfile.mkdtemp(prefix=f'rag_eval_{backend}_')
+            try:
+                store = self.make_store(backend, persist_dir)
+                encode_and_add(
+                    store, embedding_model,
+                    ids=[item['id'] for item in DEFAULT_KNOWLEDGE],
+                    documents=[item['content'] for item in DEFAULT_KNOWLEDGE],
+                    metadatas=[{'source': item['source'], **document_labels(item)} for item in DEFAULT_KNOWLEDGE],
+                )
+                index = BM25Index()
+                index.add([item['id'] for item in DEFAULT_KNOWLEDGE], [item['content'] for item in DEFAULT_KNOWLEDGE])
+
+                self.stdout.write(self.style.SUCCESS(f'\nBackend: {backend}'))
+                self.stdout.write(f'{"chunks":>8} {"mode":>8} {f"recall@{top_k}":>9} {"mrr":>6} '
+                                  f'{"p50":>9} {"p95":>9} {"p99":>9}')
+                size_now = len(DEFAULT_KNOWLEDGE)
+                for size in sizes:
+                    self.add_distractors(
+                        store, index, size_now - len(DEFAULT_KNOWLEDGE), size - len(DEFAULT_KNOWLEDGE),
+                        len(embeddings[0]), distractor_texts, distractor_vectors
+                    )
+                    size_now = max(size_now, size)
+
+                    for mode in modes:
+                        hits = [self.search(store, index, mode, text, embedding, top_k)
+                                for text, embedding in zip(texts, embeddings)]
+                        quality = retrieval_quality([[doc_id for doc_id, _, _ in h] for h in hits], queries, top_k)
+                        latency = summarize_latency(time_calls(
+                            lambda text, embedding: self.search(store, index, mode, text, embedding, top_k),
+                            list(zip(texts, embeddings)) * options['repeat']
+                        ))
+                        results.append({
+                            'backend': backend, 'size': size, 'mode': mode, **quality, 'search': latency,
+                        })
+                        self.stdout.write(
+                            f'{size:>8} {mode:>8} {quality[f"recall@{top_k}"]:>9.3f} {quality["mrr"]:>6.3f} '
+                            f'{latency["p50_ms"]:>7.2f}ms {latency["p95_ms"]:>7.2f}ms {latency["p99_ms"]:>7.2f}ms'
+                        )
+                if hasattr(store, 'close'):
+                    store.close()
+            finally:
+                shutil.rmtree(persist_dir, ignore_errors=True)
+
+        report = {
+            'config': {
+                'embedding_model': settings.RAG_EMBEDDING_MODEL,
+                'top_k': top_k,
+                'queries': len(queries),
+                'query_set': 'generated' if options['generate'] else str(options['queries'] or EVAL_QUERIES_PATH.name),
+                'distractors': 'real+synthetic' if distractor_texts else 'synthetic',
+                'distractor_chunks': len(distractor_texts),
+            },
+            'encode': encoding,
+            'results': results,
+        }
+        if options['output'] == '-':
+            self.stdout.write(json.dumps(report, indent=2))
+        elif options['output']:
+            Path(options['output']).write_text(json.dumps(report, indent=2))
+            self.stdout.write(self.style.SUCCESS(f'\n✓ Results written to {options["output"]}'))
@@ -0,0 +1,87 @@
+"""
+Django management command to measure RAG search latency and memory as the corpus grows.
+Usage: python manage.py benchmark_rag_search [--sizes 100,1000,10000,100000] [--queries 50] [--backends chroma,numpy]
+"""
+import os
+import shutil
+import tempfile
+from pathlib import Path
+import chromadb
+from chromadb.config import Settings
+from django.core.management.base import BaseCommand
+from disease_detection.management.commands.measure_worker_memory import read_smaps_rollup
+from rag.benchmark import synthetic_embeddings, summarize_latency, time_calls, grow_collection
+from rag.store import ensure_bootstrapped, collection_count
+from rag.vector_store import ChromaVectorStore, NumpyVectorStore
+
+
+def directory_size_mb(path):
+    return sum(f.stat().st_size for f in Path(path).rglob('*') if f.is_file()) / 1024 / 1024
+
+
+class Command(BaseCommand):
+    help = 'Compare search latency and memory of the vector store backends at growing corpus sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,1000,10000,100000',
+                            help='Comma-separated corpus sizes (number of chunks)')
+        parser.add_argument('--queries', type=int, default=50, help='Queries per measurement')
+        parser.add_argument('--top-k', type=int, default=3)
+        parser.add_argument('--backends', default='chroma,numpy',
+                            help='Comma-separated backends to compare (chroma, numpy)')
+        parser.add_argument('--skip-full-scan', action='store_true',
+                            help='Only measure the current hot path')
+
+    def make_store(self, backend, persist_dir):
+        if backend == 'numpy':
+            return NumpyVectorStore(Path(persist_dir) / 'numpy' / 'benchmark', 'benchmark')
+        client = chromadb.PersistentClient(path=persist_dir, settings=Settings(anonymized_telemetry=False))
+        return ChromaVectorStore(client.create_collection('benchmark'))
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        top_k = options['top_k']
+        queries = [[q] for q in synthetic_embeddings(options['queries'], seed=10**9).tolist()]
+
+        for backend in options['backends'].split(','):
+            # Throwaway on-disk store so timings match the persistent store
+            persist_dir = tempfile.mkdtemp(prefix=f'rag_bench_{backend}_')
+            try:
+                collection = self.make_store(backend, persist_dir)
+
+                def hot_path(embedding):
+                    ensure_bootstrapped(collection, None)
+                    collection.query(query_embeddings=embedding, n_results=top_k)
+
+                def full_scan_path(embedding):
+                    len(collection.get()['ids'])
+                    collection.query(query_embeddings=embedding, n_results=top_k)
+
+                self.stdout.write(self.style.SUCCESS(f'\nBackend: {backend}'))
+                self.stdout.write(f'{"chunks":>8} {"hot p50":>9} {"hot p95":>9} {"scan p50":>10} {"scan p95":>10} '
+                                  f'{"disk":>9} {"rss +":>9} {"private +":>10}')
+                for size in sizes:
+                    before = read_smaps_rollup(os.getpid())
+                    grow_collection(collection, size)
+                    collection_count(collection, max_age=0)
+
+                    # Warm up (HNSW load / vector mapping) before timing
+                    hot_path(queries[0])
+                    hot = summarize_latency(time_calls(hot_path, queries))
+                    after = read_smaps_rollup(os.getpid())
+
+                    line = f'{size:>8} {hot["p50_ms"]:>8.2f}ms {hot["p95_ms"]:>8.2f}ms'
+                    if not options['skip_full_scan']:
+                        scan = summarize_latency(time_calls(full_scan_path, queries[:10]))
+                        line += f' {scan["p50_ms"]:>9.2f}ms {scan["p95_ms"]:>9.2f}ms'
+                    else:
+                        line += f' {"-":>11} {"-":>11}'
+                    line += (f' {directory_size_mb(persist_dir):>7.1f}MB'
+                             f' {(after["Rss"] - before["Rss"]) / 1024:>7.1f}MB'
+                             f' {(after["Uss"] - before["Uss"]) / 1024:>8.1f}MB')
+                    self.stdout.write(line)
+            finally:
+                shutil.rmtree(persist_dir, ignore_errors=True)
+
+        self.stdout.write('\nrss/private: growth of this process while growing to and querying at that size; numpy vectors are '
+                          'file-backed pages shared by all workers, Chroma HNSW memory is private per worker.')
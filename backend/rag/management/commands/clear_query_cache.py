@@ -0,0 +1,35 @@
+"""
+Django management command to invalidate the query embedding cache.
+Usage: python manage.py clear_query_cache [--all]
+
+By default only rows persisted for other embedding models (or the other of
+float32/int8 ONNX) are deleted, e.g. after switching RAG_EMBEDDING_MODEL;
+--all also clears the entries of the current model.
+"""
+from django.core.management.base import BaseCommand
+from rag.embeddings import get_embedding_provider
+
+
+class Command(BaseCommand):
+    help = 'Delete query embeddings cached for other embedding models (or all of them)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Also clear the current model\'s entries')
+
+    def handle(self, *args, **options):
+        cache = get_embedding_provider().query_cache
+        if cache is None:
+            self.stdout.write(self.style.WARNING('Query cache disabled (RAG_QUERY_CACHE_SIZE=0)'))
+            return
+        if cache.sqlite_path is None:
+            self.stdout.write(self.style.WARNING('Query cache is in-process only; nothing persisted to clear'))
+            return
+
+        if options['all']:
+            cache.clear()
+            self.stdout.write(self.style.SUCCESS(f'✓ Cleared {cache.sqlite_path}'))
+        else:
+            deleted = cache.drop_other_models()
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ Deleted {deleted} cached embeddings of models other than {cache.model_name}'
+            ))
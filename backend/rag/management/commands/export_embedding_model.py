@@ -0,0 +1,105 @@
+"""
+Django management command to export the RAG embedding model to ONNX and check it.
+Usage: python manage.py export_embedding_model [--output DIR] [--quantize] [--verify] [--verify-only]
+
+Exporting needs torch and sentence-transformers (and onnx for --quantize); the
+exported model is then served with RAG_EMBEDDING_BACKEND=onnx using only
+onnxruntime and tokenizers. --verify compares the ONNX embeddings of the
+knowledge base, the labelled eval queries and a text longer than the model's
+max_seq_length with sentence-transformers' (cosine similarity per text), and
+reports batched CPU throughput of each backend.
+"""
+from pathlib import Path
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from rag.benchmark import EVAL_QUERIES_PATH, load_labeled_queries
+from rag.knowledge import DEFAULT_KNOWLEDGE
+from rag.onnx_embeddings import (
+    QUANTIZED_MODEL_FILE, OnnxEmbeddingModel, compare_embeddings, export_embedding_model, texts_per_second
+)
+
+
+class Command(BaseCommand):
+    help = 'Export the RAG sentence embedding model to ONNX (optionally int8) and verify cosine parity'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', default=settings.RAG_EMBEDDING_MODEL)
+        parser.add_argument('--output', default=str(settings.RAG_ONNX_MODEL_DIR), help='Export directory')
+        parser.add_argument('--quantize', action='store_true', help='Also write an int8 dynamically quantized model')
+        parser.add_argument('--verify', action='store_true', help='Check parity and throughput after exporting')
+        parser.add_argument('--verify-only', action='store_true', help='Check an existing export without exporting')
+        parser.add_argument('--batch-size', type=int, default=32)
+        parser.add_argument('--min-cosine', type=float, default=0.999,
+                            help='Lowest acceptable per-text cosine similarity of the float32 export')
+        parser.add_argument('--min-cosine-int8', type=float, default=0.98,
+                            help='Lowest acceptable per-text cosine similarity of the int8 export')
+
+    def verification_texts(self):
+        texts = [item['content'] for item in DEFAULT_KNOWLEDGE]
+        texts.extend(query['query'] for query in load_labeled_queries(EVAL_QUERIES_PATH))
+        # Exercises truncation at max_seq_length
+        texts.append(' '.join(item['content'] for item in DEFAULT_KNOWLEDGE))
+        return texts
+
+    def verify(self, output_dir, model_name, batch_size, thresholds):
+        texts = self.verification_texts()
+        try:
+            from sentence_transformers import SentenceTransformer
+            reference_model = SentenceTransformer(model_name, device='cpu')
+        except ImportError:
+            reference_model = None
+            self.stdout.write(self.style.WARNING('sentence-transformers not installed; skipping the parity check'))
+
+        variants = [('float32', False)]
+        if (output_dir / QUANTIZED_MODEL_FILE).exists():
+            variants.append(('int8', True))
+
+        reference = None
+        if reference_model is not None:
+            reference = reference_model.encode(texts, batch_size=batch_size, normalize_embeddings=False)
+            self.stdout.write(f'sentence-transformers: {texts_per_second(reference_model, texts, batch_size):.1f} texts/s')
+
+        passed = True
+        for label, quantized in variants:
+            model = OnnxEmbeddingModel(output_dir, quantized=quantized)
+            throughput = texts_per_second(model, texts, batch_size)
+            if reference is None:
+                self.stdout.write(f'onnx {label}: {throughput:.1f} texts/s')
+                continue
+
+            cosine = compare_embeddings(reference, model.encode(texts, batch_size=batch_size))
+            ok = cosine.min() >= thresholds[label]
+            passed = passed and ok
+            line = (f'onnx {label}: {throughput:.1f} texts/s, cosine min {cosine.min():.5f} '
+                    f'mean {cosine.mean():.5f} over {len(texts)} texts')
+            self.stdout.write(self.style.SUCCESS(f'✓ {line}') if ok else self.style.ERROR(
+                f'{line} (below {thresholds[label]}; worst: {texts[int(np.argmin(cosine))][:60]!r})'
+            ))
+        return passed
+
+    def handle(self, *args, **options):
+        output_dir = Path(options['output'])
+        if not options['verify_only']:
+            self.stdout.write(f'Exporting {options["model"]} to {output_dir}...')
+            try:
+                config = export_embedding_model(options['model'], output_dir, quantize=options['quantize'])
+            except (ImportError, ValueError) as e:
+                self.stdout.write(self.style.ERROR(f'Export failed: {e}'))
+                return
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ Exported {config["dimension"]}-d model (max_seq_length {config["max_seq_length"]})'
+                + (' with int8 copy' if options['quantize'] else '')
+            ))
+
+        if options['verify'] or options['verify_only']:
+            try:
+                passed = self.verify(
+                    output_dir, options['model'], options['batch_size'],
+                    {'float32': options['min_cosine'], 'int8': options['min_cosine_int8']},
+                )
+            except OSError as e:
+                self.stdout.write(self.style.ERROR(str(e)))
+                return
+            if not passed:
+                self.stdout.write(self.style.ERROR('Parity check failed'))
@@ -0,0 +1,74 @@
+"""
+Django management command that runs the RAG ingestion worker.
+Usage: python manage.py process_ingestion_queue [--once] [--max-documents 200] [--poll-interval 2]
+
+Claims queued ingestion jobs (see rag/ingest_queue.py) in order and embeds
+the new chunks of all claimed jobs in shared batches, so many small uploads
+cost about as much as one large one. Runs until interrupted; --once drains
+the queue and exits. Several workers can run against the same database.
+
+Server workers pick up the new documents shortly after the worker writes
+them: the store's write marker makes them reload a local Chroma client
+(see rag/store.py), and the numpy store checks SQLite's data_version.
+"""
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from rag.embeddings import get_embedding_model
+from rag.ingest import DEFAULT_BATCH_SIZE
+from rag.models import IngestionJob
+from rag.ingest_queue import claim_jobs, heartbeat, process_jobs, requeue_stale_jobs, waiting_documents
+from rag.store import get_collection
+
+
+class Command(BaseCommand):
+    help = 'Process queued RAG ingestion jobs, batching chunks across jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+        parser.add_argument('--max-documents', type=int, default=settings.RAG_INGEST_BATCH_DOCUMENTS,
+                            help='Documents claimed per round (across jobs)')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Chunks per encode call')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds between polls of an empty queue')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Ingestion worker started, {waiting_documents()} documents waiting')
+
+        try:
+            while True:
+                # Every poll, so jobs of a worker that died are picked up by the others
+                requeued, exhausted = requeue_stale_jobs()
+                if requeued:
+                    self.stdout.write(self.style.WARNING(f'Requeued {requeued} stale jobs'))
+                if exhausted:
+                    self.stdout.write(self.style.ERROR(f'Failed {exhausted} stale jobs out of attempts'))
+
+                embedding_model = get_embedding_model()
+                if embedding_model is None:
+                    self.stdout.write(self.style.ERROR('Embedding model not initialized'))
+                    if options['once']:
+                        return
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                jobs = claim_jobs(options['max_documents'])
+                if not jobs:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                start = time.perf_counter()
+                # Looked up per round, so a rebuilt index is picked up
+                with heartbeat(jobs):
+                    chunks = process_jobs(get_collection(), embedding_model, jobs, batch_size=options['batch_size'])
+                seconds = time.perf_counter() - start
+                failed = [job.id for job in jobs if job.status != IngestionJob.STATUS_DONE]
+                self.stdout.write(self.style.SUCCESS(
+                    f'✓ Jobs {", ".join(str(job.id) for job in jobs)}: '
+                    f'{sum(job.document_count for job in jobs)} documents, {chunks} chunks embedded in {seconds:.2f}s'
+                ))
+                if failed:
+                    self.stdout.write(self.style.ERROR(f'Failed jobs: {", ".join(map(str, failed))}'))
+        except KeyboardInterrupt:
+            self.stdout.write('Ingestion worker stopped')
@@ -0,0 +1,39 @@
+"""
+Django management command to rebuild the RAG vector index as a new version.
+Usage: python manage.py rebuild_rag_index [--index-version N] [--defaults-only] [--keep-old]
+"""
+from django.core.management.base import BaseCommand
+from rag.embeddings import get_embedding_model
+from rag.store import read_active_index, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Re-embed the knowledge base into a new versioned collection and switch all workers to it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--index-version', type=int, default=None,
+                            help='Version number of the new index (default: current + 1)')
+        parser.add_argument('--defaults-only', action='store_true',
+                            help='Only load the default knowledge instead of carrying over existing documents')
+        parser.add_argument('--keep-old', action='store_true',
+                            help='Keep previous index versions instead of deleting them')
+
+    def handle(self, *args, **options):
+        embedding_model = get_embedding_model()
+        if embedding_model is None:
+            self.stdout.write(self.style.ERROR('Embedding model not initialized'))
+            return
+
+        current = read_active_index()
+        self.stdout.write(f'Current index: version {current["version"]} ({current["collection"]})')
+
+        info = rebuild_index(
+            embedding_model,
+            version=options['index_version'],
+            defaults_only=options['defaults_only'],
+            keep_old=options['keep_old'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Index version {info["version"]} built with {info["count"]} documents ({info["collection"]})'
+        ))
@@ -0,0 +1,170 @@
+"""
+Sentence embeddings with onnxruntime instead of sentence-transformers/PyTorch.
+
+export_embedding_model() writes the transformer of a SentenceTransformer model
+to ONNX (optionally also an int8 dynamically quantized copy) together with its
+fast tokenizer. OnnxEmbeddingModel serves it with the same tokenization,
+truncation, mean pooling and L2 normalization, and the same encode() interface,
+so it is a drop-in replacement for the RAG embedding model. Exporting needs
+torch and sentence-transformers; serving needs only onnxruntime and tokenizers.
+"""
+import json
+import time
+from pathlib import Path
+import numpy as np
+
+
+CONFIG_FILE = 'embedding_config.json'
+MODEL_FILE = 'model.onnx'
+QUANTIZED_MODEL_FILE = 'model.int8.onnx'
+TOKENIZER_FILE = 'tokenizer.json'
+
+
+def export_embedding_model(model_name, output_dir, quantize=False, opset_version=14):
+    """Export a mean-pooling SentenceTransformer model to ONNX. Returns the written config."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    st_model = SentenceTransformer(model_name, device='cpu')
+    pooling = [module for module in st_model if isinstance(module, Pooling)]
+    if len(pooling) != 1 or pooling[0].get_pooling_mode_str() != 'mean':
+        raise ValueError(f'{model_name} does not use mean pooling; only mean pooling is supported')
+
+    class Encoder(torch.nn.Module):
+        # Token embeddings only: pooling and normalization run in numpy
+        def __init__(self, transformer):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.transformer(
+                input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids
+            ).last_hidden_state
+
+    encoder = Encoder(st_model[0].auto_model).eval()
+    dummy = st_model.tokenizer(['export'], return_tensors='pt')
+    model_path = output_dir / MODEL_FILE
+    with torch.no_grad():
+        torch.onnx.export(
+            encoder,
+            (dummy['input_ids'], dummy['attention_mask'], dummy['token_type_ids']),
+            str(model_path),
+            input_names=['input_ids', 'attention_mask', 'token_type_ids'],
+            output_names=['last_hidden_state'],
+            dynamic_axes={
+                'input_ids': {0: 'batch_size', 1: 'sequence'},
+                'attention_mask': {0: 'batch_size', 1: 'sequence'},
+                'token_type_ids': {0: 'batch_size', 1: 'sequence'},
+                'last_hidden_state': {0: 'batch_size', 1: 'sequence'},
+            },
+            opset_version=opset_version,
+            export_params=True,
+            do_constant_folding=True,
+        )
+    st_model.tokenizer.save_pretrained(str(output_dir))
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(str(model_path), str(output_dir / QUANTIZED_MODEL_FILE), weight_type=QuantType.QInt8)
+
+    config = {
+        'model_name': model_name,
+        'dimension': st_model.get_sentence_embedding_dimension(),
+        'max_seq_length': st_model.max_seq_length,
+        'pad_token': st_model.tokenizer.pad_token,
+        'normalize': any(isinstance(module, Normalize) for module in st_model),
+        'quantized': bool(quantize),
+    }
+    with open(output_dir / CONFIG_FILE, 'w') as f:
+        json.dump(config, f, indent=2)
+    return config
+
+
+class OnnxEmbeddingModel:
+    """ONNX export of a sentence embedding model with a SentenceTransformer-like encode()."""
+
+    def __init__(self, model_dir, quantized=False, intra_op_threads=0):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_dir = Path(model_dir)
+        with open(self.model_dir / CONFIG_FILE, 'r') as f:
+            self.config = json.load(f)
+        self.max_seq_length = self.config['max_seq_length']
+        self.normalize = self.config['normalize']
+
+        model_path = self.model_dir / (QUANTIZED_MODEL_FILE if quantized else MODEL_FILE)
+        if not model_path.exists():
+            raise FileNotFoundError(f'{model_path} not found; run `python manage.py export_embedding_model`'
+                                    + (' --quantize' if quantized else ''))
+        options = ort.SessionOptions()
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(str(model_path), options, providers=['CPUExecutionProvider'])
+        self._input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+        # Untruncated tokenizer for chunking (token offsets), and a padded and
+        # truncated one for encoding
+        tokenizer_path = str(self.model_dir / TOKENIZER_FILE)
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.no_truncation()
+        self.tokenizer.no_padding()
+        self._batch_tokenizer = Tokenizer.from_file(tokenizer_path)
+        self._batch_tokenizer.enable_truncation(self.max_seq_length)
+        pad_token = self.config['pad_token']
+        self._batch_tokenizer.enable_padding(pad_id=self._batch_tokenizer.token_to_id(pad_token), pad_token=pad_token)
+
+    def get_sentence_embedding_dimension(self):
+        return self.config['dimension']
+
+    def _encode_batch(self, texts):
+        encodings = self._batch_tokenizer.encode_batch(texts)
+        attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        feeds = {
+            'input_ids': np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            'attention_mask': attention_mask,
+        }
+        if 'token_type_ids' in self._input_names:
+            feeds['token_type_ids'] = np.array([encoding.type_ids for encoding in encodings], dtype=np.int64)
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        # Mean over real tokens, as sentence-transformers' Pooling layer
+        mask = attention_mask[:, :, None].astype(np.float32)
+        embeddings = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings
+
+    def encode(self, sentences, batch_size=32, **kwargs):
+        """Embeddings as a float32 array: 1-D for a single string, 2-D for a list."""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        embeddings = np.zeros((len(texts), self.config['dimension']), dtype=np.float32)
+
+        # Longest first, so each batch pads to similar lengths
+        order = np.argsort([-len(text) for text in texts], kind='stable')
+        for start in range(0, len(texts), batch_size):
+            rows = order[start:start + batch_size]
+            embeddings[rows] = self._encode_batch([texts[row] for row in rows])
+        return embeddings[0] if single else embeddings
+
+
+def compare_embeddings(reference, candidate):
+    """Per-text cosine similarity between two embedding matrices."""
+    reference = np.asarray(reference, dtype=np.float32)
+    candidate = np.asarray(candidate, dtype=np.float32)
+    dot = (reference * candidate).sum(axis=1)
+    norms = np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    return dot / np.clip(norms, 1e-12, None)
+
+
+def texts_per_second(model, texts, batch_size=32, repeat=3):
+    model.encode(texts[:batch_size], batch_size=batch_size)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        model.encode(texts, batch_size=batch_size)
+    return len(texts) * repeat / (time.perf_counter() - start)
@@ -0,0 +1,112 @@
+"""
+Retrieval over the active RAG collection.
+
+Shared by the single and batch search endpoints. Queries are embedded in one
+batched call (through the query embedding cache), vector searches with the
+same filter run as one multi-query collection call, and every mode falls
+back to BM25 when the embedding model is unavailable. Metadata filters
+(see filters.py) narrow the candidate rows before anything is scored.
+"""
+import json
+from inference_service.client import InferenceServiceError
+from .embeddings import get_embedding_provider, get_embedding_model, EmbeddingModelUnavailable
+from .lexical import get_lexical_index, fuse_results
+from .store import ensure_bootstrapped
+
+
+SEARCH_MODES = ('vector', 'hybrid', 'lexical')
+MAX_TOP_K = 5
+
+# Extra candidates fetched per side before fusing or post-filtering
+HYBRID_CANDIDATES = 4
+LEXICAL_FILTER_CANDIDATES = 10
+
+
+def embed_queries(collection, texts):
+    """Query embeddings in one batched call, or None if the model is unavailable."""
+    embedding_model = get_embedding_model()
+    if not embedding_model:
+        return None
+    # Auto-initialize an empty collection (checked once per process;
+    # an existing on-disk index is used as is)
+    ensure_bootstrapped(collection, embedding_model)
+    try:
+        return [embedding.tolist() for embedding in get_embedding_provider().encode_queries(texts)]
+    except (EmbeddingModelUnavailable, InferenceServiceError):
+        return None
+
+
+def vector_search_batch(collection, query_embeddings, top_k, where=None):
+    """Nearest chunks per query as lists of (id, similarity, document), best first."""
+    results = collection.query(
+        query_embeddings=query_embeddings,
+        n_results=top_k,
+        where=where,
+        include=['documents', 'distances']
+    )
+    hits = []
+    for ids, distances, documents in zip(results['ids'], results['distances'], results['documents']):
+        # Squared L2 between unit vectors: cosine similarity = 1 - d / 2
+        hits.append([
+            (doc_id, 1 - distance / 2, document)
+            for doc_id, distance, document in zip(ids, distances, documents)
+        ])
+    return hits
+
+
+def lexical_search(collection, query, top_k, where=None):
+    """BM25 hits; filters on other than the indexed fields are applied afterwards."""
+    index = get_lexical_index(collection)
+    if not where or index.filters.covers(where):
+        return index.search(query, top_k, where=where)
+
+    hits = index.search(query, top_k * LEXICAL_FILTER_CANDIDATES)
+    if not hits:
+        return []
+    allowed = set(collection.get(ids=[doc_id for doc_id, _, _ in hits], where=where, include=[])['ids'])
+    return [hit for hit in hits if hit[0] in allowed][:top_k]
+
+
+def search_many(collection, queries, mode='vector', alpha=0.5):
+    """Run several searches together.
+
+    queries is a list of {'query', 'top_k', 'where'} dicts. Returns the mode
+    actually used (lexical when no embeddings could be computed) and a list of
+    hit lists in query order.
+    """
+    embeddings = None
+    if mode != 'lexical':
+        embeddings = embed_queries(collection, [q['query'] for q in queries])
+        if embeddings is None:
+            mode = 'lexical'
+
+    vector_hits = [None] * len(queries)
+    if mode != 'lexical':
+        factor = HYBRID_CANDIDATES if mode == 'hybrid' else 1
+        groups = {}
+        for i, q in enumerate(queries):
+            groups.setdefault(json.dumps(q.get('where'), sort_keys=True), []).append(i)
+        for members in groups.values():
+            n_results = max(queries[i]['top_k'] for i in members) * factor
+            batch = vector_search_batch(
+                collection, [embeddings[i] for i in members], n_results, queries[members[0]].get('where')
+            )
+            for i, hits in zip(members, batch):
+                vector_hits[i] = hits[:queries[i]['top_k'] * factor]
+
+    results = []
+    for i, q in enumerate(queries):
+        if mode == 'vector':
+            hits = vector_hits[i]
+        elif mode == 'hybrid':
+            candidates = q['top_k'] * HYBRID_CANDIDATES
+            hits = fuse_results(
+                vector_hits[i],
+                lexical_search(collection, q['query'], candidates, q.get('where')),
+                top_k=q['top_k'],
+                alpha=alpha
+            )
+        else:
+            hits = lexical_search(collection, q['query'], q['top_k'], q.get('where'))
+        results.append(hits)
+    return mode, results
@@ -0,0 +1,91 @@
+"""
+RAG operations callable in-process.
+
+The search and initialize endpoints are thin wrappers around these, and the
+advisory views call them directly instead of going through HTTP. Invalid
+arguments raise ValueError.
+"""
+from .embeddings import get_embedding_model, EmbeddingModelUnavailable
+from .filters import build_where
+from .search import SEARCH_MODES, MAX_TOP_K, search_many
+from .store import get_collection, ensure_bootstrapped, collection_count
+
+# Queries accepted by one batch search
+MAX_BATCH_QUERIES = 20
+
+
+def search_knowledge(query, top_k=3, mode='vector', filters=None, alpha=0.5, collection=None):
+    """Documents retrieved for one query: {'query', 'mode', 'results', 'count'}.
+
+    mode is 'vector', 'hybrid' or 'lexical' (see search.py); the mode actually
+    used is returned, as vector and hybrid fall back to lexical.
+    """
+    if not query:
+        raise ValueError('No query provided')
+    if mode not in SEARCH_MODES:
+        raise ValueError(f'Unknown search mode: {mode}')
+
+    mode, (hits,) = search_many(
+        collection or get_collection(),
+        [{'query': query, 'top_k': min(top_k, MAX_TOP_K), 'where': build_where(filters)}],
+        mode=mode,
+        alpha=alpha
+    )
+    retrieved_docs = [document for _, _, document in hits]
+    return {
+        'query': query,
+        'mode': mode,
+        'results': retrieved_docs,
+        'count': len(retrieved_docs)
+    }
+
+
+def batch_search(queries, mode='vector', alpha=0.5, collection=None):
+    """Several searches with one batched embedding pass: {'mode', 'results': {key: ...}, 'count'}.
+
+    queries is a list of {'key', 'query', 'top_k', 'filters'}; results are
+    keyed by each query's key (default: its position in the list).
+    """
+    if not isinstance(queries, list) or not queries:
+        raise ValueError('No queries provided')
+    if len(queries) > MAX_BATCH_QUERIES:
+        raise ValueError(f'At most {MAX_BATCH_QUERIES} queries per request')
+    if not all(isinstance(q, dict) and q.get('query') for q in queries):
+        raise ValueError('Each query needs a query field')
+
+    keys = [str(q.get('key', i)) for i, q in enumerate(queries)]
+    if len(set(keys)) != len(keys):
+        raise ValueError('Query keys must be unique')
+    if mode not in SEARCH_MODES:
+        raise ValueError(f'Unknown search mode: {mode}')
+
+    searches = [{
+        'query': q['query'],
+        'top_k': max(1, min(int(q.get('top_k', 3)), MAX_TOP_K)),
+        'where': build_where(q.get('filters'))
+    } for q in queries]
+    mode, hits = search_many(collection or get_collection(), searches, mode=mode, alpha=alpha)
+
+    results = {}
+    for key, search, query_hits in zip(keys, searches, hits):
+        retrieved_docs = [document for _, _, document in query_hits]
+        results[key] = {
+            'query': search['query'],
+            'results': retrieved_docs,
+            'count': len(retrieved_docs)
+        }
+    return {
+        'mode': mode,
+        'results': results,
+        'count': len(results)
+    }
+
+
+def initialize_knowledge(collection=None):
+    """Seed an empty collection with the default knowledge. Returns (seeded, document count)."""
+    embedding_model = get_embedding_model()
+    if not embedding_model:
+        raise EmbeddingModelUnavailable('Embedding model not initialized')
+    collection = collection or get_collection()
+    seeded = ensure_bootstrapped(collection, embedding_model)
+    return seeded, collection_count(collection)
@@ -0,0 +1,396 @@
+"""
+Persistent vector store for the RAG module.
+
+The collection lives on disk under RAG_PERSIST_DIR (or on a Chroma server if
+RAG_CHROMA_HOST is set) so it survives restarts and is shared by every worker
+process. Rebuilds write a new versioned collection and then atomically swap
+the pointer file, so running workers switch over on their next request.
+
+Every write through this module appends a byte to the write marker file in
+RAG_PERSIST_DIR, whatever the backend, so a process can tell how many writes
+other processes on the node made (external_write_count) and refresh what it
+derives from the store, like the BM25 index. A local PersistentClient in
+particular keeps its own in-memory HNSW index, which never sees what other
+processes (other workers, the ingestion queue worker) write: when a process
+finds the marker longer than its own writes account for, it reloads its
+client in the background (at most every RAG_CHROMA_RELOAD_SECONDS) and swaps
+it in once the index is loaded. A Chroma server needs no reload.
+
+RAG_VECTOR_BACKEND selects the store behind the collections: 'chroma'
+(default) or 'numpy' (exact search over memory-mapped vectors, see
+vector_store.py).
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import chromadb
+from chromadb.api.client import SharedSystemClient
+from chromadb.config import Settings
+from django.conf import settings
+from .filters import document_labels
+from .knowledge import DEFAULT_KNOWLEDGE
+from .vector_store import ChromaVectorStore, NumpyVectorStore
+
+
+COLLECTION_NAME = 'agricultural_advisory'
+POINTER_FILE = 'active_index.json'
+BOOTSTRAP_LOCK_FILE = '.bootstrap.lock'
+WRITES_FILE = '.writes'
+
+# Seconds a cached collection count is trusted before asking Chroma again
+COUNT_CACHE_SECONDS = 30
+
+_client = None
+_active = {'pointer_mtime': None, 'collection': None, 'info': None}
+_lock = threading.Lock()
+
+# Write marker length when the local client was opened, this process's
+# writes through that client since, and all of this process's writes
+_writes = {'base': 0, 'own': 0, 'own_total': 0, 'reloading': False, 'reloaded_at': 0.0}
+
+# Per-process state so the hot path never scans the collection
+_bootstrapped = set()
+_bootstrap_lock = threading.Lock()
+_counts = {}
+
+
+def _local_chroma():
+    return settings.RAG_VECTOR_BACKEND != 'numpy' and not settings.RAG_CHROMA_HOST
+
+
+def _writes_size():
+    try:
+        return (settings.RAG_PERSIST_DIR / WRITES_FILE).stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+def _note_write():
+    """Record a write to the store for the other processes."""
+    settings.RAG_PERSIST_DIR.mkdir(parents=True, exist_ok=True)
+    fd = os.open(settings.RAG_PERSIST_DIR / WRITES_FILE, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, b'.')
+    finally:
+        os.close(fd)
+    with _lock:
+        _writes['own'] += 1
+        _writes['own_total'] += 1
+
+
+def external_write_count():
+    """Writes other processes on this node have made to the store; only ever grows."""
+    return _writes_size() - _writes['own_total']
+
+
+def _open_persistent_client():
+    settings.RAG_PERSIST_DIR.mkdir(parents=True, exist_ok=True)
+    # Chroma shares one System per path within a process; drop it so the new
+    # client loads the segments from disk instead of reusing stale ones
+    SharedSystemClient.clear_system_cache()
+    return chromadb.PersistentClient(
+        path=str(settings.RAG_PERSIST_DIR),
+        settings=Settings(anonymized_telemetry=False),
+    )
+
+
+def get_client():
+    """Process-wide Chroma client."""
+    global _client
+    if _client is None:
+        if settings.RAG_CHROMA_HOST:
+            _client = chromadb.HttpClient(
+                host=settings.RAG_CHROMA_HOST,
+                port=settings.RAG_CHROMA_PORT,
+                settings=Settings(anonymized_telemetry=False),
+            )
+        else:
+            _writes.update(base=_writes_size(), own=0)
+            _client = _open_persistent_client()
+    return _client
+
+
+def _numpy_dir():
+    return settings.RAG_PERSIST_DIR / 'numpy'
+
+
+def open_store(name, metadata=None):
+    """Open (or create) a named vector store with the configured backend."""
+    if settings.RAG_VECTOR_BACKEND == 'numpy':
+        return NumpyVectorStore(
+            _numpy_dir() / name,
+            name,
+            quantization=settings.RAG_VECTOR_QUANTIZATION,
+            rescore_factor=settings.RAG_RESCORE_FACTOR,
+            on_write=_note_write,
+        )
+    return ChromaVectorStore(get_client().get_or_create_collection(name=name, metadata=metadata), on_write=_note_write)
+
+
+def list_store_names():
+    if settings.RAG_VECTOR_BACKEND == 'numpy':
+        if not _numpy_dir().exists():
+            return []
+        return [path.name for path in _numpy_dir().iterdir() if path.is_dir()]
+    return [c.name for c in get_client().list_collections()]
+
+
+def delete_store(name):
+    if settings.RAG_VECTOR_BACKEND == 'numpy':
+        shutil.rmtree(_numpy_dir() / name, ignore_errors=True)
+    else:
+        get_client().delete_collection(name)
+
+
+def collection_name_for(version):
+    return f'{COLLECTION_NAME}_v{version}' if version else COLLECTION_NAME
+
+
+def read_active_index():
+    """Active index info from the pointer file (version 0 if never rebuilt)."""
+    pointer = settings.RAG_PERSIST_DIR / POINTER_FILE
+    if not pointer.exists():
+        return {'version': 0, 'collection': COLLECTION_NAME, 'embedding_model': settings.RAG_EMBEDDING_MODEL}
+    with open(pointer, 'r') as f:
+        return json.load(f)
+
+
+def write_active_index(info):
+    """Atomically point every process at a new collection."""
+    settings.RAG_PERSIST_DIR.mkdir(parents=True, exist_ok=True)
+    pointer = settings.RAG_PERSIST_DIR / POINTER_FILE
+    tmp_path = pointer.with_suffix('.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(info, f, indent=2)
+    os.replace(tmp_path, pointer)
+
+
+def _pointer_mtime():
+    try:
+        return (settings.RAG_PERSIST_DIR / POINTER_FILE).stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _other_writes():
+    """Whether other processes wrote to the local store since this process's client was opened."""
+    return _writes_size() > _writes['base'] + _writes['own']
+
+
+def _reload_client():
+    """Open a fresh local client, load the active collection's index, then swap it in."""
+    global _client
+    try:
+        base, mtime = _writes_size(), _pointer_mtime()
+        client = _open_persistent_client()
+        info = read_active_index()
+        collection = ChromaVectorStore(
+            client.get_or_create_collection(
+                name=info['collection'],
+                metadata={'index_version': info['version'], 'embedding_model': info['embedding_model']},
+            ),
+            on_write=_note_write,
+        )
+        # The HNSW segment loads on the first query, so make it here rather than in a request
+        sample = collection.get(limit=1, include=('embeddings',))
+        if sample['ids']:
+            collection.query(query_embeddings=sample['embeddings'], n_results=1, include=())
+        with _lock:
+            _client = client
+            _active.update(collection=collection, info=info, pointer_mtime=mtime)
+            # Writes made through the old client after base was read count as other writes
+            _writes.update(base=base, own=0)
+    finally:
+        _writes.update(reloading=False, reloaded_at=time.monotonic())
+
+
+def _maybe_reload():
+    if _writes['reloading'] or time.monotonic() - _writes['reloaded_at'] < settings.RAG_CHROMA_RELOAD_SECONDS:
+        return
+    if not _other_writes():
+        return
+    with _lock:
+        if _writes['reloading']:
+            return
+        _writes['reloading'] = True
+    threading.Thread(target=_reload_client, name='chroma-reload', daemon=True).start()
+
+
+def get_collection():
+    """Active collection for this process, reopened when the index is rebuilt.
+
+    Opening an existing on-disk collection loads its stored vectors; nothing
+    is re-encoded. With a local Chroma store, other processes' writes trigger
+    a background reload and become visible once it finishes.
+    """
+    mtime = _pointer_mtime()
+    if _active['collection'] is not None and _active['pointer_mtime'] == mtime:
+        if _local_chroma():
+            _maybe_reload()
+        return _active['collection']
+
+    with _lock:
+        if _active['collection'] is None or _active['pointer_mtime'] != mtime:
+            info = read_active_index()
+            _active['collection'] = open_store(
+                info['collection'],
+                metadata={'index_version': info['version'], 'embedding_model': info['embedding_model']},
+            )
+            _active['info'] = info
+            _active['pointer_mtime'] = mtime
+    return _active['collection']
+
+
+def encode_and_add(collection, embedding_model, ids, documents, metadatas, batch_size=64):
+    """Encode documents in batches and upsert them into a collection."""
+    for i in range(0, len(documents), batch_size):
+        embeddings = embedding_model.encode(documents[i:i + batch_size]).tolist()
+        collection.upsert(
+            ids=ids[i:i + batch_size],
+            embeddings=embeddings,
+            documents=documents[i:i + batch_size],
+            metadatas=metadatas[i:i + batch_size],
+        )
+
+
+def bootstrap_default_knowledge(collection, embedding_model):
+    """Load DEFAULT_KNOWLEDGE into a collection. Idempotent (upserts by id)."""
+    encode_and_add(
+        collection,
+        embedding_model,
+        ids=[item['id'] for item in DEFAULT_KNOWLEDGE],
+        documents=[item['content'] for item in DEFAULT_KNOWLEDGE],
+        metadatas=[{'source': item['source'], **document_labels(item)} for item in DEFAULT_KNOWLEDGE],
+    )
+    return len(DEFAULT_KNOWLEDGE)
+
+
+def content_id(content, prefix='doc'):
+    """Stable document id derived from its content."""
+    return f'{prefix}_{hashlib.sha256(content.encode("utf-8")).hexdigest()[:32]}'
+
+
+@contextmanager
+def _interprocess_lock():
+    """Exclusive lock shared by all worker processes (no-op where fcntl is unavailable)."""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+
+    settings.RAG_PERSIST_DIR.mkdir(parents=True, exist_ok=True)
+    with open(settings.RAG_PERSIST_DIR / BOOTSTRAP_LOCK_FILE, 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def ensure_bootstrapped(collection, embedding_model):
+    """Seed an empty collection with the default knowledge, exactly once.
+
+    After the first call in a process this is a set lookup. The emptiness
+    check and the seeding run under a process and a file lock, so concurrent
+    workers never seed twice. Returns True if this call seeded the collection.
+    """
+    if collection.name in _bootstrapped:
+        return False
+
+    with _bootstrap_lock, _interprocess_lock():
+        if collection.name in _bootstrapped:
+            return False
+
+        seeded = False
+        if collection.count() == 0:
+            bootstrap_default_knowledge(collection, embedding_model)
+            invalidate_count(collection)
+            seeded = True
+        _bootstrapped.add(collection.name)
+    return seeded
+
+
+def collection_count(collection, max_age=COUNT_CACHE_SECONDS):
+    """Number of documents in a collection, cached for max_age seconds."""
+    cached = _counts.get(collection.name)
+    now = time.monotonic()
+    if cached is not None and now - cached[1] < max_age:
+        return cached[0]
+
+    count = collection.count()
+    _counts[collection.name] = (count, now)
+    return count
+
+
+def invalidate_count(collection):
+    """Forget the cached count after this process writes to a collection."""
+    _counts.pop(collection.name, None)
+
+
+def iter_collection(collection, page_size=1000, include=('documents', 'metadatas')):
+    """Yield (ids, documents, metadatas) pages of a collection."""
+    offset = 0
+    while True:
+        page = collection.get(limit=page_size, offset=offset, include=list(include))
+        if not page['ids']:
+            return
+        yield page['ids'], page.get('documents'), page.get('metadatas')
+        offset += len(page['ids'])
+
+
+def rebuild_index(embedding_model, version=None, defaults_only=False, keep_old=False, log=print):
+    """Re-embed the knowledge base into a new versioned collection and swap to it.
+
+    Documents of the current collection are carried over (re-encoded with the
+    current embedding model, missing crop/region labels filled in) unless
+    defaults_only is set; an empty index is seeded with DEFAULT_KNOWLEDGE.
+    """
+    current = read_active_index()
+    version = version or current['version'] + 1
+    name = collection_name_for(version)
+
+    # Start from a clean target collection
+    if name in list_store_names():
+        delete_store(name)
+    target = open_store(
+        name,
+        metadata={'index_version': version, 'embedding_model': settings.RAG_EMBEDDING_MODEL},
+    )
+
+    count = 0
+    if not defaults_only and current['collection'] in list_store_names():
+        source = open_store(current['collection'])
+        for ids, documents, metadatas in iter_collection(source):
+            # Documents ingested before crop/region labels existed get them now
+            metadatas = [
+                {**document_labels({'content': document}), **(metadata or {})}
+                for document, metadata in zip(documents, metadatas)
+            ]
+            encode_and_add(target, embedding_model, ids, documents, metadatas)
+            count += len(ids)
+            log(f'Re-encoded {count} documents...')
+
+    if count == 0:
+        count = bootstrap_default_knowledge(target, embedding_model)
+
+    info = {
+        'version': version,
+        'collection': name,
+        'embedding_model': settings.RAG_EMBEDDING_MODEL,
+        'count': count,
+        'built_at': datetime.now().isoformat(),
+    }
+    write_active_index(info)
+
+    if not keep_old:
+        for old_name in list_store_names():
+            if old_name != name and old_name.startswith(COLLECTION_NAME):
+                delete_store(old_name)
+
+    return info
@@ -0,0 +1,293 @@
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock, skipUnless
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from . import lexical, store
+from .cache import QueryEmbeddingCache
+from .onnx_embeddings import OnnxEmbeddingModel, compare_embeddings, export_embedding_model
+from .vector_store import NumpyVectorStore
+
+
+WRITER = '''
+import django
+django.setup()
+from rag.store import get_collection
+get_collection().upsert(ids=['written-elsewhere'], embeddings=[[0.0, 1.0, 0.0]], documents=['b'])
+'''
+
+# What the ingestion worker does with a claimed batch
+INGESTER = '''
+import django
+django.setup()
+import numpy as np
+from rag.ingest import apply_plan
+from rag.store import get_collection
+
+
+class Model:
+    def encode(self, texts, batch_size=64):
+        return np.array([[0.0, 1.0, 0.0]] * len(texts))
+
+
+plan = {'ids': ['written-elsewhere'], 'texts': ['b'], 'metadatas': [{'source': 'upload'}],
+        'update_ids': [], 'update_metadatas': [], 'delete_ids': []}
+apply_plan(get_collection(), Model(), plan)
+'''
+
+
+# Rewrites a document of the numpy store without changing the document count
+RELABELER = '''
+import django
+django.setup()
+from rag.store import open_store
+open_store('docs').update(ids=['d1'], documents=['Aphids gather under the leaves'])
+'''
+
+
+def run_in_other_process(script, persist_dir, backend):
+    env = {
+        **os.environ,
+        'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'backend.settings'),
+        'RAG_PERSIST_DIR': persist_dir,
+        'RAG_VECTOR_BACKEND': backend,
+        'RAG_CHROMA_HOST': '',
+    }
+    subprocess.run([sys.executable, '-c', script], cwd=settings.BASE_DIR, env=env, check=True, timeout=120)
+
+
+def reset_store():
+    store._client = None
+    store._active.update(pointer_mtime=None, collection=None, info=None)
+    store._writes.update(base=0, own=0, own_total=0, reloading=False, reloaded_at=0.0)
+    store._counts.clear()
+    store.SharedSystemClient.clear_system_cache()
+    lexical._indexes.clear()
+    lexical._pending.clear()
+    lexical._last_rebuild.clear()
+
+
+class CrossProcessChromaTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        overrides = override_settings(
+            RAG_PERSIST_DIR=Path(self.tmp.name), RAG_VECTOR_BACKEND='chroma', RAG_CHROMA_HOST='',
+            RAG_CHROMA_RELOAD_SECONDS=0,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        reset_store()
+        self.addCleanup(reset_store)
+
+    def query_ids(self):
+        result = store.get_collection().query(query_embeddings=[[0.0, 1.0, 0.0]], n_results=1, include=())
+        return result['ids'][0]
+
+    def run_elsewhere(self, script):
+        run_in_other_process(script, self.tmp.name, 'chroma')
+
+    def assert_written_elsewhere_found(self):
+        # The reload runs in the background; poll until it has been swapped in
+        deadline = time.monotonic() + 30
+        while self.query_ids() != ['written-elsewhere'] and time.monotonic() < deadline:
+            time.sleep(0.1)
+        self.assertEqual(self.query_ids(), ['written-elsewhere'])
+        self.assertEqual(store.get_collection().count(), 2)
+
+    def test_query_sees_writes_of_another_process(self):
+        store.get_collection().upsert(ids=['written-here'], embeddings=[[1.0, 0.0, 0.0]], documents=['a'])
+        self.assertEqual(self.query_ids(), ['written-here'])
+        self.run_elsewhere(WRITER)
+        self.assert_written_elsewhere_found()
+
+    def test_own_writes_do_not_reload(self):
+        collection = store.get_collection()
+        collection.upsert(ids=['written-here'], embeddings=[[1.0, 0.0, 0.0]], documents=['a'])
+        self.assertFalse(store._other_writes())
+        self.assertIs(store.get_collection(), collection)
+
+    def test_search_sees_documents_of_the_ingestion_worker(self):
+        store.get_collection().upsert(ids=['written-here'], embeddings=[[1.0, 0.0, 0.0]], documents=['a'])
+        self.assertEqual(self.query_ids(), ['written-here'])
+        self.run_elsewhere(INGESTER)
+        self.assert_written_elsewhere_found()
+
+
+class NumpyVectorStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = NumpyVectorStore(Path(self.tmp.name) / 'docs', 'docs')
+        self.store.upsert(
+            ids=[f'i{i}' for i in range(5)],
+            embeddings=[[1.0, i / 10, 0.0] for i in range(5)],
+            documents=[f'document {i}' for i in range(5)],
+            metadatas=[{'source': 'test', 'crop': 'tomato'} for _ in range(5)],
+        )
+
+    def test_filter_after_metadata_update(self):
+        # Builds the label index before the update
+        self.assertEqual(self.store.query([[1.0, 0.0, 0.0]], n_results=5, where={'crop': 'potato'})['ids'], [[]])
+
+        self.store.update(ids=['i3'], metadatas=[{'source': 'test', 'crop': 'potato'}])
+
+        result = self.store.query([[1.0, 0.0, 0.0]], n_results=5, where={'crop': 'potato'})
+        self.assertEqual(result['ids'], [['i3']])
+        self.assertEqual(result['metadatas'][0][0]['crop'], 'potato')
+        result = self.store.query([[1.0, 0.0, 0.0]], n_results=5, where={'crop': 'tomato'})
+        self.assertNotIn('i3', result['ids'][0])
+
+    def test_query_survives_compaction_by_another_process(self):
+        stale_state = self.store._load_state()
+        # Another process deletes rows and compacts, renumbering the rest
+        other = NumpyVectorStore(Path(self.tmp.name) / 'docs', 'docs')
+        other.delete(['i0', 'i1'])
+        other.compact()
+        other.close()
+
+        with mock.patch.object(self.store, '_load_state', return_value=stale_state):
+            result = self.store.query([[1.0, 0.4, 0.0]], n_results=5)
+        self.assertEqual(result['ids'], [['i4', 'i3', 'i2']])
+        self.assertEqual(result['documents'], [['document 4', 'document 3', 'document 2']])
+
+
+class QueryEmbeddingCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = Path(self.tmp.name) / 'queries.sqlite3'
+
+    def test_connection_is_opened_lazily_per_process(self):
+        cache = QueryEmbeddingCache('model', sqlite_path=self.path)
+        self.assertIsNone(cache._db)
+        cache.put('How often should I water?', [1.0, 0.0])
+        parent_db = cache._db
+
+        pid = os.fork()
+        if pid == 0:
+            # Child: must open its own connection and still share the file
+            try:
+                cache.put('When to harvest?', [0.0, 1.0])
+                os._exit(0 if cache._db is not parent_db else 1)
+            except BaseException:
+                os._exit(2)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+
+        self.assertIs(cache._db, parent_db)
+        fresh = QueryEmbeddingCache('model', sqlite_path=self.path)
+        self.assertEqual(fresh.get('when to harvest').tolist(), [0.0, 1.0])
+        self.assertEqual(fresh.stats()['persistent_hits'], 1)
+
+    def test_other_models_rows_are_kept_until_dropped(self):
+        QueryEmbeddingCache('model-a', sqlite_path=self.path).put('How often should I water?', [1.0, 0.0])
+        other = QueryEmbeddingCache('model-b', sqlite_path=self.path)
+        other.put('How often should I water?', [0.0, 1.0])
+        self.assertEqual(QueryEmbeddingCache('model-a', sqlite_path=self.path).get('how often should i water').tolist(),
+                         [1.0, 0.0])
+
+        self.assertEqual(other.drop_other_models(), 1)
+        self.assertIsNone(QueryEmbeddingCache('model-a', sqlite_path=self.path).get('how often should i water'))
+        self.assertEqual(other.get('how often should i water').tolist(), [0.0, 1.0])
+
+
+class LexicalIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        overrides = override_settings(RAG_PERSIST_DIR=Path(self.tmp.name), RAG_VECTOR_BACKEND='numpy')
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        reset_store()
+        self.addCleanup(reset_store)
+        self.collection = store.open_store('docs')
+        self.collection.upsert(
+            ids=['d1', 'd2'],
+            embeddings=[[1.0, 0.0], [0.0, 1.0]],
+            documents=['Water tomatoes early in the morning', 'Harvest potatoes when the vines die back'],
+        )
+
+    def search_ids(self, query):
+        return [doc_id for doc_id, _, _ in lexical.get_lexical_index(self.collection).search(query)]
+
+    def test_rebuilds_after_another_process_rewrites_a_document(self):
+        self.assertEqual(self.search_ids('aphids'), [])
+
+        run_in_other_process(RELABELER, self.tmp.name, 'numpy')
+
+        # The rebuild runs in the background; the old index answers meanwhile
+        deadline = time.monotonic() + 10
+        while self.search_ids('aphids') != ['d1'] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(self.search_ids('aphids'), ['d1'])
+        self.assertEqual(self.search_ids('tomatoes'), [])
+
+    def test_own_writes_during_a_rebuild_are_kept(self):
+        index = lexical.get_lexical_index(self.collection)
+        lexical._pending[self.collection.name] = []
+        self.collection.upsert(ids=['d3'], embeddings=[[1.0, 1.0]], documents=['Mulch keeps the soil moist'])
+        lexical.update_lexical_index(self.collection, ['d3'], ['Mulch keeps the soil moist'])
+        self.assertEqual(self.search_ids('mulch'), ['d3'])
+
+        # A rebuild that read the collection before the write still ends up with it
+        rebuilt = lexical._build_index(self.collection)
+        rebuilt.remove(['d3'])
+        with mock.patch.object(lexical, '_build_index', return_value=rebuilt):
+            lexical._rebuild_in_background(self.collection)
+        self.assertIsNot(lexical.get_lexical_index(self.collection), index)
+        self.assertEqual(self.search_ids('mulch'), ['d3'])
+
+
+PARITY_TEXTS = [
+    'How often should I water tomato plants in hot weather?',
+    'Yellow leaves with brown spots on potato plants',
+    'Early blight is caused by the fungus Alternaria solani.',
+    'best fertilizer for maize',
+    'Rotate crops every season to break pest and disease cycles.',
+    # Longer than max_seq_length, so truncation is compared too
+    ' '.join(['Mulch keeps the soil moist and suppresses weeds around the plants.'] * 60),
+]
+
+
+def installed(*modules):
+    return all(importlib.util.find_spec(module) is not None for module in modules)
+
+
+@skipUnless(installed('sentence_transformers', 'torch', 'onnx', 'onnxruntime', 'tokenizers'),
+            'exporting and comparing needs sentence-transformers, torch, onnx and onnxruntime')
+class OnnxEmbeddingParityTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from sentence_transformers import SentenceTransformer
+
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(cls.tmp.cleanup)
+        cls.model_dir = Path(cls.tmp.name)
+        export_embedding_model(settings.RAG_EMBEDDING_MODEL, cls.model_dir, quantize=True)
+        cls.reference = SentenceTransformer(settings.RAG_EMBEDDING_MODEL, device='cpu').encode(
+            PARITY_TEXTS, normalize_embeddings=False
+        )
+
+    def assert_parity(self, quantized, min_cosine):
+        model = OnnxEmbeddingModel(self.model_dir, quantized=quantized, intra_op_threads=1)
+        cosine = compare_embeddings(self.reference, model.encode(PARITY_TEXTS, batch_size=4))
+        self.assertGreaterEqual(cosine.min(), min_cosine, dict(zip(PARITY_TEXTS, cosine.round(5))))
+
+    def test_float32_export_matches_sentence_transformers(self):
+        self.assert_parity(quantized=False, min_cosine=0.999)
+
+    def test_int8_export_stays_close_to_sentence_transformers(self):
+        self.assert_parity(quantized=True, min_cosine=0.98)
+
+    def test_single_string_matches_batch(self):
+        model = OnnxEmbeddingModel(self.model_dir, intra_op_threads=1)
+        batch = model.encode(PARITY_TEXTS)
+        self.assertEqual(model.encode(PARITY_TEXTS[0]).shape, batch[0].shape)
+        self.assertGreaterEqual(compare_embeddings([model.encode(PARITY_TEXTS[0])], batch[:1])[0], 0.9999)
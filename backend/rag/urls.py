@@ -1,10 +1,14 @@
 from django.urls import path
-from .views import ingest_documents, search_advisory, initialize_default_knowledge
+from .views import ingest_documents, bulk_ingest_documents, ingestion_job_status, search_advisory, batch_search_advisory, initialize_default_knowledge, rag_status
 
 urlpatterns = [
     path('ingest/', ingest_documents, name='ingest_documents'),
+    path('ingest/bulk/', bulk_ingest_documents, name='bulk_ingest_documents'),
+    path('ingest/jobs/<int:job_id>/', ingestion_job_status, name='ingestion_job_status'),
     path('search/', search_advisory, name='search_advisory'),
+    path('search/batch/', batch_search_advisory, name='batch_search_advisory'),
     path('initialize/', initialize_default_knowledge, name='initialize_default_knowledge'),
+    path('status/', rag_status, name='rag_status'),
 ]
 
 
@@ -0,0 +1,551 @@
+"""
+Vector store backends for the RAG module.
+
+VectorStore is the subset of the Chroma collection API the RAG code uses
+(upsert/update/delete/get/query/count, same argument names and result
+shapes), so callers work unchanged with either backend:
+
+- ChromaVectorStore wraps a Chroma collection (HNSW, approximate).
+- NumpyVectorStore keeps unit-normalized float32 vectors in an append-only
+  file that is memory-mapped by every worker, and answers a query with one
+  matrix-vector product and argpartition (exact). Ids, documents and
+  metadata live in a SQLite file next to it.
+
+Distances are squared L2 between unit vectors, as with Chroma's default
+space, so 1 - distance / 2 is the cosine similarity for both backends.
+
+NumpyVectorStore can also scan compressed codes instead of the float32
+matrix: int8 scalar-quantized (4x smaller) or binary sign bits (32x smaller),
+kept in sidecar files next to the vectors. The best candidates of that first
+pass are rescored with the full-precision vectors, which stay on disk and are
+only paged in for those rows.
+"""
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+import numpy as np
+from .filters import FILTER_FIELDS, MetadataIndex
+
+
+class VectorStore:
+    name = None
+
+    def count(self):
+        raise NotImplementedError
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        raise NotImplementedError
+
+    def update(self, ids, metadatas=None, documents=None, embeddings=None):
+        raise NotImplementedError
+
+    def delete(self, ids):
+        raise NotImplementedError
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=('documents', 'metadatas')):
+        raise NotImplementedError
+
+    def query(self, query_embeddings, n_results=10, where=None, include=('documents', 'metadatas', 'distances')):
+        raise NotImplementedError
+
+
+class ChromaVectorStore(VectorStore):
+    """A Chroma collection; on_write, if given, is called after every write."""
+
+    def __init__(self, collection, on_write=None):
+        self.collection = collection
+        self.name = collection.name
+        self._on_write = on_write or (lambda: None)
+
+    def count(self):
+        return self.collection.count()
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        self.collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+        self._on_write()
+
+    def update(self, ids, metadatas=None, documents=None, embeddings=None):
+        self.collection.update(ids=ids, metadatas=metadatas, documents=documents, embeddings=embeddings)
+        self._on_write()
+
+    def delete(self, ids):
+        self.collection.delete(ids=ids)
+        self._on_write()
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=('documents', 'metadatas')):
+        return self.collection.get(ids=ids, where=where, limit=limit, offset=offset, include=list(include))
+
+    def query(self, query_embeddings, n_results=10, where=None, include=('documents', 'metadatas', 'distances')):
+        return self.collection.query(
+            query_embeddings=query_embeddings, n_results=n_results, where=where, include=list(include)
+        )
+
+
+def _where_sql(where):
+    """SQL condition and parameters for a Chroma-style metadata filter."""
+    if not where:
+        return '1', []
+
+    clauses, params = [], []
+    for key, condition in where.items():
+        if key in ('$and', '$or'):
+            parts = [_where_sql(sub) for sub in condition]
+            joiner = ' AND ' if key == '$and' else ' OR '
+            clauses.append('(' + joiner.join(sql for sql, _ in parts) + ')')
+            for _, sub_params in parts:
+                params.extend(sub_params)
+            continue
+
+        column = f"json_extract(metadata, '$.{key}')"
+        if not isinstance(condition, dict):
+            condition = {'$eq': condition}
+        for op, value in condition.items():
+            if op == '$eq':
+                clauses.append(f'{column} = ?')
+                params.append(value)
+            elif op == '$ne':
+                clauses.append(f'({column} IS NULL OR {column} != ?)')
+                params.append(value)
+            elif op in ('$in', '$nin'):
+                placeholders = ', '.join('?' for _ in value)
+                clauses.append(f'{column} {"IN" if op == "$in" else "NOT IN"} ({placeholders})')
+                params.extend(value)
+            else:
+                raise ValueError(f'Unsupported filter operator: {op}')
+    return ' AND '.join(clauses), params
+
+
+QUANTIZATIONS = ('int8', 'binary')
+
+# Set bits per byte value, for Hamming distances over packed sign bits
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+SCAN_BLOCK_ROWS = 8192
+
+# Filters matching more than this fraction of rows scan everything and mask
+DENSE_FILTER_FRACTION = 0.4
+
+
+def quantize_int8(vectors):
+    """Per-row scalar quantization: int8 codes and the float32 scale of each row."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+    codes = np.round(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def quantize_binary(vectors):
+    """Sign bits of each component, packed 8 per byte."""
+    return np.packbits(np.asarray(vectors) > 0, axis=1)
+
+
+class NumpyVectorStore(VectorStore):
+    """Exact search over a memory-mapped float32 matrix.
+
+    Writes append rows to the vector file; an overwritten or deleted id just
+    marks its row dead, and the file is compacted once too many rows are dead.
+    Processes notice each other's writes through SQLite's data_version.
+
+    With quantization ('int8' or 'binary') queries scan the codes and rescore
+    the best n_results * rescore_factor rows with the float32 vectors.
+    on_write, if given, is called after every upsert, update and delete.
+    """
+
+    MAX_DEAD_FRACTION = 0.3
+
+    def __init__(self, path, name, dim=None, quantization=None, rescore_factor=8, on_write=None):
+        if quantization and quantization not in QUANTIZATIONS:
+            raise ValueError(f'Unknown quantization: {quantization}')
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.name = name
+        self.quantization = quantization or None
+        self.rescore_factor = rescore_factor
+        self._on_write = on_write or (lambda: None)
+        self._db = sqlite3.connect(str(self.path / 'rows.sqlite3'), check_same_thread=False, timeout=30)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(
+            'CREATE TABLE IF NOT EXISTS rows ('
+            ' row INTEGER PRIMARY KEY, id TEXT NOT NULL, document TEXT, metadata TEXT, alive INTEGER NOT NULL);'
+            'CREATE UNIQUE INDEX IF NOT EXISTS rows_live_id ON rows (id) WHERE alive = 1;'
+            'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);'
+        )
+        self._db.execute("INSERT OR IGNORE INTO meta VALUES ('vectors_file', 'vectors.0.f32')")
+        if dim:
+            self._db.execute("INSERT OR IGNORE INTO meta VALUES ('dim', ?)", (str(dim),))
+        self._db.commit()
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._state = None
+        self._data_version = None
+
+    # -- storage -------------------------------------------------------------
+
+    def _meta(self, key):
+        row = self._db.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    @property
+    def dim(self):
+        value = self._meta('dim')
+        return int(value) if value else None
+
+    @contextmanager
+    def _write_lock(self):
+        # Serializes writers across worker processes; re-entrant within a thread
+        try:
+            import fcntl
+        except ImportError:
+            fcntl = None
+        with self._lock:
+            if self._lock_depth or fcntl is None:
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                return
+            with open(self.path / '.write.lock', 'w') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _code_paths(self, vectors_path):
+        if self.quantization == 'int8':
+            return vectors_path.with_suffix('.i8'), vectors_path.with_suffix('.scale')
+        return vectors_path.with_suffix('.bits'), None
+
+    def _code_width(self, dim):
+        return dim if self.quantization == 'int8' else (dim + 7) // 8
+
+    def _sync_codes(self, vectors_path, vectors):
+        """Append codes for rows of the vector file that have none yet."""
+        codes_path, scales_path = self._code_paths(vectors_path)
+        width = self._code_width(vectors.shape[1])
+        done = codes_path.stat().st_size // width if codes_path.exists() else 0
+        if done == len(vectors):
+            return
+        with self._write_lock():
+            done = codes_path.stat().st_size // width if codes_path.exists() else 0
+            with open(codes_path, 'ab') as codes_file:
+                scales_file = open(scales_path, 'ab') if scales_path else None
+                try:
+                    # Drop a partially written tail before appending
+                    codes_file.truncate(done * width)
+                    if scales_file:
+                        scales_file.truncate(done * 4)
+                    for start in range(done, len(vectors), SCAN_BLOCK_ROWS):
+                        block = np.asarray(vectors[start:start + SCAN_BLOCK_ROWS])
+                        if self.quantization == 'int8':
+                            codes, scales = quantize_int8(block)
+                            scales_file.write(scales.tobytes())
+                        else:
+                            codes = quantize_binary(block)
+                        codes_file.write(codes.tobytes())
+                finally:
+                    if scales_file:
+                        scales_file.close()
+
+    def _load_codes(self, vectors_path, vectors):
+        self._sync_codes(vectors_path, vectors)
+        codes_path, scales_path = self._code_paths(vectors_path)
+        shape = (len(vectors), self._code_width(vectors.shape[1]))
+        dtype = np.int8 if self.quantization == 'int8' else np.uint8
+        codes = np.memmap(codes_path, dtype=dtype, mode='r', shape=shape)
+        scales = np.memmap(scales_path, dtype=np.float32, mode='r', shape=(len(vectors),)) if scales_path else None
+        return codes, scales
+
+    def _load_state(self):
+        """Map the vector file and load the live-row mask (reloaded after any write)."""
+        version = self._db.execute('PRAGMA data_version').fetchone()[0]
+        if self._state is not None and version == self._data_version:
+            return self._state
+
+        with self._lock:
+            labels = ', '.join(f"json_extract(metadata, '$.{field}')" for field in FILTER_FIELDS)
+            rows = self._db.execute(f'SELECT row, id, {labels} FROM rows WHERE alive = 1').fetchall()
+            dim = self.dim
+            vectors_path = self.path / self._meta('vectors_file')
+            num_rows = vectors_path.stat().st_size // (dim * 4) if dim and vectors_path.exists() else 0
+            if num_rows:
+                vectors = np.memmap(vectors_path, dtype=np.float32, mode='r', shape=(num_rows, dim))
+            else:
+                vectors = np.zeros((0, dim or 0), dtype=np.float32)
+
+            alive = np.zeros(num_rows, dtype=bool)
+            row_ids = {}
+            filters = MetadataIndex()
+            for row, doc_id, *values in rows:
+                if row < num_rows:
+                    alive[row] = True
+                    row_ids[row] = doc_id
+                    filters.add(row, dict(zip(FILTER_FIELDS, values)))
+            self._state = {
+                'vectors': vectors, 'alive': alive, 'row_ids': row_ids, 'filters': filters,
+                'codes': None, 'scales': None,
+            }
+            if self.quantization and num_rows:
+                self._state['codes'], self._state['scales'] = self._load_codes(vectors_path, vectors)
+            self._data_version = version
+        return self._state
+
+    def _invalidate(self):
+        self._state = None
+
+    def _append_vectors(self, embeddings):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if self.dim is None:
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('dim', ?)", (str(embeddings.shape[1]),))
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.where(norms == 0, 1, norms)
+
+        vectors_path = self.path / self._meta('vectors_file')
+        with open(vectors_path, 'ab') as f:
+            first_row = f.tell() // (embeddings.shape[1] * 4)
+            f.write(embeddings.tobytes())
+        return first_row
+
+    def count(self):
+        return self._db.execute('SELECT COUNT(*) FROM rows WHERE alive = 1').fetchone()[0]
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        if not ids:
+            return
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [None] * len(ids)
+        with self._write_lock():
+            first_row = self._append_vectors(embeddings)
+            with self._db:
+                self._db.executemany(
+                    'UPDATE rows SET alive = 0 WHERE id = ? AND alive = 1', [(doc_id,) for doc_id in ids]
+                )
+                self._db.executemany(
+                    'INSERT INTO rows (row, id, document, metadata, alive) VALUES (?, ?, ?, ?, 1)',
+                    [
+                        (first_row + i, doc_id, document, json.dumps(metadata) if metadata else None)
+                        for i, (doc_id, document, metadata) in enumerate(zip(ids, documents, metadatas))
+                    ]
+                )
+            self._invalidate()
+        self._on_write()
+        self._maybe_compact()
+
+    def update(self, ids, metadatas=None, documents=None, embeddings=None):
+        if embeddings is not None:
+            current = self.get(ids=ids, include=('documents', 'metadatas'))
+            by_id = {doc_id: (doc, meta) for doc_id, doc, meta in
+                     zip(current['ids'], current['documents'], current['metadatas'])}
+            self.upsert(
+                ids,
+                embeddings,
+                documents=documents or [by_id.get(doc_id, (None, None))[0] for doc_id in ids],
+                metadatas=metadatas or [by_id.get(doc_id, (None, None))[1] for doc_id in ids],
+            )
+            return
+
+        with self._write_lock():
+            with self._db:
+                if metadatas is not None:
+                    self._db.executemany(
+                        'UPDATE rows SET metadata = ? WHERE id = ? AND alive = 1',
+                        [(json.dumps(metadata), doc_id) for doc_id, metadata in zip(ids, metadatas)]
+                    )
+                if documents is not None:
+                    self._db.executemany(
+                        'UPDATE rows SET document = ? WHERE id = ? AND alive = 1',
+                        [(document, doc_id) for doc_id, document in zip(ids, documents)]
+                    )
+            # This connection's own commits leave data_version unchanged
+            self._invalidate()
+        self._on_write()
+
+    def delete(self, ids):
+        with self._write_lock():
+            with self._db:
+                self._db.executemany('UPDATE rows SET alive = 0 WHERE id = ? AND alive = 1',
+                                     [(doc_id,) for doc_id in ids])
+            self._invalidate()
+        self._on_write()
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        total = self._db.execute('SELECT COUNT(*) FROM rows').fetchone()[0]
+        if total and 1 - self.count() / total > self.MAX_DEAD_FRACTION:
+            self.compact()
+
+    def compact(self):
+        """Rewrite the vector file with live rows only.
+
+        The new file gets a new name and is switched to in the same SQLite
+        transaction that renumbers the rows, so readers never pair new rows
+        with the old file; processes that still map the old file keep their
+        mapping until they reload.
+        """
+        with self._write_lock():
+            total = self._db.execute('SELECT COUNT(*) FROM rows').fetchone()[0]
+            if total == self.count():
+                return
+            state = self._load_state()
+            old_name = self._meta('vectors_file')
+            generation = int(old_name.split('.')[1]) + 1
+            new_name = f'vectors.{generation}.f32'
+
+            live_rows = sorted(state['row_ids'])
+            with open(self.path / new_name, 'wb') as f:
+                for start in range(0, len(live_rows), 10000):
+                    f.write(np.ascontiguousarray(state['vectors'][live_rows[start:start + 10000]]).tobytes())
+
+            with self._db:
+                self._db.execute('DELETE FROM rows WHERE alive = 0')
+                self._db.executemany('UPDATE rows SET row = ? WHERE row = ?',
+                                     [(-(new_row + 1), old_row) for new_row, old_row in enumerate(live_rows)])
+                self._db.execute('UPDATE rows SET row = -row - 1')
+                self._db.execute("UPDATE meta SET value = ? WHERE key = 'vectors_file'", (new_name,))
+            self._invalidate()
+            for suffix in ('.f32', '.i8', '.scale', '.bits'):
+                try:
+                    os.remove((self.path / old_name).with_suffix(suffix))
+                except FileNotFoundError:
+                    pass
+
+    # -- reads ---------------------------------------------------------------
+
+    def _result_rows(self, sql_rows, include, vectors=None):
+        result = {'ids': [doc_id for _, doc_id, _, _ in sql_rows]}
+        if 'documents' in include:
+            result['documents'] = [document for _, _, document, _ in sql_rows]
+        if 'metadatas' in include:
+            result['metadatas'] = [json.loads(metadata) if metadata else None for _, _, _, metadata in sql_rows]
+        if 'embeddings' in include and vectors is not None:
+            result['embeddings'] = [vectors[row].tolist() for row, _, _, _ in sql_rows]
+        return result
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=('documents', 'metadatas')):
+        condition, params = _where_sql(where)
+        sql = f'SELECT row, id, document, metadata FROM rows WHERE alive = 1 AND {condition}'
+        if ids is not None:
+            sql += f' AND id IN ({", ".join("?" for _ in ids)})'
+            params = params + list(ids)
+        sql += ' ORDER BY row'
+        if limit is not None:
+            sql += ' LIMIT ? OFFSET ?'
+            params = params + [limit, offset or 0]
+        sql_rows = self._db.execute(sql, params).fetchall()
+        vectors = self._load_state()['vectors'] if 'embeddings' in include else None
+        return self._result_rows(sql_rows, include, vectors)
+
+    def _candidate_rows(self, state, where):
+        """Live rows matching a metadata filter, or None for every live row."""
+        if not where:
+            return None
+        if state['filters'].covers(where):
+            # Source/crop/region filters are answered from the in-memory label index
+            return np.flatnonzero(state['filters'].mask(where, len(state['alive'])) & state['alive'])
+        condition, params = _where_sql(where)
+        rows = [row for (row,) in self._db.execute(
+            f'SELECT row FROM rows WHERE alive = 1 AND {condition}', params
+        ) if row < len(state['alive'])]
+        return np.array(sorted(rows), dtype=np.int64)
+
+    def _approximate_scores(self, state, query, candidates):
+        """First-pass scores from the quantized codes (higher is better)."""
+        codes = state['codes'] if candidates is None else state['codes'][candidates]
+        if self.quantization == 'binary':
+            query_bits = quantize_binary(query[None, :])[0]
+            scores = np.empty(len(codes), dtype=np.float32)
+            for start in range(0, len(codes), SCAN_BLOCK_ROWS):
+                block = np.bitwise_xor(codes[start:start + SCAN_BLOCK_ROWS], query_bits)
+                scores[start:start + SCAN_BLOCK_ROWS] = -POPCOUNT[block].sum(axis=1, dtype=np.int32)
+            return scores
+
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCAN_BLOCK_ROWS):
+            scores[start:start + SCAN_BLOCK_ROWS] = codes[start:start + SCAN_BLOCK_ROWS].astype(np.float32) @ query
+        scales = state['scales'] if candidates is None else state['scales'][candidates]
+        return scores * scales
+
+    def _top_rows(self, state, query, candidates, n_results):
+        """Best rows for one query and their cosine similarities."""
+        quantized = state['codes'] is not None
+        if candidates is not None and len(candidates) > DENSE_FILTER_FRACTION * len(state['alive']):
+            # Gathering most of the rows costs more than scanning them all and masking
+            keep = np.zeros(len(state['alive']), dtype=bool)
+            keep[candidates] = True
+            scores = self._approximate_scores(state, query, None) if quantized else state['vectors'] @ query
+            scores[~keep] = -np.inf
+            available = len(candidates)
+            candidates = None
+        elif candidates is None:
+            scores = self._approximate_scores(state, query, None) if quantized else state['vectors'] @ query
+            scores[~state['alive']] = -np.inf
+            available = len(state['row_ids'])
+        else:
+            scores = (self._approximate_scores(state, query, candidates) if quantized
+                      else state['vectors'][candidates] @ query)
+            available = len(candidates)
+
+        k = min(n_results, available)
+        if k <= 0:
+            return [], []
+        # With codes, shortlist more rows and rescore them at full precision
+        pool_size = min(k * self.rescore_factor, available) if quantized else k
+        best = np.argpartition(-scores, pool_size - 1)[:pool_size] if pool_size < len(scores) else np.arange(len(scores))
+        rows = best if candidates is None else candidates[best]
+
+        if quantized:
+            rows = np.sort(rows)
+            scores = np.asarray(state['vectors'][rows]) @ query
+        else:
+            scores = scores[best]
+        order = np.argsort(-scores)[:k]
+        return rows[order].tolist(), scores[order].tolist()
+
+    def query(self, query_embeddings, n_results=10, where=None, include=('documents', 'metadatas', 'distances')):
+        state = self._load_state()
+        result = {'ids': [], 'documents': [], 'metadatas': [], 'distances': []}
+        if not len(state['alive']):
+            for _ in query_embeddings:
+                for key in result:
+                    result[key].append([])
+            return result
+
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(-1, state['vectors'].shape[1])
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+        candidates = self._candidate_rows(state, where)
+
+        for query in queries:
+            rows, scores = self._top_rows(state, query, candidates, n_results)
+            # Looked up by id, not row: another process may have compacted
+            # (renumbered) or deleted rows since the state was loaded
+            hits = [(state['row_ids'][row], score) for row, score in zip(rows, scores)]
+            sql_rows, kept_scores = [], []
+            if hits:
+                placeholders = ', '.join('?' for _ in hits)
+                by_id = {sql_row[1]: sql_row for sql_row in self._db.execute(
+                    f'SELECT row, id, document, metadata FROM rows WHERE alive = 1 AND id IN ({placeholders})',
+                    [doc_id for doc_id, _ in hits]
+                )}
+                for doc_id, score in hits:
+                    # Deleted since: skipped
+                    if doc_id in by_id:
+                        sql_rows.append(by_id[doc_id])
+                        kept_scores.append(score)
+            found = self._result_rows(sql_rows, include)
+            result['ids'].append(found['ids'])
+            result['documents'].append(found.get('documents'))
+            result['metadatas'].append(found.get('metadatas'))
+            # Squared L2 between unit vectors, like Chroma's default space
+            result['distances'].append([2 - 2 * score for score in kept_scores])
+        return result
+
+    def close(self):
+        self._db.close()